@@ -0,0 +1,166 @@
+from bisect import insort
+from math import floor
+from typing import Dict, List, Optional, Tuple, Type
+
+from PySide6.QtWidgets import QGraphicsItem
+from PySide6.QtCore import QPointF, QRectF
+
+# (sort key, left, top, right, bottom, item), the key puts the topmost
+# item first and is unique, so items themselves are never compared
+Entry = Tuple[Tuple[float, int], float, float, float, float, QGraphicsItem]
+
+
+class AnnotationIndex:
+    """Hit-testing for annotation items, apart from the scene.
+
+    `QGraphicsScene.itemAt` also walks the background slices, the mask and
+    the selection border. This index only knows annotation items and
+    buckets their scene bounding rects into a grid of small square cells.
+    Each bucket is kept sorted topmost first, so a lookup tests the few
+    items sharing the cell under the cursor with plain float compares and
+    stops at the first hit.
+    """
+    cell_size = 32
+
+    def __init__(self) -> None:
+        self.cells: Dict[Tuple[int, int], List[Entry]] = {}
+        self.rects: Dict[QGraphicsItem, QRectF] = {}
+        self.entries: Dict[QGraphicsItem, Entry] = {}
+        # insertion order breaks ties between items of the same z value
+        self.order: Dict[QGraphicsItem, int] = {}
+        self.counter = 0
+
+    def __len__(self) -> int:
+        return len(self.rects)
+
+    def __contains__(self, item: QGraphicsItem) -> bool:
+        return item in self.rects
+
+    def _cells(self, rect: QRectF):
+        size = self.cell_size
+        for x in range(floor(rect.left() / size), floor(rect.right() / size) + 1):
+            for y in range(floor(rect.top() / size), floor(rect.bottom() / size) + 1):
+                yield x, y
+
+    def _insert(self, item: QGraphicsItem):
+        rect = item.sceneBoundingRect()
+        entry = (
+            (-item.zValue(), -self.order[item]),
+            rect.left(), rect.top(), rect.right(), rect.bottom(), item,
+        )
+        self.rects[item] = rect
+        self.entries[item] = entry
+        for cell in self._cells(rect):
+            insort(self.cells.setdefault(cell, []), entry)
+
+    def add(self, item: QGraphicsItem):
+        if item in self.rects:
+            return self.update(item)
+        self.counter += 1
+        self.order[item] = self.counter
+        self._insert(item)
+
+    def _discard(self, item: QGraphicsItem) -> bool:
+        rect = self.rects.pop(item, None)
+        if rect is None:
+            return False
+        entry = self.entries.pop(item)
+        for cell in self._cells(rect):
+            bucket = self.cells.get(cell)
+            if bucket is not None:
+                bucket.remove(entry)
+                if not bucket:
+                    del self.cells[cell]
+        return True
+
+    def remove(self, item: QGraphicsItem):
+        if self._discard(item):
+            self.order.pop(item)
+
+    def update(self, item: QGraphicsItem):
+        """Re-bucket an item after it moved, scaled or changed size."""
+        old = self.rects.get(item)
+        if old is None or item.sceneBoundingRect() == old:
+            return
+        self._discard(item)
+        self._insert(item)
+
+    def clear(self):
+        self.cells.clear()
+        self.rects.clear()
+        self.entries.clear()
+        self.order.clear()
+        self.counter = 0
+
+    def item_at(
+        self,
+        point: QPointF,
+        kind: Optional[Type[QGraphicsItem]] = None,
+    ) -> Optional[QGraphicsItem]:
+        """The topmost visible annotation at `point` (scene coordinates)."""
+        x, y = point.x(), point.y()
+        size = self.cell_size
+        bucket = self.cells.get((floor(x / size), floor(y / size)))
+        if not bucket:
+            return None
+        for _, left, top, right, bottom, item in bucket:
+            if left <= x <= right and top <= y <= bottom \
+                    and (kind is None or isinstance(item, kind)) \
+                    and item.isVisible() \
+                    and item.contains(item.mapFromScene(QPointF(point))):
+                return item
+        return None
+
+
+if __name__ == '__main__':
+    # hit-test and cursor update cost, scene.itemAt against the index
+    import sys
+    import random
+    import time
+    from PySide6.QtWidgets import QApplication
+    from PySide6.QtCore import QPoint, QRect
+    from PySide6.QtGui import QPixmap, QTransform
+    from editor import EditorScene, EditorView, Op
+    from op_text import NodeTag
+
+    app = QApplication(sys.argv)
+    random.seed(1)
+    screen = QApplication.primaryScreen()
+    size = screen.geometry().size()
+    points = [
+        QPoint(random.randrange(size.width()), random.randrange(size.height()))
+        for _ in range(5000)
+    ]
+    capture = QPixmap(size * screen.devicePixelRatio())
+    capture.fill()
+
+    def per_point(func) -> float:
+        start = time.perf_counter()
+        for point in points:
+            func(point)
+        return (time.perf_counter() - start) / len(points) * 1e6
+
+    print(f'{"items":>6} {"scene.itemAt":>14} {"index.item_at":>14} {"cursor update":>14}')
+    for count in (10, 100, 1000):
+        scene = EditorScene()
+        view = EditorView(scene, screen)
+        scene.start_edit(capture)
+        scene.selectionArea = QRect(QPoint(0, 0), size)
+        scene.update_selection_area()
+        scene.op = Op.Text
+        for _ in range(count):
+            tag = NodeTag('annotation')
+            tag.setPos(
+                random.randrange(size.width() - 100),
+                random.randrange(size.height() - 30),
+            )
+            scene.add_annotation(tag)
+
+        scene_time = per_point(lambda p: scene.itemAt(p, QTransform()))
+        index_time = per_point(lambda p: scene.annotations.item_at(p, NodeTag))
+        cursor_time = per_point(view.update_cursor_shape)
+        print(
+            f'{count:>6} {scene_time:>11.1f} us {index_time:>11.1f} us'
+            f' {cursor_time:>11.1f} us'
+        )
+        view.deleteLater()
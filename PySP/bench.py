@@ -0,0 +1,246 @@
+"""Shared parts of the headless benchmarks, see bench_editor.py and bench_pins.py.
+
+Each screen configuration runs in a child process on Qt's offscreen
+platform, as the platform's screens are fixed once the application
+starts. Children print their results as JSON; the parent collects them
+into one report, which `compare` holds against a report of another
+revision.
+"""
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# name => (logical width, logical height, device pixel ratio) per screen,
+# placed left to right
+SCREEN_CONFIGS: Dict[str, List[Tuple[int, int, float]]] = {
+    '1080p@1': [(1920, 1080, 1)],
+    '4k@1': [(3840, 2160, 1)],
+    '4k@2': [(1920, 1080, 2)],
+    'dual': [(1920, 1080, 1), (1920, 1080, 2)],
+}
+# metrics whose relative change beyond this counts as a regression
+THRESHOLD = 0.10
+
+
+def screen_config(name: str) -> Tuple[dict, str]:
+    """An offscreen platform configuration for `name`, and its scale factors.
+
+    The platform's own `dpr` only reaches screens, windows would still
+    paint at 1; Qt's scaling does both, so screens are given in native
+    pixels and scaled by QT_SCREEN_SCALE_FACTORS.
+    """
+    screens = []
+    x = 0
+    for index, (width, height, dpr) in enumerate(SCREEN_CONFIGS[name]):
+        screens.append({
+            'name': f'S{index}', 'x': x, 'y': 0,
+            'width': int(width * dpr), 'height': int(height * dpr),
+            'logicalDpi': 96, 'logicalBaseDpi': 96, 'dpr': 1,
+        })
+        # Qt scales a screen around its top left corner, so screens placed
+        # by their device independent widths stay side by side
+        x += width
+    factors = ';'.join(str(dpr) for _, _, dpr in SCREEN_CONFIGS[name])
+    return {
+        'synchronousWindowSystemEvents': True,
+        'windowFrameMargins': False,
+        'screens': screens,
+    }, factors
+
+
+def summarize(samples: Sequence[float], scale: float = 1000.0) -> dict:
+    """Count, mean, median, 95th percentile and maximum of `samples * scale`.
+
+    The default scale turns seconds into milliseconds.
+    """
+    if not samples:
+        return {'count': 0, 'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'max': 0.0}
+    values = np.asarray(samples, dtype=float) * scale
+    return {
+        'count': len(values),
+        'mean': round(float(values.mean()), 4),
+        'p50': round(float(np.percentile(values, 50)), 4),
+        'p95': round(float(np.percentile(values, 95)), 4),
+        'max': round(float(values.max()), 4),
+    }
+
+
+def max_rss_mib() -> float:
+    # kilobytes on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def rss_mib() -> float:
+    """Resident memory now, where /proc tells it, else the peak."""
+    try:
+        with open('/proc/self/statm') as file:
+            pages = int(file.read().split()[1])
+    except OSError:
+        return max_rss_mib()
+    return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+
+def revision() -> str:
+    """Short commit of the tree, marked dirty with local changes."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=here, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'],
+            cwd=here, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+    return commit + ('+dirty' if dirty else '')
+
+
+def run_configs(script: str, configs: List[str], args: List[str]) -> Dict[str, dict]:
+    """Run `script --worker CONFIG args...` once per screen configuration."""
+    results = {}
+    for name in configs:
+        config, factors = screen_config(name)
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as file:
+            json.dump(config, file)
+        env = dict(
+            os.environ,
+            QT_QPA_PLATFORM=f'offscreen:configfile={file.name}',
+            QT_SCREEN_SCALE_FACTORS=factors,
+        )
+        try:
+            done = subprocess.run(
+                [sys.executable, script, '--worker', name, *args],
+                env=env, stdout=subprocess.PIPE, text=True,
+            )
+        finally:
+            os.remove(file.name)
+        if done.returncode != 0:
+            print(f'{name}: worker failed with {done.returncode}', file=sys.stderr)
+            continue
+        results[name] = json.loads(done.stdout.strip().splitlines()[-1])
+    return results
+
+
+def make_report(benchmark: str, results: Dict[str, dict]) -> dict:
+    from PySide6 import __version__ as pyside_version
+    return {
+        'benchmark': benchmark,
+        'revision': revision(),
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'pyside': pyside_version,
+        'machine': f'{platform.system()} {platform.machine()}, {os.cpu_count()} cpu',
+        'results': results,
+    }
+
+
+def _metrics(results: Dict[str, dict]) -> Dict[Tuple[str, str, str], float]:
+    """(config, scenario, metric) => value, summaries by their mean and p95."""
+    flat = {}
+    for config, scenarios in results.items():
+        for scenario, metrics in scenarios.items():
+            for metric, value in metrics.items():
+                if isinstance(value, dict):
+                    for key in ('mean', 'p95'):
+                        flat[config, scenario, f'{metric}.{key}'] = value[key]
+                elif isinstance(value, (int, float)):
+                    flat[config, scenario, metric] = value
+    return flat
+
+
+def print_report(report: dict):
+    print(f'{report["benchmark"]} at {report["revision"] or "?"}, {report["machine"]}')
+    for (config, scenario, metric), value in _metrics(report['results']).items():
+        print(f'{config:8} {scenario:18} {metric:22} {value:12.3f}')
+
+
+def compare(base: dict, head: dict, threshold: float = THRESHOLD) -> int:
+    """Print base against head, return how many metrics got worse.
+
+    Every metric is a cost, lower is better.
+    """
+    print(f'{base["revision"] or "base"} => {head["revision"] or "head"}')
+    old, new = _metrics(base['results']), _metrics(head['results'])
+    regressions = 0
+    for key in sorted(old.keys() & new.keys()):
+        before, after = old[key], new[key]
+        change = (after - before) / before if before else 0.0
+        mark = ''
+        if change > threshold:
+            mark = '  worse'
+            regressions += 1
+        elif change < -threshold:
+            mark = '  better'
+        config, scenario, metric = key
+        print(
+            f'{config:8} {scenario:18} {metric:22} '
+            f'{before:10.3f} {after:10.3f} {change:+8.1%}{mark}'
+        )
+    for key in sorted(old.keys() ^ new.keys()):
+        print(f'{" ".join(key)}: only in {"base" if key in old else "head"}')
+    return regressions
+
+
+def main(
+    benchmark: str, script: str, worker, argv: Optional[List[str]] = None,
+    add_arguments=None, configs: Sequence[str] = tuple(SCREEN_CONFIGS),
+):
+    """Command line shared by the benchmarks.
+
+    `worker(config, args)` runs in the child and returns its results;
+    `add_arguments(parser)` adds the benchmark's own options, `configs`
+    run unless --configs names others.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog=os.path.basename(script))
+    parser.add_argument(
+        '--configs', default=','.join(configs),
+        help=f'screen configurations, from {", ".join(SCREEN_CONFIGS)}',
+    )
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('-o', '--output', help='write the report as JSON here')
+    parser.add_argument(
+        '--compare', nargs=2, metavar=('BASE', 'HEAD'),
+        help='compare two reports instead of running',
+    )
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    if add_arguments is not None:
+        add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        reports = []
+        for path in args.compare:
+            with open(path) as file:
+                reports.append(json.load(file))
+        sys.exit(1 if compare(*reports, threshold=args.threshold) else 0)
+
+    if args.worker:
+        print(json.dumps(worker(args.worker, args)))
+        return
+
+    # everything after the shared options goes to the workers as is
+    passed = list(argv if argv is not None else sys.argv[1:])
+    for option in ('-o', '--output', '--configs'):
+        while option in passed:
+            index = passed.index(option)
+            del passed[index:index + 2]
+    configs = [name for name in args.configs.split(',') if name]
+    report = make_report(benchmark, run_configs(script, configs, passed))
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=1)
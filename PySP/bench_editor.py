@@ -0,0 +1,435 @@
+"""Replays mouse and keyboard streams through the editor's event handlers.
+
+Every screen configuration of `bench.SCREEN_CONFIGS` gets a synthetic
+capture of its native desktop size, then each scenario runs on a fresh
+editing session:
+
+    python bench_editor.py -o before.json
+    python bench_editor.py -o after.json
+    python bench_editor.py --compare before.json after.json
+
+Per event it measures the handler, i.e. `QApplication.sendEvent` to the
+view, and the update that follows, i.e. the events processed afterwards,
+painting included. A second pass under tracemalloc measures the peak of
+Python allocations per event and what a scenario leaves allocated.
+
+Streams are JSON lists of events in scene coordinates. `--record FILE`
+opens the editor on the current screens and records what is done to it
+until it closes, `--events FILE` replays such a file next to the
+generated scenarios.
+"""
+import json
+import math
+import os
+import sys
+import time
+import tracemalloc
+import warnings
+from typing import Callable, Dict, List, Optional
+
+from PySide6.QtCore import QEvent, QObject, QPointF, QRect, QRectF, Qt
+from PySide6.QtGui import QColor, QCursor, QKeyEvent, QMouseEvent, QPainter, QPixmap
+from PySide6.QtWidgets import QApplication
+from loguru import logger
+
+import bench
+from editor import EditorView, EditorWindow, Op
+from op_text import NodeTag
+from shotter import QtBackend
+from theme import ThemeContainer
+
+Event = dict
+# seconds to wait for the snap map of a new session
+SNAP_TIMEOUT = 10.0
+
+
+def synthetic_capture() -> QPixmap:
+    """A desktop of windows full of text, at the native size of all screens."""
+    desktop = QRect()
+    for rect in QtBackend.native_geometries():
+        desktop = desktop.united(rect)
+    pixmap = QPixmap(desktop.size())
+    pixmap.fill(QColor('#2B5797'))
+    painter = QPainter(pixmap)
+    width, height = desktop.width(), desktop.height()
+    for index in range(12):
+        window = QRect(
+            (index * 389) % (width - 400), (index * 241) % (height - 300),
+            300 + index * 37 % 500, 200 + index * 53 % 400,
+        )
+        painter.fillRect(window, QColor('#F3F3F3'))
+        painter.fillRect(window.x(), window.y(), window.width(), 24, QColor('#DDDDDD'))
+        painter.setClipRect(window)
+        for line in range(window.y() + 40, window.bottom(), 18):
+            painter.drawText(window.x() + 8, line, f'line {line} of window {index}, lorem ipsum dolor')
+        painter.setClipping(False)
+    painter.end()
+    return pixmap
+
+
+def _path(a: QPointF, b: QPointF, steps: int, buttons: int = 1) -> List[Event]:
+    return [
+        {'t': 'move', 'x': a.x() + (b.x() - a.x()) * i / steps,
+         'y': a.y() + (b.y() - a.y()) * i / steps, 'buttons': buttons}
+        for i in range(1, steps + 1)
+    ]
+
+
+def _drag(a: QPointF, b: QPointF, steps: int = 120) -> List[Event]:
+    return [
+        {'t': 'press', 'x': a.x(), 'y': a.y()},
+        *_path(a, b, steps),
+        {'t': 'release', 'x': b.x(), 'y': b.y()},
+    ]
+
+
+def _at(desktop: QRectF, fx: float, fy: float) -> QPointF:
+    return QPointF(
+        desktop.x() + desktop.width() * fx, desktop.y() + desktop.height() * fy,
+    )
+
+
+def _selection(desktop: QRectF) -> QRectF:
+    return QRectF(_at(desktop, 0.2, 0.2), _at(desktop, 0.55, 0.6))
+
+
+def _select(desktop: QRectF) -> Event:
+    area = _selection(desktop).toRect()
+    return {'t': 'select', 'rect': [area.x(), area.y(), area.width(), area.height()]}
+
+
+def selection_drag(desktop: QRectF) -> List[Event]:
+    return _drag(_at(desktop, 0.1, 0.1), _at(desktop, 0.6, 0.7))
+
+
+def selection_move(desktop: QRectF) -> List[Event]:
+    center = _selection(desktop).center()
+    return [_select(desktop), *_drag(center, center + QPointF(desktop.width() * 0.3, desktop.height() * 0.2))]
+
+
+def edge_resize(desktop: QRectF) -> List[Event]:
+    area = _selection(desktop)
+    start = QPointF(area.right() + 3, area.center().y())
+    return [_select(desktop), *_drag(start, start + QPointF(desktop.width() * 0.3, 0))]
+
+
+def hover(desktop: QRectF) -> List[Event]:
+    # across every screen, over the selection and its edges
+    return [_select(desktop), *_path(_at(desktop, 0.01, 0.02), _at(desktop, 0.99, 0.98), 200, buttons=0)]
+
+
+def text_placement(desktop: QRectF) -> List[Event]:
+    point = _at(desktop, 0.3, 0.35)
+    events = [
+        _select(desktop), {'t': 'tool', 'op': 'Text'},
+        {'t': 'press', 'x': point.x(), 'y': point.y()},
+        {'t': 'release', 'x': point.x(), 'y': point.y()},
+    ]
+    events += [
+        {'t': 'key', 'key': ord(char.upper()), 'text': char}
+        for char in 'Hello, world! The quick brown fox.'
+    ]
+    return events
+
+
+def text_scaling(desktop: QRectF) -> List[Event]:
+    corner = _at(desktop, 0.3, 0.35)
+    return [
+        _select(desktop), {'t': 'tool', 'op': 'Text'},
+        {'t': 'note', 'x': corner.x(), 'y': corner.y(), 'text': 'scale me'},
+        *_drag(corner, corner + QPointF(desktop.width() * 0.15, desktop.height() * 0.1), 80),
+    ]
+
+
+def pen_stroke(desktop: QRectF) -> List[Event]:
+    area = _selection(desktop)
+    points = [
+        QPointF(
+            area.left() + 10 + (area.width() - 20) * i / 300,
+            area.center().y() + math.sin(i / 12) * area.height() * 0.3,
+        )
+        for i in range(301)
+    ]
+    moves = [{'t': 'move', 'x': p.x(), 'y': p.y(), 'buttons': 1} for p in points[1:]]
+    return [
+        _select(desktop), {'t': 'tool', 'op': 'Pen'},
+        {'t': 'press', 'x': points[0].x(), 'y': points[0].y()},
+        *moves,
+        {'t': 'release', 'x': points[-1].x(), 'y': points[-1].y()},
+    ]
+
+
+def pixelate(desktop: QRectF) -> List[Event]:
+    area = _selection(desktop)
+    return [
+        _select(desktop), {'t': 'tool', 'op': 'Pixelate'},
+        *_drag(area.topLeft() + QPointF(10, 10), area.center()),
+    ]
+
+
+SCENARIOS: Dict[str, Callable[[QRectF], List[Event]]] = {
+    'selection_drag': selection_drag,
+    'selection_move': selection_move,
+    'edge_resize': edge_resize,
+    'hover': hover,
+    'text_placement': text_placement,
+    'text_scaling': text_scaling,
+    'pen_stroke': pen_stroke,
+    'pixelate': pixelate,
+}
+
+
+class Replayer:
+    """Sends an event stream to the views of an editing session.
+
+    Mouse events go to the viewport of the view under the point, which
+    keeps them from a press to its release, as a grab would. Keys go to
+    the view with focus. Setup events, selecting an area or a tool and
+    placing a note, are applied directly and not measured.
+    """
+
+    def __init__(self, app: QApplication, editor: EditorWindow):
+        self.app = app
+        self.editor = editor
+        self.grabbed: Optional[EditorView] = None
+        self.focused: Optional[EditorView] = None
+        self.buttons = Qt.MouseButton.NoButton
+
+    def start(self, capture: QPixmap):
+        self.editor.edit_new_capture(capture)
+        self.grabbed = None
+        self.focused = None
+        if self.app.activeWindow() is None:
+            # the offscreen platform keeps its focus window when the views
+            # hide, so showing them again activates nothing, as a window
+            # manager would; keys only reach an active scene
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', DeprecationWarning)
+                QApplication.setActiveWindow(self.editor.view_at(QCursor.pos()))
+        scene = self.editor.scene
+        deadline = time.monotonic() + SNAP_TIMEOUT
+        # hovering follows the snap map, which is built on the thread pool
+        while scene.snapMap is None and time.monotonic() < deadline:
+            self.app.processEvents()
+            time.sleep(0.005)
+        self.app.processEvents()
+
+    def setup(self, event: Event):
+        scene = self.editor.scene
+        kind = event['t']
+        if kind == 'select':
+            scene.selectionArea = QRect(*event['rect'])
+            scene.update_selection_area()
+        elif kind == 'tool':
+            self.editor.tool_actions[Op[event['op']]].trigger()
+        elif kind == 'note':
+            # placed so its bottom right resizing handle is at (x, y)
+            item = NodeTag(event['text'])
+            rect = item.boundingRect()
+            item.setPos(event['x'] - rect.width() + 2, event['y'] - rect.height() + 2)
+            scene.add_annotation(item)
+        self.app.processEvents()
+
+    def prepare(self, event: Event):
+        """The receiver and the Qt events for `event`, None for setup events."""
+        kind = event['t']
+        modifiers = Qt.KeyboardModifier(event.get('mods', 0))
+        if kind == 'key':
+            view = self.focused or self.editor.view_at(self.editor.scene.sceneRect().center().toPoint())
+            key, text = event['key'], event.get('text', '')
+            return view, [
+                QKeyEvent(QEvent.Type.KeyPress, key, modifiers, text),
+                QKeyEvent(QEvent.Type.KeyRelease, key, modifiers, text),
+            ]
+        if kind not in ('press', 'move', 'release'):
+            return None
+        point = QPointF(event['x'], event['y'])
+        view = self.grabbed or self.editor.view_at(point.toPoint())
+        if kind == 'press':
+            self.grabbed = self.focused = view
+            self.buttons = Qt.MouseButton.LeftButton
+            qt_type, button = QEvent.Type.MouseButtonPress, Qt.MouseButton.LeftButton
+        elif kind == 'release':
+            self.grabbed = None
+            self.buttons = Qt.MouseButton.NoButton
+            qt_type, button = QEvent.Type.MouseButtonRelease, Qt.MouseButton.LeftButton
+        else:
+            qt_type, button = QEvent.Type.MouseMove, Qt.MouseButton.NoButton
+        buttons = Qt.MouseButton(event['buttons']) if 'buttons' in event else self.buttons
+        local = view.viewportTransform().map(point)
+        # views cover their screens, global coordinates are scene coordinates
+        return view.viewport(), [QMouseEvent(qt_type, local, point, button, buttons, modifiers)]
+
+    def run(self, events: List[Event], handler: List[float], update: List[float],
+            alloc: Optional[List[int]] = None):
+        for event in events:
+            prepared = self.prepare(event)
+            if prepared is None:
+                self.setup(event)
+                continue
+            receiver, qt_events = prepared
+            if alloc is not None:
+                before = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+            start = time.perf_counter()
+            for qt_event in qt_events:
+                self.app.sendEvent(receiver, qt_event)
+            handled = time.perf_counter()
+            self.app.processEvents()
+            done = time.perf_counter()
+            if alloc is not None:
+                alloc.append(tracemalloc.get_traced_memory()[1] - before)
+            handler.append(handled - start)
+            update.append(done - handled)
+
+
+class Recorder(QObject):
+    """Records what is done to the editor's views as a replayable stream."""
+
+    def __init__(self, editor: EditorWindow):
+        super().__init__()
+        self.editor = editor
+        self.events: List[Event] = []
+        self.op = Op.None_
+
+    def eventFilter(self, watched: QObject, event: QEvent) -> bool:
+        views = list(self.editor.views.values())
+        kind = event.type()
+        if kind in (QEvent.Type.MouseButtonPress, QEvent.Type.MouseMove, QEvent.Type.MouseButtonRelease):
+            view = next((view for view in views if view.viewport() is watched), None)
+            if view is not None and event.button() in (Qt.MouseButton.LeftButton, Qt.MouseButton.NoButton):
+                self.record_mouse(view, event)
+        elif kind == QEvent.Type.KeyPress and watched in views:
+            self.events.append({
+                't': 'key', 'key': event.key(), 'text': event.text(),
+                'mods': event.modifiers().value,
+            })
+        return False
+
+    def record_mouse(self, view: EditorView, event: QMouseEvent):
+        kind = {
+            QEvent.Type.MouseButtonPress: 'press',
+            QEvent.Type.MouseMove: 'move',
+            QEvent.Type.MouseButtonRelease: 'release',
+        }[event.type()]
+        op = self.editor.scene.op
+        if kind == 'press' and op != self.op:
+            # tools are chosen on the toolbar, outside the views
+            if op == Op.None_:
+                self.events.append({'t': 'tool', 'op': self.op.name})
+            else:
+                self.events.append({'t': 'tool', 'op': op.name})
+            self.op = op
+        point = view.scene_pointf(event.position())
+        record = {'t': kind, 'x': round(point.x(), 2), 'y': round(point.y(), 2)}
+        if event.modifiers().value:
+            record['mods'] = event.modifiers().value
+        if kind == 'move':
+            record['buttons'] = event.buttons().value
+        self.events.append(record)
+
+
+def record(path: str):
+    app = QApplication(sys.argv)
+    editor = EditorWindow(ThemeContainer())
+    recorder = Recorder(editor)
+    app.installEventFilter(recorder)
+
+    def save():
+        with open(path, 'w') as file:
+            json.dump(recorder.events, file)
+        print(f'{len(recorder.events)} events recorded to {path}')
+        app.quit()
+
+    editor.closed.connect(save)
+    editor.edit_new_capture(synthetic_capture())
+    app.exec()
+
+
+def load_events(paths: List[str]) -> Dict[str, Callable[[QRectF], List[Event]]]:
+    streams = {}
+    for path in paths:
+        with open(path) as file:
+            events = json.load(file)
+        name = os.path.splitext(os.path.basename(path))[0]
+        streams[name] = lambda desktop, events=events: events
+    return streams
+
+
+def worker(config: str, args) -> dict:
+    app = QApplication(sys.argv)
+    logger.remove()
+    if args.log:
+        # formatting costs what it costs in the app, writing it out is left out
+        logger.add(lambda message: None, level='DEBUG')
+    editor = EditorWindow(ThemeContainer())
+    replayer = Replayer(app, editor)
+    capture = synthetic_capture()
+    scenarios = dict(SCENARIOS)
+    scenarios.update(load_events(args.events))
+    if args.scenarios:
+        wanted = args.scenarios.split(',')
+        scenarios = {name: scenarios[name] for name in wanted}
+
+    results = {}
+    starts: List[float] = []
+    for name, generate in scenarios.items():
+        handler: List[float] = []
+        update: List[float] = []
+        events = None
+        for index in range(args.warmup + args.rounds):
+            start = time.perf_counter()
+            replayer.start(capture)
+            starts.append(time.perf_counter() - start)
+            if events is None:
+                events = generate(editor.scene.sceneRect())
+            if index < args.warmup:
+                replayer.run(events, [], [])
+            else:
+                replayer.run(events, handler, update)
+            editor.close()
+            app.processEvents()
+
+        alloc: List[int] = []
+        replayer.start(capture)
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        replayer.run(events, [], [], alloc)
+        retained = tracemalloc.get_traced_memory()[0] - baseline
+        tracemalloc.stop()
+        editor.close()
+        app.processEvents()
+
+        results[name] = {
+            'events': len(handler) // max(args.rounds, 1),
+            'handler_ms': bench.summarize(handler),
+            'update_ms': bench.summarize(update),
+            'alloc_peak_kib': bench.summarize(alloc, scale=1 / 1024),
+            'retained_kib': round(retained / 1024, 2),
+        }
+    screens = app.screens()
+    results['session'] = {
+        'screens': len(screens),
+        'native_pixels': capture.width() * capture.height(),
+        'start_ms': bench.summarize(starts),
+        'max_rss_mib': round(bench.max_rss_mib(), 1),
+    }
+    return results
+
+
+def add_arguments(parser):
+    parser.add_argument('--warmup', type=int, default=1, help='unmeasured rounds first')
+    parser.add_argument(
+        '--scenarios', default='',
+        help=f'comma separated, from {", ".join(SCENARIOS)} and the --events names',
+    )
+    parser.add_argument('--events', action='append', default=[], help='replay a recorded stream')
+    parser.add_argument('--record', help='record a stream on the current screens')
+    parser.add_argument('--log', action='store_true', help='format the debug logs as the app does')
+
+
+if __name__ == '__main__':
+    if '--record' in sys.argv:
+        record(sys.argv[sys.argv.index('--record') + 1])
+    else:
+        bench.main('editor', os.path.abspath(__file__), worker, add_arguments=add_arguments)
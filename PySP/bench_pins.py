@@ -0,0 +1,278 @@
+"""Zooms, drags and locates pinned windows, from one pin to hundreds.
+
+For each pin count the tray pins synthetic captures of mixed sizes, then
+scripted wheel, Ctrl+wheel and drag sequences go to the pins through
+their event handlers, `reset_zoom` undoes the zoom, and "Locate images"
+brings back the pins left off the screen:
+
+    python bench_pins.py --counts 1,10,50,200 -o before.json
+    python bench_pins.py --compare before.json after.json
+
+Frame times are from sending an event until the events it caused,
+painting included, are processed. Pins are only added between counts,
+memory per pin is the growth of the resident set over the added pins,
+pixmaps and window backing stores included.
+The animation of "Locate images" runs on a real event loop, its cost is
+the process CPU time per animation tick.
+"""
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import List
+
+from PySide6.QtCore import QEvent, QEventLoop, QPoint, QPointF, Qt, QTimer
+from PySide6.QtGui import QColor, QCursor, QGuiApplication, QMouseEvent, QPainter, QPixmap, QWheelEvent
+from PySide6.QtWidgets import QApplication
+from loguru import logger
+
+import bench
+from editor import ImageData
+from image import ImageLabel
+
+# native sizes of the pins, in turn
+PIN_SIZES = [(160, 120), (400, 300), (800, 450), (1280, 720)]
+# every this many pins one is left mostly off the screen, not a multiple
+# of the sizes so pins of every size stay on it
+OFF_SCREEN_EVERY = 5
+# milliseconds to wait for the locate animations, they take 170
+ANIMATION_TIMEOUT = 3000
+
+
+def pin_pixmap(index: int, dpr: float) -> QPixmap:
+    width, height = PIN_SIZES[index % len(PIN_SIZES)]
+    pixmap = QPixmap(width, height)
+    pixmap.fill(QColor.fromHsv(index * 37 % 360, 60, 240))
+    painter = QPainter(pixmap)
+    for line in range(16, height, 16):
+        painter.drawText(6, line, f'pin {index}, line {line}, lorem ipsum dolor sit amet')
+    painter.end()
+    pixmap.setDevicePixelRatio(dpr)
+    return pixmap
+
+
+def pin_position(index: int, pixmap: QPixmap) -> QPoint:
+    """Cascaded over the primary screen, every few pins off its right edge."""
+    screen = QGuiApplication.primaryScreen().availableGeometry()
+    size = pixmap.deviceIndependentSize().toSize()
+    if index % OFF_SCREEN_EVERY == OFF_SCREEN_EVERY - 1:
+        return QPoint(screen.right() - size.width() // 5, screen.y() + index * 13 % screen.height())
+    x = screen.x() + index * 97 % max(screen.width() - size.width(), 1)
+    y = screen.y() + index * 61 % max(screen.height() - size.height(), 1)
+    return QPoint(x, y)
+
+
+def wheel(pin: ImageLabel, steps: int, modifiers=Qt.KeyboardModifier.NoModifier) -> QWheelEvent:
+    center = QPointF(pin.rect().center())
+    return QWheelEvent(
+        center, QPointF(pin.mapToGlobal(center)), QPoint(), QPoint(0, 120 * steps),
+        Qt.MouseButton.NoButton, modifiers, Qt.ScrollPhase.NoScrollPhase, False,
+    )
+
+
+class PinDriver:
+    """Sends scripted input to pins, timing each event and its frame."""
+
+    def __init__(self, app: QApplication):
+        self.app = app
+        self.handler: List[float] = []
+        self.frame: List[float] = []
+
+    def send(self, receiver, event: QEvent):
+        start = time.perf_counter()
+        self.app.sendEvent(receiver, event)
+        handled = time.perf_counter()
+        self.app.processEvents()
+        self.handler.append(handled - start)
+        self.frame.append(time.perf_counter() - start)
+
+    def results(self, name: str) -> dict:
+        results = {
+            f'{name}_ms': bench.summarize(self.handler),
+            f'{name}_frame_ms': bench.summarize(self.frame),
+        }
+        self.handler, self.frame = [], []
+        return results
+
+
+def targets(pins: List[ImageLabel], count: int) -> List[ImageLabel]:
+    """The first `count` pins on the screen, of every size."""
+    return [
+        pin for index, pin in enumerate(pins)
+        if index % OFF_SCREEN_EVERY != OFF_SCREEN_EVERY - 1
+    ][:count]
+
+
+@contextmanager
+def on_top(pin: ImageLabel):
+    """Hide the pins above `pin` at its center while it is driven.
+
+    Wheel events only zoom the pin under the cursor, and the offscreen
+    platform cannot raise windows, so a pin stays below every pin shown
+    after it.
+    """
+    center = pin.mapToGlobal(pin.rect().center())
+    QCursor.setPos(center)
+    hidden = []
+    above = QApplication.widgetAt(center)
+    while isinstance(above, ImageLabel) and above is not pin:
+        above.hide()
+        hidden.append(above)
+        above = QApplication.widgetAt(center)
+    try:
+        yield
+    finally:
+        for above in hidden:
+            above.show()
+        QApplication.processEvents()
+
+
+def zoom(driver: PinDriver, pins: List[ImageLabel], rounds: int) -> dict:
+    resets = []
+    for _ in range(rounds):
+        for pin in pins:
+            with on_top(pin):
+                for steps in (1, 1, 1, 1, 1, -1, -1, -1):
+                    driver.send(pin, wheel(pin, steps))
+                start = time.perf_counter()
+                pin.reset_zoom()
+                driver.app.processEvents()
+                resets.append(time.perf_counter() - start)
+    return {**driver.results('zoom'), 'reset_zoom_ms': bench.summarize(resets)}
+
+
+def opacity(driver: PinDriver, pins: List[ImageLabel], rounds: int) -> dict:
+    for _ in range(rounds):
+        for pin in pins:
+            with on_top(pin):
+                for steps in (-1, -1, -1, -1, 1, 1, 1, 1):
+                    driver.send(pin, wheel(pin, steps, Qt.KeyboardModifier.ControlModifier))
+    return driver.results('opacity')
+
+
+def drag(driver: PinDriver, pins: List[ImageLabel], rounds: int) -> dict:
+    for _ in range(rounds):
+        for pin in pins:
+            local = QPointF(pin.rect().center())
+            start = QPointF(pin.mapToGlobal(local))
+            driver.send(pin, QMouseEvent(
+                QEvent.Type.MouseButtonPress, local, start,
+                Qt.MouseButton.LeftButton, Qt.MouseButton.LeftButton,
+                Qt.KeyboardModifier.NoModifier,
+            ))
+            path = [QPointF(step * 3, step * 2) for step in range(1, 31)]
+            for offset in path + path[-2::-1] + [QPointF()]:
+                point = start + offset
+                driver.send(pin, QMouseEvent(
+                    QEvent.Type.MouseMove, QPointF(pin.mapFromGlobal(point)), point,
+                    Qt.MouseButton.NoButton, Qt.MouseButton.LeftButton,
+                    Qt.KeyboardModifier.NoModifier,
+                ))
+            driver.send(pin, QMouseEvent(
+                QEvent.Type.MouseButtonRelease, local, start,
+                Qt.MouseButton.LeftButton, Qt.MouseButton.NoButton,
+                Qt.KeyboardModifier.NoModifier,
+            ))
+    return driver.results('drag')
+
+
+def locate(app: QApplication, tray, pins: List[ImageLabel], rounds: int) -> dict:
+    calls, walls, cpus, ticks = [], [], [], []
+    animated = 0
+    for _ in range(rounds):
+        for index, pin in enumerate(pins):
+            if index % OFF_SCREEN_EVERY == OFF_SCREEN_EVERY - 1:
+                pin.move(pin_position(index, pin.original_pixmap) - QPoint(pin.margin, pin.margin))
+        app.processEvents()
+
+        wall, cpu = time.perf_counter(), time.process_time()
+        tray.move_windows_on_screen()
+        calls.append(time.perf_counter() - wall)
+        animations = list(tray.animations)
+        animated = len(animations)
+        if not animations:
+            continue
+        loop = QEventLoop()
+        stamps = []
+        animations[0].valueChanged.connect(lambda _: stamps.append(time.perf_counter()))
+        running = [len(animations)]
+
+        def finished():
+            running[0] -= 1
+            if not running[0]:
+                loop.quit()
+
+        for animation in animations:
+            animation.finished.connect(finished)
+        QTimer.singleShot(ANIMATION_TIMEOUT, loop.quit)
+        loop.exec()
+        walls.append(time.perf_counter() - wall)
+        cpus.append((time.process_time() - cpu) / max(len(stamps), 1))
+        ticks += [b - a for a, b in zip(stamps, stamps[1:])]
+        app.processEvents()
+    return {
+        'animated': animated,
+        'locate_ms': bench.summarize(calls),
+        'animation_ms': bench.summarize(walls),
+        'animation_tick_ms': bench.summarize(ticks),
+        'animation_cpu_per_tick_ms': bench.summarize(cpus),
+    }
+
+
+def worker(config: str, args) -> dict:
+    # the tray indexes every pin, keep that out of the real capture history
+    os.environ['XDG_CACHE_HOME'] = tempfile.mkdtemp(prefix='pysp-bench-')
+    app = QApplication(sys.argv)
+    logger.remove()
+    if args.log:
+        logger.add(lambda message: None, level='DEBUG')
+    from tray_icon import TrayIcon
+    tray = TrayIcon()
+    dpr = QGuiApplication.primaryScreen().devicePixelRatio()
+    driver = PinDriver(app)
+
+    results = {}
+    # pins are added up to each count, destroying them in between would
+    # let the next ones reuse the freed memory and hide their size
+    for count in sorted(int(count) for count in args.counts.split(',')):
+        app.processEvents()
+        before = bench.rss_mib()
+        created = len(tray.images)
+        creates = []
+        for index in range(created, count):
+            pixmap = pin_pixmap(index, dpr)
+            start = time.perf_counter()
+            tray.pin_image(ImageData(pixmap, pin_position(index, pixmap)), live=False)
+            app.processEvents()
+            creates.append(time.perf_counter() - start)
+        pins = [pin for pin in tray.images if isinstance(pin, ImageLabel)]
+        per_pin = (bench.rss_mib() - before) * 1024 / max(count - created, 1)
+
+        chosen = targets(pins, args.targets)
+        result = {
+            'pins': count,
+            'targets': len(chosen),
+            'create_ms': bench.summarize(creates),
+            'rss_per_pin_kib': round(per_pin, 1),
+        }
+        result.update(zoom(driver, chosen, args.rounds))
+        result.update(opacity(driver, chosen, args.rounds))
+        result.update(drag(driver, chosen, args.rounds))
+        result.update(locate(app, tray, pins, args.rounds))
+        results[f'pins_{count}'] = result
+    results['session'] = {'max_rss_mib': round(bench.max_rss_mib(), 1)}
+    return results
+
+
+def add_arguments(parser):
+    parser.add_argument('--counts', default='1,10,50,200', help='comma separated pin counts')
+    parser.add_argument('--targets', type=int, default=8, help='pins zoomed and dragged per count')
+    parser.add_argument('--log', action='store_true', help='format the debug logs as the app does')
+
+
+if __name__ == '__main__':
+    bench.main(
+        'pins', os.path.abspath(__file__), worker,
+        add_arguments=add_arguments, configs=('1080p@1', '4k@2'),
+    )
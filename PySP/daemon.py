@@ -0,0 +1,369 @@
+import itertools
+import multiprocessing
+import threading
+from multiprocessing import shared_memory
+from multiprocessing.connection import Connection
+from typing import Dict, List, Optional, Tuple
+
+from PySide6.QtCore import QObject, QRect, QSocketNotifier, Signal
+from PySide6.QtGui import QGuiApplication, QImage
+from loguru import logger
+
+from shotter import CaptureBackend, Capabilities, select_backend
+from export import _attach
+
+# frames in flight, a frame stays valid until this many newer ones
+FRAME_SLOTS = 2
+# seconds to wait for the answer to a request before giving up on the
+# daemon, far above a grab of the largest desktop
+REQUEST_TIMEOUT = 2.0
+
+
+def _rect(rect: Optional[QRect]) -> Optional[Tuple[int, int, int, int]]:
+    return None if rect is None else (rect.x(), rect.y(), rect.width(), rect.height())
+
+
+def _image(shm: shared_memory.SharedMemory, frame: tuple) -> QImage:
+    """A `QImage` over the shared memory, no copy."""
+    width, height, bytes_per_line, image_format = frame
+    return QImage(
+        shm.buf, width, height, bytes_per_line, QImage.Format(image_format),
+    )
+
+
+def _close(shm: shared_memory.SharedMemory) -> bool:
+    """Close our mapping of `shm`, False while an image still looks at it."""
+    try:
+        shm.close()
+    except BufferError:
+        return False
+    return True
+
+
+def _save_jobs(jobs: Connection):
+    """Daemon side: encode and write the images the GUI hands over."""
+    from png_writer import save_png
+
+    while True:
+        message = jobs.recv()
+        if message is None:
+            return
+        job_id, shm_name, frame, path, name_filter = message
+        shm = _attach(shm_name)
+        try:
+            image = _image(shm, frame)
+            ok = save_png(image, path, name_filter)
+            del image
+        except Exception:
+            logger.exception('daemon.save path={}', path)
+            ok = False
+        finally:
+            shm.close()
+        jobs.send((job_id, path, ok))
+
+
+def serve(control: Connection, jobs: Connection):
+    """Main of the daemon process.
+
+    Grabs are answered on `control` in order. Saves arrive on `jobs` and
+    run on their own thread, so they never hold up a grab.
+    """
+    # the Qt backend needs screens, the others don't mind
+    app = QGuiApplication([])
+    backend = select_backend()
+    desktop = backend.desktop()
+    slots: List[shared_memory.SharedMemory] = [
+        shared_memory.SharedMemory(
+            create=True, size=max(4, desktop.width() * desktop.height() * 4),
+        )
+        for _ in range(FRAME_SLOTS)
+    ]
+    saver = threading.Thread(target=_save_jobs, args=(jobs,), daemon=True)
+    saver.start()
+    caps = backend.capabilities
+    control.send(('ready', backend.name, (caps.per_monitor, caps.per_region, caps.cursor)))
+    logger.debug('daemon.ready backend={}', backend.name)
+
+    try:
+        for index in itertools.cycle(range(FRAME_SLOTS)):
+            message = control.recv()
+            command = message[0]
+            if command == 'grab':
+                region = QRect(*message[1]) if message[1] else None
+                image = backend.grab_shared(region)
+                size = image.sizeInBytes()
+                if size > slots[index].size:
+                    slots[index].close()
+                    slots[index].unlink()
+                    slots[index] = shared_memory.SharedMemory(create=True, size=size)
+                slots[index].buf[:size] = image.constBits()
+                control.send((index, slots[index].name, (
+                    image.width(), image.height(), image.bytesPerLine(),
+                    image.format().value,
+                )))
+            elif command == 'desktop':
+                control.send(_rect(backend.desktop()))
+            elif command == 'monitors':
+                control.send([_rect(rect) for rect in backend.monitors()])
+            elif command == 'close':
+                break
+    except EOFError:
+        pass
+    finally:
+        backend.close()
+        for shm in slots:
+            shm.close()
+            shm.unlink()
+        del app
+
+
+class CaptureDaemon(QObject):
+    """GUI side of the capture and encode daemon process.
+
+    Frames come back through shared memory the daemon owns and are
+    wrapped without copying. Saves copy the image once into a shared
+    memory segment of their own, the daemon encodes it in parallel with
+    the GUI and `saved` reports back.
+
+    Once the daemon is gone, requests raise `ConnectionError` and saves
+    are refused, see `lost`.
+    """
+    # path, success
+    saved = Signal(str, bool)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        context = multiprocessing.get_context('spawn')
+        self.control, daemon_control = context.Pipe()
+        self.jobs, daemon_jobs = context.Pipe()
+        self.process = context.Process(
+            target=serve, args=(daemon_control, daemon_jobs),
+            name='pysp-capture', daemon=True,
+        )
+        self.process.start()
+        _, self.backend_name, capabilities = self.control.recv()
+        self.capabilities = Capabilities(*capabilities)
+        logger.debug(
+            'daemon.start pid={}, backend={}', self.process.pid, self.backend_name,
+        )
+        # frame slots of the daemon by index, attached on first use
+        self.frames: Dict[int, shared_memory.SharedMemory] = {}
+        # replaced slots an image still looked at, closed later
+        self.stale: List[shared_memory.SharedMemory] = []
+        self.job_ids = itertools.count()
+        # job id => its shared memory and path
+        self.pending: Dict[int, Tuple[shared_memory.SharedMemory, str]] = {}
+        # the pipes broke, the daemon died or is stuck
+        self.lost = False
+        self.notifier = QSocketNotifier(
+            self.jobs.fileno(), QSocketNotifier.Type.Read, self,
+        )
+        self.notifier.activated.connect(self.finish_jobs)
+
+    def request(self, *message):
+        if self.lost:
+            raise ConnectionError('capture daemon is gone')
+        try:
+            self.control.send(message)
+            if not self.control.poll(REQUEST_TIMEOUT):
+                # stuck, a late answer would be taken for the next one's
+                raise TimeoutError(f'no answer to {message[0]!r}')
+            return self.control.recv()
+        except (OSError, EOFError) as e:
+            self.lose(e)
+            raise ConnectionError('capture daemon is gone') from e
+
+    def lose(self, error: Exception):
+        """Give up on the daemon, failing the saves it still had."""
+        if self.lost:
+            return
+        self.lost = True
+        logger.warning('daemon.lost error={!r}', error)
+        self.notifier.setEnabled(False)
+        for shm, path in self.pending.values():
+            shm.close()
+            shm.unlink()
+            self.saved.emit(path, False)
+        self.pending.clear()
+
+    def grab(self, region: Optional[QRect] = None) -> QImage:
+        """The next frame, valid until `FRAME_SLOTS` more are grabbed."""
+        index, name, frame = self.request('grab', _rect(region))
+        shm = self.frames.get(index)
+        if shm is None or shm.name != name:
+            if shm is not None:
+                # the daemon outgrew the slot, its old segment is unlinked
+                self.stale.append(shm)
+            shm = self.frames[index] = _attach(name)
+        self.stale = [old for old in self.stale if not _close(old)]
+        return _image(shm, frame)
+
+    def save(self, image: QImage, path: str, name_filter: str) -> bool:
+        """Encode and write `image` in the daemon, `saved` tells the outcome.
+
+        Returns False, without a `saved` to follow, if the daemon is gone.
+        """
+        if self.lost:
+            return False
+        size = image.sizeInBytes()
+        shm = shared_memory.SharedMemory(create=True, size=max(1, size))
+        shm.buf[:size] = image.constBits()
+        job_id = next(self.job_ids)
+        frame = (image.width(), image.height(), image.bytesPerLine(), image.format().value)
+        try:
+            self.jobs.send((job_id, shm.name, frame, path, name_filter))
+        except OSError as e:
+            shm.close()
+            shm.unlink()
+            self.lose(e)
+            return False
+        self.pending[job_id] = (shm, path)
+        logger.debug('daemon.save.start path={}', path)
+        return True
+
+    def finish_jobs(self):
+        try:
+            while self.jobs.poll():
+                job_id, path, ok = self.jobs.recv()
+                shm, _ = self.pending.pop(job_id)
+                shm.close()
+                shm.unlink()
+                logger.debug('daemon.save.done path={}, ok={}', path, ok)
+                self.saved.emit(path, ok)
+        except (OSError, EOFError) as e:
+            self.lose(e)
+
+    def close(self):
+        self.notifier.setEnabled(False)
+        if self.process.is_alive():
+            if not self.lost:
+                try:
+                    self.jobs.send(None)
+                    self.control.send(('close',))
+                except OSError:
+                    pass
+            self.process.join(0 if self.lost else 2)
+            if self.process.is_alive():
+                # a stuck daemon may be stopped, which only SIGKILL ends
+                self.process.kill()
+                self.process.join(1)
+        for shm in list(self.frames.values()) + self.stale:
+            if self.lost:
+                # the daemon did not get to unlink its slots
+                try:
+                    shm.unlink()
+                except FileNotFoundError:
+                    pass
+            _close(shm)
+        self.frames.clear()
+        self.stale.clear()
+        for shm, _ in self.pending.values():
+            shm.close()
+            shm.unlink()
+        self.pending.clear()
+        logger.debug('daemon.stop')
+
+
+class DaemonBackend(CaptureBackend):
+    """Captures through a `CaptureDaemon`, with whatever backend it picked.
+
+    If the daemon goes away, captures carry on in process with the
+    backend `select_backend` picks.
+    """
+    name = 'daemon'
+
+    def __init__(self, daemon: CaptureDaemon) -> None:
+        self.daemon = daemon
+        self.capabilities = daemon.capabilities
+        self.fallback: Optional[CaptureBackend] = None
+
+    def fall_back(self):
+        self.fallback = select_backend()
+        self.capabilities = self.fallback.capabilities
+        logger.debug('daemon.fallback backend={}', self.fallback.name)
+
+    def desktop(self) -> QRect:
+        if self.fallback is None:
+            try:
+                return QRect(*self.daemon.request('desktop'))
+            except ConnectionError:
+                self.fall_back()
+        return self.fallback.desktop()
+
+    def monitors(self) -> List[QRect]:
+        if self.fallback is None:
+            try:
+                return [QRect(*rect) for rect in self.daemon.request('monitors')]
+            except ConnectionError:
+                self.fall_back()
+        return self.fallback.monitors()
+
+    def grab(self, region: Optional[QRect] = None) -> QImage:
+        return self.grab_shared(region).copy()
+
+    def grab_shared(self, region: Optional[QRect] = None) -> QImage:
+        if self.fallback is None:
+            try:
+                return self.daemon.grab(region)
+            except ConnectionError:
+                self.fall_back()
+        return self.fallback.grab_shared(region)
+
+    def close(self):
+        self.daemon.close()
+        if self.fallback is not None:
+            self.fallback.close()
+
+
+if __name__ == '__main__':
+    # grab latency and GUI thread stalls while saving, in process against
+    # the daemon, e.g. `PYSP_CAPTURE_BACKEND=fake python daemon.py`
+    import os
+    import sys
+    import tempfile
+    import time
+    from PySide6.QtCore import QEventLoop, QTimer
+    from png_writer import OPTIMIZED_PNG_FILTER, save_png
+
+    app = QGuiApplication(sys.argv)
+    os.environ.setdefault('PYSP_CAPTURE_BACKEND', 'fake')
+    local = select_backend()
+    daemon = CaptureDaemon()
+    remote = DaemonBackend(daemon)
+
+    rounds = 20
+    for name, backend in (('in process', local), ('daemon', remote)):
+        backend.grab_shared()
+        start = time.perf_counter()
+        for _ in range(rounds):
+            backend.grab_shared()
+        elapsed = (time.perf_counter() - start) / rounds
+        print(f'grab_shared {name:10}: {elapsed * 1000:6.2f} ms')
+
+    def longest_stall(save) -> float:
+        """Longest gap between 10 ms timer ticks while `save` runs."""
+        ticks = []
+        timer = QTimer()
+        timer.timeout.connect(lambda: ticks.append(time.perf_counter()))
+        timer.start(10)
+        loop = QEventLoop()
+        QTimer.singleShot(50, lambda: save(loop))
+        loop.exec()
+        timer.stop()
+        return max(b - a for a, b in zip(ticks, ticks[1:]))
+
+    image = remote.grab()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'frame.png')
+
+        def save_here(loop):
+            save_png(image, path, OPTIMIZED_PNG_FILTER)
+            QTimer.singleShot(50, loop.quit)
+
+        def save_there(loop):
+            daemon.saved.connect(lambda *_: QTimer.singleShot(50, loop.quit))
+            daemon.save(image, path, OPTIMIZED_PNG_FILTER)
+
+        print(f'GUI stall, optimized save in process: {longest_stall(save_here) * 1000:6.1f} ms')
+        print(f'GUI stall, optimized save in daemon:  {longest_stall(save_there) * 1000:6.1f} ms')
+    remote.close()
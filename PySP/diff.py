@@ -0,0 +1,185 @@
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+import numpy as np
+from PySide6.QtCore import QRect, Qt
+from PySide6.QtGui import QImage
+
+from op_redact import image_pixels
+
+# per channel difference still counted as equal, absorbs JPEG noise and
+# dithering; one less than a power of two is fastest
+DIFF_TOLERANCE = 7
+# changes are grouped on a grid of cells this large, in pixels
+CELL_SIZE = 16
+
+
+@dataclass
+class DiffResult:
+    # changed areas, in pixels of the first image
+    boxes: List[QRect] = field(default_factory=list)
+    changed: int = 0
+    total: int = 0
+
+    @property
+    def percent(self) -> float:
+        return 100.0 * self.changed / self.total if self.total else 0.0
+
+
+def diff_mask(a: np.ndarray, b: np.ndarray, tolerance: int = DIFF_TOLERANCE) -> np.ndarray:
+    """Which pixels of two (h, w, 4) arrays differ by more than `tolerance`."""
+    if tolerance <= 0:
+        return a.view(np.uint32)[..., 0] != b.view(np.uint32)[..., 0]
+    # |a - b| without leaving uint8
+    delta = np.maximum(a, b)
+    delta -= np.minimum(a, b)
+    if tolerance < 255 and tolerance & (tolerance + 1) == 0:
+        # a byte is above 2^k - 1 if any bit from k up is set, so one
+        # masked test of the four channels as a uint32 does
+        high = np.uint32((0xFF & ~tolerance) * 0x01010101)
+        return (delta.view(np.uint32)[..., 0] & high) != 0
+    # any channel, the four booleans of a pixel read as one uint32
+    return (delta > tolerance).view(np.uint32)[..., 0] != 0
+
+
+def cell_grid(mask: np.ndarray, cell: int = CELL_SIZE) -> np.ndarray:
+    """Which `cell` sized squares of `mask` hold a change."""
+    height, width = mask.shape
+    rows, cols = -(-height // cell), -(-width // cell)
+    padded = np.zeros((rows * cell, cols * cell), dtype=bool)
+    padded[:height, :width] = mask
+    # rows of cells first, reducing over the middle axis of a 3D view
+    # is slow in NumPy, over the first one is fast
+    by_rows = padded.reshape(rows, cell, cols * cell).any(axis=1)
+    return by_rows.reshape(rows, cols, cell).any(axis=2)
+
+
+def _runs(row: np.ndarray) -> List[Tuple[int, int]]:
+    """(first, last) columns of the runs of True in `row`."""
+    edges = np.flatnonzero(np.diff(np.concatenate(([False], row, [False]))))
+    return list(zip(edges[::2].tolist(), (edges[1::2] - 1).tolist()))
+
+
+def group_cells(grid: np.ndarray) -> List[Tuple[int, int, int, int]]:
+    """Bounding boxes (top, left, bottom, right, inclusive) of touching cells.
+
+    Rows are cut into runs of changed cells, runs touching one in the row
+    above, diagonals included, are merged with a union-find. The work
+    follows the number of runs, not of cells.
+    """
+    # per run: row, first, last
+    runs: List[Tuple[int, int, int]] = []
+    parent: List[int] = []
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    above: List[Tuple[int, int, int]] = []
+    for r in np.flatnonzero(grid.any(axis=1)).tolist():
+        current = []
+        if runs and runs[-1][0] != r - 1:
+            above = []
+        j = 0
+        for first, last in _runs(grid[r]):
+            index = len(runs)
+            runs.append((r, first, last))
+            parent.append(index)
+            # runs above that end before this one starts cannot touch it
+            while j < len(above) and above[j][2] < first - 1:
+                j += 1
+            k = j
+            while k < len(above) and above[k][1] <= last + 1:
+                a, b = find(above[k][0]), find(index)
+                if a != b:
+                    parent[b] = a
+                k += 1
+            current.append((index, first, last))
+        above = current
+
+    boxes: dict = {}
+    for index, (r, first, last) in enumerate(runs):
+        root = find(index)
+        box = boxes.get(root)
+        if box is None:
+            boxes[root] = [r, first, r, last]
+        else:
+            box[1] = min(box[1], first)
+            box[2] = r
+            box[3] = max(box[3], last)
+    return [tuple(box) for box in boxes.values()]
+
+
+def _comparable(image: QImage, alpha: bool) -> QImage:
+    target = QImage.Format.Format_ARGB32 if alpha else QImage.Format.Format_RGB32
+    return image if image.format() == target else image.convertToFormat(target)
+
+
+def diff_images(
+    first: QImage, second: QImage, tolerance: int = DIFF_TOLERANCE,
+) -> DiffResult:
+    """Where `second` differs from `first`, in pixels of `first`.
+
+    An image of another size is scaled to the size of the first one.
+    Changed pixels are grouped by cells, boxes are then tightened to the
+    changed pixels inside them.
+    """
+    if second.size() != first.size():
+        second = second.scaled(
+            first.size(),
+            Qt.AspectRatioMode.IgnoreAspectRatio,
+            Qt.TransformationMode.SmoothTransformation,
+        )
+    alpha = first.hasAlphaChannel() or second.hasAlphaChannel()
+    first, second = _comparable(first, alpha), _comparable(second, alpha)
+    mask = diff_mask(image_pixels(first), image_pixels(second), tolerance)
+    result = DiffResult(changed=int(np.count_nonzero(mask)), total=mask.size)
+    if not result.changed:
+        return result
+    for top, left, bottom, right in group_cells(cell_grid(mask)):
+        y0, x0 = top * CELL_SIZE, left * CELL_SIZE
+        part = mask[y0:(bottom + 1) * CELL_SIZE, x0:(right + 1) * CELL_SIZE]
+        ys = np.flatnonzero(part.any(axis=1))
+        xs = np.flatnonzero(part.any(axis=0))
+        result.boxes.append(QRect(
+            x0 + int(xs[0]), y0 + int(ys[0]),
+            int(xs[-1] - xs[0]) + 1, int(ys[-1] - ys[0]) + 1,
+        ))
+    return result
+
+
+if __name__ == '__main__':
+    # two 4K captures of a page, the second with a few changed areas
+    import sys
+    import time
+    from PySide6.QtGui import QGuiApplication, QPainter, QColor
+
+    app = QGuiApplication(sys.argv)
+    before = QImage(3840, 2160, QImage.Format.Format_RGB32)
+    before.fill(QColor('#F3F3F3'))
+    painter = QPainter(before)
+    for line in range(0, 2160, 22):
+        painter.drawText(40, line, f'{line} the quick brown fox jumps over the lazy dog ' * 8)
+    painter.end()
+    after = before.copy()
+    painter = QPainter(after)
+    painter.fillRect(300, 200, 400, 120, QColor('#FFCC00'))
+    painter.drawText(2000, 1500, 'deployed')
+    painter.fillRect(3500, 2000, 200, 100, QColor('#3366FF'))
+    painter.end()
+
+    for tolerance in (0, DIFF_TOLERANCE, 10):
+        rounds = 10
+        start = time.perf_counter()
+        for _ in range(rounds):
+            result = diff_images(before, after, tolerance)
+        elapsed = (time.perf_counter() - start) / rounds
+        print(
+            f'tolerance {tolerance:2}: {len(result.boxes)} boxes, '
+            f'{result.percent:.3f}% changed in {elapsed * 1000:.1f} ms'
+        )
+    start = time.perf_counter()
+    result = diff_images(before, QImage(before.size(), QImage.Format.Format_RGB32))
+    print(f'everything changed: {len(result.boxes)} boxes in {(time.perf_counter() - start) * 1000:.1f} ms')
@@ -1,20 +1,30 @@
 import sys
 from enum import Enum
 from functools import partial
-from typing import List
+from typing import List, Dict, Optional
 from dataclasses import dataclass
 
 from PySide6.QtWidgets import QApplication
-from PySide6.QtCore import Qt, QPoint, QRect, QRectF, QSize, QObject, Signal, QSizeF, QMargins
-from PySide6.QtGui import QPixmap, QPainter, QCursor, QColor, QScreen, QMouseEvent, QKeyEvent, QPen, QAction, QBrush, QFont, QActionGroup, QTransform, QInputMethodEvent, QTextCursor
-from PySide6.QtWidgets import QLabel, QApplication, QGraphicsScene, QGraphicsView, QToolBar, QFrame, QGraphicsPixmapItem, QGraphicsRectItem, QGraphicsItem, QGraphicsTextItem, QGraphicsSceneMouseEvent, QGraphicsSceneHoverEvent, QGraphicsSceneContextMenuEvent
+from PySide6.QtCore import Qt, QCoreApplication, QPoint, QPointF, QRect, QRectF, QSize, QObject, Signal, QSizeF, QMargins
+from PySide6.QtGui import QPixmap, QImage, QPainter, QCursor, QColor, QScreen, QMouseEvent, QWheelEvent, QKeyEvent, QKeySequence, QPen, QAction, QBrush, QFont, QActionGroup, QTransform, QInputMethodEvent, QTextCursor, QPainterPath, QCloseEvent, QRegion, QFontDatabase
+from PySide6.QtWidgets import QLabel, QApplication, QFileDialog, QGraphicsScene, QGraphicsView, QToolBar, QFrame, QGraphicsPixmapItem, QGraphicsRectItem, QGraphicsPathItem, QGraphicsItem, QGraphicsTextItem, QGraphicsSceneMouseEvent, QGraphicsSceneHoverEvent, QGraphicsSceneContextMenuEvent, QWidget
 from PySide6.QtGui import QGuiApplication
-from PIL import ImageQt, Image
-from mss import ScreenShotError, mss
 from loguru import logger
 
 from theme import ThemeContainer
 from op_text import NodeTag
+from op_redact import RedactItem, RedactMode, image_pixels
+from op_pen import PenStroke
+from annotations import AnnotationIndex
+from undo import UndoStack, AddItem, MoveItem, ScaleItem, EditText
+from shotter import QtBackend
+from snap import SnapMap, SnapMapBuilder
+from loupe import Loupe
+from trim import trim_box
+from project import (
+    PROJECT_FILTER, TILE_SIZE, KeptTiles, ProjectData, ProjectFile,
+    annotation_of, build_item, rect_tuple, write_project,
+)
 
 
 @dataclass
@@ -23,6 +33,36 @@ class ImageData:
     position: QPoint
 
 
+@dataclass
+class ScreenSlice:
+    screen: QScreen
+    # device independent geometry of the screen, in scene coordinates
+    geometry: QRect
+    dpr: float
+    item: QGraphicsPixmapItem
+    # native pixels of the screen inside the original capture
+    native: QRect
+
+
+def stack_pixmaps(pixmaps: List[QPixmap], gap: int = 8) -> QPixmap:
+    """Put `pixmaps` below each other on one transparent pixmap."""
+    dpr = max(p.devicePixelRatio() for p in pixmaps)
+    sizes = [p.deviceIndependentSize() for p in pixmaps]
+    width = max(size.width() for size in sizes)
+    height = sum(size.height() for size in sizes) + gap * (len(pixmaps) - 1)
+    result = QPixmap((QSizeF(width, height) * dpr).toSize())
+    result.setDevicePixelRatio(dpr)
+    result.fill(Qt.GlobalColor.transparent)
+    painter = QPainter(result)
+    painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+    y = 0.0
+    for pixmap, size in zip(pixmaps, sizes):
+        painter.drawPixmap(QRectF(QPointF(0, y), size), pixmap, QRectF(pixmap.rect()))
+        y += size.height() + gap
+    painter.end()
+    return result
+
+
 class SelectionBorder(QGraphicsRectItem):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -38,9 +78,35 @@ class SelectionBorder(QGraphicsRectItem):
         )
 
 
+class SnapHint(QGraphicsRectItem):
+    """Outline of the window or region a click would select."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.setBrush(QBrush(QColor(0, 122, 204, 40)))
+        self.setPen(
+            QPen(
+                QColor(0, 122, 204, 255),
+                2,
+                Qt.PenStyle.DashLine,
+                Qt.PenCapStyle.FlatCap,
+                Qt.PenJoinStyle.MiterJoin,
+            )
+        )
+        self.hide()
+
+
 class Op(Enum):
     None_ = 0
     Text = 1
+    Pixelate = 2
+    Blur = 3
+    Pen = 4
+
+
+REDACT_MODES = {
+    Op.Pixelate: RedactMode.Pixelate,
+    Op.Blur: RedactMode.Blur,
+}
 
 
 class ResizeEdge(Enum):
@@ -55,76 +121,411 @@ class ResizeEdge(Enum):
     Left = 8
 
 
-class EditorView(QGraphicsView):
-    selectionUpdated = Signal(QRect)
-    editorClosed = Signal()
+class EditorScene(QGraphicsScene):
+    """State of one editing session, shared by the views of all screens.
 
-    def __init__(self, scene: QGraphicsScene, parent=None):
-        super().__init__(scene, parent)
-        self.setMouseTracking(True)
-        self.setVerticalScrollBarPolicy(
-            Qt.ScrollBarPolicy.ScrollBarAlwaysOff
-        )
-        self.setHorizontalScrollBarPolicy(
-            Qt.ScrollBarPolicy.ScrollBarAlwaysOff
-        )
-        self.setFrameStyle(QFrame.Shape.NoFrame)
+    Scene coordinates are device independent coordinates of the virtual
+    desktop, so a selection can span several screens.
+    """
+    selectionUpdated = Signal(QRect)
+    # 自动裁剪时，与背景色每个通道相差不超过这个值的像素也算背景
+    trimTolerance = 0
 
+    def __init__(self, parent=None):
+        super().__init__(parent)
         self.dragging = False
         self.draggingOrigin = QPoint()
         self.draggingSelection = False
         self.resizeEdge = ResizeEdge.None_
         # 选择区域
         self.selectionArea = QRect()
-        # 选择区域的图片内容，也就是明亮的部分
-        self.selectionAreaItem = QGraphicsPixmapItem(QPixmap())
         # 选择区域的边框，拖动可以改变选区大小
         self.selectionBorder = SelectionBorder(QRectF())
-        # 遮罩层，这是选区外的黑色半透明部分
-        self.screenMask = QGraphicsRectItem(self.scene().sceneRect())
-        # 原始的完整图片
+        # 多个选区：按住 Shift 在选区外拖动，当前选区会保存到这里，然后开始新的选区
+        self.regions: List[QRect] = []
+        self.regionBorders: List[SelectionBorder] = []
+        # 遮罩层，这是选区外的黑色半透明部分，选区是其中的一个洞
+        self.screenMask = QGraphicsPathItem()
+        # 原始的完整图片，物理像素，没有按屏幕切分
         self.original_pixmap = QPixmap()
+        # 同一张图片，用于直接读取像素，整个会话只转换一次
+        self.original_image = QImage()
+        # 每个屏幕上显示的那一部分图片
+        self.slices: List[ScreenSlice] = []
         # 当前的操作
         self.op = Op.None_
         # 所有添加到场景（画布）中的项
         self.history: List[QGraphicsItem] = []
+        # 标注项的空间索引，鼠标悬停和点击时用它查找标注
+        self.annotations = AnnotationIndex()
+        # 撤销/重做
+        self.undo_stack = UndoStack(parent=self)
+        # 正在拖动绘制的打码区域
+        self.redacting: Optional[RedactItem] = None
+        self.redactOrigin = QPoint()
+        # 正在绘制的笔画
+        self.drawing: Optional[PenStroke] = None
+        # 吸附：截图时在后台收集窗口和边缘，悬停时高亮，单击选中
+        self.snapMap: Optional[SnapMap] = None
+        self.snapKey = 0
+        self.snapHint = SnapHint()
+        self.snapCandidates: List[QRect] = []
+        self.snapLevel = 0
+        self.snapBuilder = SnapMapBuilder(self)
+        self.snapBuilder.ready.connect(self.set_snap_map)
+        # 截图左上角在 X11 根窗口中的物理坐标
+        self.nativeOrigin = QPoint()
+        # 重新打开的项目中没有解码的图块，再次保存时原样写回
+        self.keptTiles: Optional[KeptTiles] = None
 
     def reset(self):
-        self.scene().clear()
+        self.clear()
 
         self.dragging = False
         self.draggingOrigin = QPoint()
         self.draggingSelection = False
         self.resizeEdge = ResizeEdge.None_
         self.selectionArea = QRect()
-        self.selectionAreaItem = QGraphicsPixmapItem(QPixmap())
         self.selectionBorder = SelectionBorder(QRectF())
-        self.screenMask = QGraphicsRectItem(self.scene().sceneRect())
+        self.regions = []
+        self.regionBorders = []
+        self.screenMask = QGraphicsPathItem()
         self.screenMask.setBrush(QBrush(QColor(0, 0, 0, 128)))
         self.screenMask.setPen(QPen(Qt.GlobalColor.transparent))
         self.original_pixmap = QPixmap()
+        self.original_image = QImage()
+        self.slices.clear()
         self.selectOp(Op.None_)
         self.history.clear()
-        self.unsetCursor()
+        self.annotations.clear()
+        self.undo_stack.clear()
+        self.redacting = None
+        self.redactOrigin = QPoint()
+        self.drawing = None
+        self.snapMap = None
+        self.snapKey += 1
+        self.snapHint = SnapHint()
+        self.snapCandidates = []
+        self.snapLevel = 0
+        self.keptTiles = None
 
     def start_edit(self, pixmap: QPixmap):
-        self.reset()  # TODO Remove this
+        """Cut a native virtual desktop capture into one slice per screen.
+
+        Every slice keeps the native pixels of its screen and is tagged
+        with that screen's device pixel ratio.
+        """
+        self.reset()
 
         self.original_pixmap = pixmap
-        self.scene().setSceneRect(
-            QRect(
-                QPoint(0, 0),
-                pixmap.deviceIndependentSize().toSize(),
+        self.original_image = pixmap.toImage().convertToFormat(
+            QImage.Format.Format_RGB32
+        )
+        native_geometries = QtBackend.native_geometries()
+        origin = QRect()
+        for rect in native_geometries:
+            origin = origin.united(rect)
+        origin = origin.topLeft()
+        self.nativeOrigin = origin
+
+        scene_rect = QRect()
+        for screen, native in zip(QGuiApplication.screens(), native_geometries):
+            native = native.translated(-origin)
+            part = pixmap.copy(native)
+            part.setDevicePixelRatio(screen.devicePixelRatio())
+            item = self.addPixmap(part)
+            item.setPos(screen.geometry().topLeft())
+            self.slices.append(ScreenSlice(
+                screen=screen,
+                geometry=screen.geometry(),
+                dpr=screen.devicePixelRatio(),
+                item=item,
+                native=native.intersected(self.original_image.rect()),
+            ))
+            scene_rect = scene_rect.united(screen.geometry())
+            logger.debug(
+                'editor.slice screen={}, geometry={}, dpr={}',
+                screen.name(), screen.geometry(), screen.devicePixelRatio(),
             )
+        self.setSceneRect(scene_rect)
+
+        self.addItem(self.screenMask)
+        self.addItem(self.snapHint)
+        self.addItem(self.selectionBorder)
+        self.update_selection_area()
+
+        # our own windows are left out of the window map
+        exclude = {int(view.winId()) for view in self.views()}
+        self.snapBuilder.start(
+            self.snapKey, self.original_image, origin, exclude,
+        )
+
+    def set_snap_map(self, key: int, snap: SnapMap):
+        if key != self.snapKey:
+            return
+        self.snapMap = snap
+        self.update_snap(QCursor.pos())
+
+    def to_native(self, point: QPoint) -> Optional[QPoint]:
+        """Scene point to a native pixel of the capture."""
+        for s in self.slices:
+            if s.geometry.contains(point):
+                offset = QPointF(point - s.geometry.topLeft()) * s.dpr
+                return s.native.topLeft() + offset.toPoint()
+        return None
+
+    def native_rect(self, area: QRect) -> Optional[QRect]:
+        """Native pixels of the capture under `area`, if it is on one screen."""
+        for s in self.slices:
+            if s.geometry.contains(area):
+                scaled = QRectF(area.translated(-s.geometry.topLeft()))
+                scaled = QRectF(
+                    scaled.topLeft() * s.dpr, scaled.size() * s.dpr,
+                )
+                return scaled.toAlignedRect().translated(
+                    s.native.topLeft()
+                ).intersected(s.native)
+        return None
+
+    def from_native(self, rect: QRect) -> QRect:
+        """Native rectangle of the capture to scene coordinates."""
+        for s in self.slices:
+            if s.native.contains(rect.center()):
+                scaled = QRectF(rect.translated(-s.native.topLeft()))
+                scaled = QRectF(
+                    scaled.topLeft() / s.dpr, scaled.size() / s.dpr,
+                )
+                return scaled.translated(
+                    QPointF(s.geometry.topLeft())
+                ).toAlignedRect().intersected(s.geometry)
+        return QRect()
+
+    def update_snap(self, point: QPoint):
+        """Highlight the snapping target under `point` (scene coordinates)."""
+        if self.snapMap is None or self.op != Op.None_ \
+                or not self.selectionArea.normalized().isEmpty():
+            self.snapCandidates = []
+            self.snapHint.hide()
+            return
+        native = self.to_native(point)
+        if native is None:
+            self.snapHint.hide()
+            return
+        candidates = [
+            self.from_native(rect)
+            for rect in self.snapMap.candidates_at(native)
+        ]
+        candidates = [rect for rect in candidates if not rect.isEmpty()]
+        # the whole screen is always the outermost target
+        for s in self.slices:
+            if s.geometry.contains(point) and s.geometry not in candidates:
+                candidates.append(s.geometry)
+        if candidates != self.snapCandidates:
+            self.snapCandidates = candidates
+            self.snapLevel = 0
+        self.show_snap()
+
+    def cycle_snap(self, step: int):
+        """Move the highlight to a larger (+1) or smaller (-1) target."""
+        if not self.snapCandidates:
+            return
+        self.snapLevel = max(
+            0, min(len(self.snapCandidates) - 1, self.snapLevel + step)
+        )
+        self.show_snap()
+
+    def show_snap(self):
+        if not self.snapCandidates:
+            self.snapHint.hide()
+            return
+        rect = self.snapCandidates[self.snapLevel]
+        if self.snapHint.rect() != QRectF(rect):
+            self.snapHint.setRect(QRectF(rect))
+        self.snapHint.show()
+
+    def add_annotation(self, item: QGraphicsItem, undoable: bool = True):
+        """Add a finished (or, for text, a new) annotation to the session."""
+        self.attach_annotation(item)
+        if isinstance(item, NodeTag):
+            # keep the index in sync while the text is moved, scaled or edited
+            reindex = partial(self.annotations.update, item)
+            item.xChanged.connect(reindex)
+            item.yChanged.connect(reindex)
+            item.scaleChanged.connect(reindex)
+            item.widthChanged.connect(reindex)
+            item.heightChanged.connect(reindex)
+            item.document().contentsChanged.connect(reindex)
+            item.moved.connect(
+                lambda old, new: self.undo_stack.push(MoveItem(item, old, new))
+            )
+            item.scaled.connect(
+                lambda old, new: self.undo_stack.push(ScaleItem(item, old, new))
+            )
+            item.edited.connect(
+                lambda old, new: self.undo_stack.push(EditText(item, old, new))
+            )
+        if undoable:
+            self.undo_stack.push(AddItem(self, item))
+
+    def attach_annotation(self, item: QGraphicsItem):
+        if item.scene() is not self:
+            self.addItem(item)
+        self.history.append(item)
+        self.annotations.add(item)
+
+    def detach_annotation(self, item: QGraphicsItem):
+        if item.hasFocus():
+            self.clearFocus()
+        self.removeItem(item)
+        self.history.remove(item)
+        self.annotations.remove(item)
+
+    def redact_sources(self):
+        """(scene geometry, dpr, native pixels) of every screen.
+
+        The pixels are views into `original_image`, nothing is copied.
+        """
+        pixels = image_pixels(self.original_image)
+        return [
+            (
+                s.geometry,
+                s.dpr,
+                pixels[
+                    s.native.top():s.native.bottom() + 1,
+                    s.native.left():s.native.right() + 1,
+                ],
+            )
+            for s in self.slices
+        ]
+
+    def start_redact(self, point: QPoint):
+        item = RedactItem(REDACT_MODES[self.op], self.redact_sources())
+        self.addItem(item)
+        self.redacting = item
+        self.redactOrigin = point
+        logger.debug(
+            'item.redact start @({x}, {y})', x=point.x(), y=point.y(),
+        )
+
+    def update_redact(self, point: QPoint):
+        area = QRect(self.redactOrigin, point).normalized()
+        # never redact outside of the selection, that part is not exported
+        self.redacting.set_area(
+            area.intersected(self.selectionArea.normalized())
+        )
+
+    def finish_redact(self, point: QPoint):
+        self.update_redact(point)
+        item = self.redacting
+        self.redacting = None
+        if item.area.isEmpty():
+            self.removeItem(item)
+            return
+        item.finish()
+        self.add_annotation(item)
+
+    def start_stroke(self, point: QPointF):
+        # take every mouse move while drawing, Qt merges them by default
+        QCoreApplication.setAttribute(
+            Qt.ApplicationAttribute.AA_CompressHighFrequencyEvents, False,
+        )
+        self.drawing = PenStroke(point)
+        self.addItem(self.drawing)
+
+    def finish_stroke(self):
+        QCoreApplication.setAttribute(
+            Qt.ApplicationAttribute.AA_CompressHighFrequencyEvents, True,
+        )
+        item = self.drawing
+        self.drawing = None
+        item.finish()
+        self.add_annotation(item)
+
+    def selectOp(self, op: Op):
+        self.op = op
+        if self.op == Op.None_:
+            self.clearFocus()
+        for view in self.views():
+            view.update_cursor_shape(view.cursor_scene_pos())
+
+    def add_region(self):
+        """Keep the current selection as a region and clear it for the next one."""
+        area = self.selectionArea.normalized()
+        if area.isEmpty():
+            return
+        self.regions.append(area)
+        border = SelectionBorder(QRectF(area.adjusted(-1, -1, 1, 1)))
+        self.addItem(border)
+        self.regionBorders.append(border)
+        self.selectionArea = QRect()
+        self.selectionBorder.setRect(QRectF())
+        logger.debug('selection.region.add {}, regions={}', area, len(self.regions))
+
+    def selection_areas(self) -> List[QRect]:
+        """The kept regions, then the current selection if there is one."""
+        areas = list(self.regions)
+        area = self.selectionArea.normalized()
+        if not area.isEmpty():
+            areas.append(area)
+        return areas
+
+    def project_data(self) -> ProjectData:
+        """The session as vector data, the capture itself goes apart."""
+        return ProjectData(
+            width=self.original_image.width(),
+            height=self.original_image.height(),
+            selection=rect_tuple(self.selectionArea.normalized()),
+            regions=[rect_tuple(area) for area in self.regions],
+            annotations=[
+                annotation for annotation in map(annotation_of, self.history)
+                if annotation is not None
+            ],
+            screens=[(rect_tuple(s.geometry), s.dpr) for s in self.slices],
+        )
+
+    def restore_project(self, data: ProjectData):
+        """Selections and annotations of a saved session, after `start_edit`.
+
+        Scene coordinates only match when the screens are laid out as they
+        were when it was saved, `EditorWindow.open_project` checks that.
+        """
+        for area in data.regions:
+            self.selectionArea = QRect(*area)
+            self.add_region()
+        self.selectionArea = QRect(*data.selection)
+        self.update_selection_area()
+        # reopened annotations are where undo starts from
+        for annotation in data.annotations:
+            self.add_annotation(build_item(annotation, self), undoable=False)
+
+    def trim_area(self, area: QRect) -> QRect:
+        """`area` shrunk to the content inside its uniform border."""
+        native = self.native_rect(area)
+        if native is None or native.isEmpty():
+            logger.debug('selection.trim skip area={}', area)
+            return area
+        pixels = image_pixels(self.original_image)[
+            native.top():native.bottom() + 1, native.left():native.right() + 1
+        ]
+        box = trim_box(pixels, self.trimTolerance)
+        if box is None:
+            return area
+        left, top, right, bottom = box
+        content = QRect(
+            native.left() + left, native.top() + top, right - left, bottom - top,
         )
-        self.setFixedSize(pixmap.deviceIndependentSize().toSize())
-        self.screenMask.setRect(self.scene().sceneRect())
-        self.scene().addPixmap(pixmap)
-        self.scene().addItem(self.screenMask)
-        self.scene().addItem(self.selectionAreaItem)
-        self.scene().addItem(self.selectionBorder)
+        return self.from_native(content).intersected(area)
+
+    def trim_selection(self):
+        """Shrink every selection to its content."""
+        self.regions = [self.trim_area(area) for area in self.regions]
+        for border, area in zip(self.regionBorders, self.regions):
+            border.setRect(QRectF(area.adjusted(-1, -1, 1, 1)))
+        area = self.selectionArea.normalized()
+        if not area.isEmpty():
+            self.selectionArea = self.trim_area(area)
+            logger.debug('selection.trim {} => {}', area, self.selectionArea)
         self.update_selection_area()
-        self.update_cursor_shape(QCursor.pos())
 
     def update_selection_border(self):
         area = self.selectionArea.normalized()
@@ -132,32 +533,142 @@ class EditorView(QGraphicsView):
         # draw four small circle points on the corners
         # self.selectionBorder.
 
-    def update_cursor_shape(self, pos: QPoint):
+    def update_selection_area(self):
         area = self.selectionArea.normalized()
+        # every selection is a hole in the mask, so the untouched capture
+        # shows through at each screen's own pixel ratio
+        mask = QRegion(self.sceneRect().toRect())
+        for hole in self.selection_areas():
+            mask -= QRegion(hole)
+        path = QPainterPath()
+        path.addRegion(mask)
+        self.screenMask.setPath(path)
+        if not area.isEmpty():
+            self.snapHint.hide()
+            self.update_selection_border()
+        # also when empty, kept regions alone still need the toolbar
+        self.selectionUpdated.emit(area)
+
+    def result_dpr(self, area: QRect) -> float:
+        """The highest pixel ratio among the screens `area` spans."""
+        ratios = [s.dpr for s in self.slices if s.geometry.intersects(area)]
+        return max(ratios, default=1.0)
+
+    def get_results(self) -> List[ImageData]:
+        """Render every selection area, all from the one frozen capture."""
+        self.clearFocus()
+        self.clearSelection()
+
+        overlays = [
+            item for item in (
+                self.screenMask, self.selectionBorder, self.snapHint,
+                *self.regionBorders,
+            ) if item.isVisible()
+        ]
+        for item in overlays:
+            item.hide()
+        results = [
+            ImageData(image=self.render_area(area), position=area.topLeft())
+            for area in self.selection_areas()
+        ]
+        for item in overlays:
+            item.show()
+        return results
+
+    def render_area(self, area: QRect) -> QPixmap:
+        dpr = self.result_dpr(area)
+        logger.debug(
+            'selection_area=({x}, {y}) size=({w}×{h}), dpr={dpr}',
+            x=area.x(), y=area.y(),
+            w=area.width(), h=area.height(),
+            dpr=dpr,
+        )
+
+        pixmap = QPixmap((QSizeF(area.size()) * dpr).toSize())
+        pixmap.setDevicePixelRatio(dpr)
+        pixmap.fill(Qt.GlobalColor.transparent)
+
+        # a selection spanning screens is assembled from their slices here
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+        self.render(
+            painter,
+            QRectF(QPointF(0, 0), QSizeF(area.size())),
+            QRectF(area),
+            Qt.AspectRatioMode.IgnoreAspectRatio,
+        )
+        painter.end()
+        return pixmap
+
+
+class EditorView(QGraphicsView):
+    """Full screen window showing one screen's part of an `EditorScene`."""
+    editorClosed = Signal()
+    # scene position of the cursor, on every mouse move
+    cursorMoved = Signal(QPoint)
+
+    def __init__(self, scene: EditorScene, screen: QScreen, parent=None):
+        super().__init__(scene, parent)
+        self.setWindowFlags(
+            self.windowFlags()
+            | Qt.WindowType.WindowStaysOnTopHint
+            | Qt.WindowType.FramelessWindowHint
+        )
+        self.setAttribute(Qt.WidgetAttribute.WA_InputMethodEnabled)
+        self.setMouseTracking(True)
+        self.setVerticalScrollBarPolicy(
+            Qt.ScrollBarPolicy.ScrollBarAlwaysOff
+        )
+        self.setHorizontalScrollBarPolicy(
+            Qt.ScrollBarPolicy.ScrollBarAlwaysOff
+        )
+        self.setAlignment(
+            Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop
+        )
+        self.setFrameStyle(QFrame.Shape.NoFrame)
+        self.set_screen(screen)
+
+    def set_screen(self, screen: QScreen):
+        self.screen_ = screen
+        self.setScreen(screen)
+        self.setSceneRect(QRectF(screen.geometry()))
+        self.setGeometry(screen.geometry())
+
+    def scene(self) -> EditorScene:
+        return super().scene()
+
+    def scene_point(self, pos: QPoint) -> QPoint:
+        return self.mapToScene(pos).toPoint()
+
+    def scene_pointf(self, pos: QPointF) -> QPointF:
+        # mapToScene only takes integer points, keep sub-pixel precision
+        return self.viewportTransform().inverted()[0].map(pos)
+
+    def cursor_scene_pos(self) -> QPoint:
+        return self.scene_point(self.mapFromGlobal(QCursor.pos()))
+
+    def closeEvent(self, event: QCloseEvent):
+        self.editorClosed.emit()
+        return event.ignore()
+
+    def update_cursor_shape(self, pos: QPoint):
+        scene = self.scene()
+        area = scene.selectionArea.normalized()
         if area.isEmpty():
             self.setCursor(QCursor(Qt.CursorShape.CrossCursor))
             return
 
-        if self.op == Op.Text:
-            # check if there's a text item under the cursor
-            item = self.scene().itemAt(pos, QTransform())
+        if scene.op == Op.Text:
+            # check if there's a text item under the cursor, the index
+            # skips the background, the mask and the selection border
+            item = scene.annotations.item_at(pos, NodeTag)
             if item is None:
                 return self.setCursor(QCursor(Qt.CursorShape.IBeamCursor))
-            elif isinstance(item, NodeTag):
-                logger.debug(
-                    "over.text, text={}, pos={}",
-                    item.toPlainText(), pos,
-                )
+            else:
                 shape = item.get_cursor_shape(item.mapFromScene(pos))
                 return self.setCursor(shape)
-            elif item in [self.screenMask, self.selectionAreaItem, self.selectionBorder]:
-                # self.unsetCursor()
-                self.setCursor(QCursor(Qt.CursorShape.IBeamCursor))
-                return
-            else:
-                pass
-                # item.update_cursor_shape(item.mapFromScene(pos))
-            # return
+        elif scene.op in REDACT_MODES or scene.op == Op.Pen:
+            return self.setCursor(QCursor(Qt.CursorShape.CrossCursor))
         # elif self.op == Op.None_:
         #     self.unsetCursor()
 
@@ -202,27 +713,12 @@ class EditorView(QGraphicsView):
                 self.setCursor(QCursor(Qt.CursorShape.CrossCursor))
                 # self.unsetCursor()
 
-    def selectOp(self, op: Op):
-        self.op = op
-        if self.op == Op.None_:
-            self.scene().clearFocus()
-        self.update_cursor_shape(self.mapFromGlobal(QCursor.pos()))
-
-    def update_selection_area(self):
-        area = self.selectionArea.normalized()
-        if not area.isEmpty():
-            dpr = self.original_pixmap.devicePixelRatioF()
-            pixmap_area = QRectF(
-                area.topLeft().toPointF() * dpr,
-                area.size().toSizeF() * dpr,
-            ).toRect()
-            self.selectionAreaItem.setPixmap(
-                self.original_pixmap.copy(pixmap_area)
-            )
-            self.selectionAreaItem.setPos(area.topLeft())
-            # self.selectionAreaItem.stackBefore(self.screenMask)
-            self.selectionUpdated.emit(area)
-            self.update_selection_border()
+    def wheelEvent(self, event: QWheelEvent):
+        scene = self.scene()
+        if scene.snapHint.isVisible() and not scene.dragging:
+            scene.cycle_snap(1 if event.angleDelta().y() > 0 else -1)
+            return
+        return super().wheelEvent(event)
 
     # def keyPressEvent(self, event: QKeyEvent):
     #     if event.key() == Qt.Key.Key_Escape:
@@ -230,8 +726,9 @@ class EditorView(QGraphicsView):
     #     super().keyPressEvent(event)
 
     def mousePressEvent(self, event: QMouseEvent):
+        scene = self.scene()
         if event.button() == Qt.MouseButton.LeftButton:
-            point = event.position().toPoint()
+            point = self.scene_point(event.position().toPoint())
 
             # when double clicking, check if an item is under the cursor
             # and if so, let the item handle the event (typically entering edit mode)
@@ -239,12 +736,13 @@ class EditorView(QGraphicsView):
                 return super().mousePressEvent(event)
 
             # create a new selection area
-            if self.selectionArea.normalized().isEmpty():
+            if scene.selectionArea.normalized().isEmpty():
                 logger.debug(
                     'drag.start @({x}, {y})', x=point.x(), y=point.y(),
                 )
-                self.dragging = True
-                self.selectionArea.setTopLeft(event.position().toPoint())
+                scene.dragging = True
+                scene.draggingOrigin = point
+                scene.selectionArea.setTopLeft(point)
                 # this is intentionally left out because on Hi-DPI screens
                 # it would produce tiny selection area (1x1 px) that's hard to see,
                 # and it's not very useful anyway.
@@ -253,45 +751,58 @@ class EditorView(QGraphicsView):
                 # self.update()
             # resize the selection area if cursor is outside the selection area
             else:
-                area = self.selectionArea.normalized()
-                if self.selectionArea != area:
-                    self.selectionArea = area
+                area = scene.selectionArea.normalized()
+                if scene.selectionArea != area:
+                    scene.selectionArea = area
                     logger.debug('selection area normalized on the fly')
 
-                if self.op == Op.Text:
+                if scene.op in REDACT_MODES:
+                    scene.start_redact(point)
+                    return
+
+                if scene.op == Op.Pen:
+                    scene.start_stroke(self.scene_pointf(event.position()))
+                    return
+
+                if scene.op == Op.Text:
                     # check if there's already a text item under the cursor
-                    item = self.scene().itemAt(point, QTransform())
-                    if item is None or item in [self.screenMask, self.selectionArea, self.selectionBorder]:
+                    item = scene.annotations.item_at(point, NodeTag)
+                    if item is None:
                         text_item = NodeTag('text')
-                        self.history.append(text_item)
-                        self.scene().addItem(text_item)
                         # put text item at cursor position, align the cursor position to center of left edge of text item
                         text_item.setPos(
                             point.x(),
                             point.y() - text_item.boundingRect().height() / 2
                         )
-                        # item might have been shrinked, so we need to update
-                        # the whole view, in case some drawn content is still at the old position
-                        text_item.scaleChanged.connect(self.update)
-                        text_item.xChanged.connect(self.update)
-                        text_item.yChanged.connect(self.update)
-                        text_item.widthChanged.connect(self.update)
-                        text_item.heightChanged.connect(self.update)
+                        scene.add_annotation(text_item)
                         logger.debug(
                             'item.text added @({x}, {y})', x=point.x(), y=point.y()
                         )
                         cursor = text_item.textCursor()
                         cursor.select(QTextCursor.SelectionType.Document)
                         text_item.setTextCursor(cursor)
-                    elif isinstance(item, NodeTag):
+                    else:
                         item.setFocus()
                         logger.debug('item.text edit')
                     return super().mousePressEvent(event)
 
+                # Shift + drag outside the selection adds another one
+                if event.modifiers() & Qt.KeyboardModifier.ShiftModifier \
+                        and not area.contains(point):
+                    scene.add_region()
+                    scene.update_selection_area()
+                    logger.debug(
+                        'drag.start @({x}, {y})', x=point.x(), y=point.y(),
+                    )
+                    scene.dragging = True
+                    scene.draggingOrigin = point
+                    scene.selectionArea.setTopLeft(point)
+                    return
+
                 # if cursor is inside the selection area, drag the selection area
                 if area.adjusted(6, 6, -6, -6).contains(point):
-                    self.draggingOrigin = point
-                    self.draggingSelection = True
+                    scene.draggingOrigin = point
+                    scene.draggingSelection = True
                     return
 
                 # check if cursor is outside one of the four borders
@@ -305,210 +816,191 @@ class EditorView(QGraphicsView):
                 at_left = area.left() <= point.x() <= area.left() + 5
                 at_right = area.right() - 5 <= point.x() <= area.right()
                 if on_top and on_left:
-                    self.selectionArea.setTopLeft(point)
-                    self.resizeEdge = ResizeEdge.TopLeft
+                    scene.selectionArea.setTopLeft(point)
+                    scene.resizeEdge = ResizeEdge.TopLeft
                 elif on_top and on_right:
-                    self.selectionArea.setTopRight(point)
-                    self.resizeEdge = ResizeEdge.TopRight
+                    scene.selectionArea.setTopRight(point)
+                    scene.resizeEdge = ResizeEdge.TopRight
                 elif on_bottom and on_left:
-                    self.selectionArea.setBottomLeft(point)
-                    self.resizeEdge = ResizeEdge.BottomLeft
+                    scene.selectionArea.setBottomLeft(point)
+                    scene.resizeEdge = ResizeEdge.BottomLeft
                 elif on_bottom and on_right:
-                    self.selectionArea.setBottomRight(point)
-                    self.resizeEdge = ResizeEdge.BottomRight
+                    scene.selectionArea.setBottomRight(point)
+                    scene.resizeEdge = ResizeEdge.BottomRight
                 elif on_top:
-                    self.selectionArea.setTop(point.y())
-                    self.resizeEdge = ResizeEdge.Top
+                    scene.selectionArea.setTop(point.y())
+                    scene.resizeEdge = ResizeEdge.Top
                 elif on_bottom:
-                    self.selectionArea.setBottom(point.y())
-                    self.resizeEdge = ResizeEdge.Bottom
+                    scene.selectionArea.setBottom(point.y())
+                    scene.resizeEdge = ResizeEdge.Bottom
                 elif on_left:
-                    self.selectionArea.setLeft(point.x())
-                    self.resizeEdge = ResizeEdge.Left
+                    scene.selectionArea.setLeft(point.x())
+                    scene.resizeEdge = ResizeEdge.Left
                 elif on_right:
-                    self.selectionArea.setRight(point.x())
-                    self.resizeEdge = ResizeEdge.Right
+                    scene.selectionArea.setRight(point.x())
+                    scene.resizeEdge = ResizeEdge.Right
                 elif at_top and at_left:
-                    self.resizeEdge = ResizeEdge.TopLeft
+                    scene.resizeEdge = ResizeEdge.TopLeft
                 elif at_top and at_right:
-                    self.resizeEdge = ResizeEdge.TopRight
+                    scene.resizeEdge = ResizeEdge.TopRight
                 elif at_bottom and at_left:
-                    self.resizeEdge = ResizeEdge.BottomLeft
+                    scene.resizeEdge = ResizeEdge.BottomLeft
                 elif at_bottom and at_right:
-                    self.resizeEdge = ResizeEdge.BottomRight
+                    scene.resizeEdge = ResizeEdge.BottomRight
                 elif at_top:
-                    self.resizeEdge = ResizeEdge.Top
+                    scene.resizeEdge = ResizeEdge.Top
                 elif at_bottom:
-                    self.resizeEdge = ResizeEdge.Bottom
+                    scene.resizeEdge = ResizeEdge.Bottom
                 elif at_left:
-                    self.resizeEdge = ResizeEdge.Left
+                    scene.resizeEdge = ResizeEdge.Left
                 elif at_right:
-                    self.resizeEdge = ResizeEdge.Right
+                    scene.resizeEdge = ResizeEdge.Right
 
-                self.update_selection_area()
+                scene.update_selection_area()
                 # self.update()
 
     def mouseMoveEvent(self, event: QMouseEvent):
-        if self.dragging:
-            self.selectionArea.setBottomRight(event.position().toPoint())
-            area = self.selectionArea.normalized()
+        scene = self.scene()
+        # the mouse stays grabbed by this view when it leaves the screen,
+        # positions are mapped to scene coordinates so selections can span screens
+        point = self.scene_point(event.position().toPoint())
+        self.cursorMoved.emit(point)
+        if scene.dragging:
+            if scene.snapHint.isVisible():
+                # still a click until the mouse really moves
+                if (point - scene.draggingOrigin).manhattanLength() <= 3:
+                    return
+                scene.snapHint.hide()
+            scene.selectionArea.setBottomRight(point)
+            area = scene.selectionArea.normalized()
             logger.debug(
                 'drag.drag topLeft=({x}, {y}) size=({w}, {h})',
                 x=area.x(), y=area.y(),
                 w=area.width(), h=area.height(),
             )
-            self.update_selection_area()
-            self.update()
+            scene.update_selection_area()
             return
 
-        if self.draggingSelection:
-            point = event.position().toPoint()
-            # prevent from dragging the selection area outside the view
-            offset = point - self.draggingOrigin
-            preview = self.selectionArea.translated(offset)
-            if preview.left() < 0:
-                preview.translate(-preview.left(), 0)
-            if preview.top() < 0:
-                preview.translate(0, -preview.top())
-            if preview.right() > self.width():
-                preview.translate(self.width() - preview.right(), 0)
-            if preview.bottom() > self.height():
-                preview.translate(0, self.height() - preview.bottom())
-
-            self.draggingOrigin = point
-            self.selectionArea = preview
-            self.update_selection_area()
-            self.update()
+        if scene.draggingSelection:
+            # prevent from dragging the selection area outside the desktop
+            bounds = scene.sceneRect().toRect()
+            offset = point - scene.draggingOrigin
+            preview = scene.selectionArea.translated(offset)
+            if preview.left() < bounds.left():
+                preview.translate(bounds.left() - preview.left(), 0)
+            if preview.top() < bounds.top():
+                preview.translate(0, bounds.top() - preview.top())
+            if preview.right() > bounds.right():
+                preview.translate(bounds.right() - preview.right(), 0)
+            if preview.bottom() > bounds.bottom():
+                preview.translate(0, bounds.bottom() - preview.bottom())
+
+            scene.draggingOrigin = point
+            scene.selectionArea = preview
+            scene.update_selection_area()
+            return
+
+        if scene.redacting is not None:
+            scene.update_redact(point)
+            return
+
+        if scene.drawing is not None:
+            scene.drawing.add_point(self.scene_pointf(event.position()))
             return
 
-        point = event.position().toPoint()
         self.update_cursor_shape(point)
+        if scene.snapMap is not None:
+            scene.update_snap(point)
 
-        if self.op != Op.None_:
+        if scene.op != Op.None_:
             return super().mouseMoveEvent(event)
 
-        if self.resizeEdge == ResizeEdge.TopLeft:
-            self.selectionArea.setTopLeft(point)
-        elif self.resizeEdge == ResizeEdge.TopRight:
-            self.selectionArea.setTopRight(point)
-        elif self.resizeEdge == ResizeEdge.BottomLeft:
-            self.selectionArea.setBottomLeft(point)
-        elif self.resizeEdge == ResizeEdge.BottomRight:
-            self.selectionArea.setBottomRight(point)
-        elif self.resizeEdge == ResizeEdge.Top:
-            self.selectionArea.setTop(point.y())
-        elif self.resizeEdge == ResizeEdge.Bottom:
-            self.selectionArea.setBottom(point.y())
-        elif self.resizeEdge == ResizeEdge.Left:
-            self.selectionArea.setLeft(point.x())
-        elif self.resizeEdge == ResizeEdge.Right:
-            self.selectionArea.setRight(point.x())
+        if scene.resizeEdge == ResizeEdge.TopLeft:
+            scene.selectionArea.setTopLeft(point)
+        elif scene.resizeEdge == ResizeEdge.TopRight:
+            scene.selectionArea.setTopRight(point)
+        elif scene.resizeEdge == ResizeEdge.BottomLeft:
+            scene.selectionArea.setBottomLeft(point)
+        elif scene.resizeEdge == ResizeEdge.BottomRight:
+            scene.selectionArea.setBottomRight(point)
+        elif scene.resizeEdge == ResizeEdge.Top:
+            scene.selectionArea.setTop(point.y())
+        elif scene.resizeEdge == ResizeEdge.Bottom:
+            scene.selectionArea.setBottom(point.y())
+        elif scene.resizeEdge == ResizeEdge.Left:
+            scene.selectionArea.setLeft(point.x())
+        elif scene.resizeEdge == ResizeEdge.Right:
+            scene.selectionArea.setRight(point.x())
         else:
             return
-        logger.debug('resizeEdge={e}', e=self.resizeEdge)
-        self.update_selection_area()
+        logger.debug('resizeEdge={e}', e=scene.resizeEdge)
+        scene.update_selection_area()
 
     def mouseReleaseEvent(self, event: QMouseEvent):
-        if self.op != Op.None_:
+        scene = self.scene()
+        if scene.redacting is not None:
+            scene.finish_redact(self.scene_point(event.position().toPoint()))
+            return
+
+        if scene.drawing is not None:
+            scene.finish_stroke()
+            return
+
+        if scene.op != Op.None_:
             return super().mouseReleaseEvent(event)
 
         if event.button() == Qt.MouseButton.LeftButton:
-            point = event.position().toPoint()
-            if self.dragging:
+            point = self.scene_point(event.position().toPoint())
+            if scene.dragging:
                 logger.debug('drag.end @({x}, {y})', x=point.x(), y=point.y())
-                self.dragging = False
-                self.selectionArea.setBottomRight(point)
-                self.update_selection_area()
-                self.update()
+                scene.dragging = False
+                if scene.snapHint.isVisible():
+                    # a click selects the highlighted window or region
+                    scene.selectionArea = scene.snapHint.rect().toRect()
+                    logger.debug('drag.snap {}', scene.selectionArea)
+                else:
+                    scene.selectionArea.setBottomRight(point)
+                scene.update_selection_area()
                 self.update_cursor_shape(point)
                 return
 
-            if self.draggingSelection:
+            if scene.draggingSelection:
                 logger.debug(
                     'drag.selection.end @({x}, {y})', x=point.x(), y=point.y())
-                self.draggingSelection = False
-                self.draggingOrigin = QPoint()
+                scene.draggingSelection = False
+                scene.draggingOrigin = QPoint()
                 self.update_cursor_shape(point)
                 return
 
-            if self.resizeEdge != ResizeEdge.None_:
-                self.resizeEdge = ResizeEdge.None_
+            if scene.resizeEdge != ResizeEdge.None_:
+                scene.resizeEdge = ResizeEdge.None_
                 self.update_cursor_shape(point)
                 return
 
-    def get_result(self) -> QPixmap:
-        self.scene().clearFocus()
-        self.scene().clearSelection()
-        self.scene().update()
-
-        area = self.selectionArea.normalized()
-        logger.debug(
-            'selection_area=({x}, {y}) size=({w}×{h})',
-            x=area.x(), y=area.y(),
-            w=area.width(), h=area.height(),
-        )
-        dpr = self.original_pixmap.devicePixelRatioF()
-
-        pixmap_area = QRectF(
-            area.topLeft().toPointF(),  # somehow the topleft point coordinate is correct
-            # but the size (width and height) needs to be scaled by dpr
-            area.size().toSizeF() * dpr,
-        ).toRect()
-        logger.debug(
-            'pixmap_area=({x}, {y}) size=({w}×{h}), dpr={dpr}',
-            x=pixmap_area.x(), y=pixmap_area.y(),
-            w=pixmap_area.width(), h=pixmap_area.height(),
-            dpr=dpr,
-        )
-
-        pixmap = QPixmap(pixmap_area.size())
-        pixmap.setDevicePixelRatio(self.original_pixmap.devicePixelRatio())
-        painter = QPainter(pixmap)
-
-        self.scene().render(
-            painter,
-            pixmap.rect(),
-            pixmap_area,
-            Qt.AspectRatioMode.KeepAspectRatio,
-        )
-        painter.end()
-        return pixmap
 
+class EditorWindow(QObject):
+    """Drives one full screen `EditorView` window per `QScreen`.
 
-class EditorWindow(QLabel):
+    All views share one `EditorScene`; the toolbar and size tip move
+    into whichever window the selection currently ends on.
+    """
     pinned = Signal(ImageData)
     saved = Signal(QPixmap)
+    # List[QPixmap], when there are several selections
+    savedAll = Signal(list)
     copied = Signal(QPixmap)
+    closed = Signal()
 
     def __init__(self, themer: ThemeContainer):
         super().__init__()
 
         self.themer = themer
 
-        self.setWindowFlags(
-            self.windowFlags()
-            | Qt.WindowType.WindowStaysOnTopHint
-            | Qt.WindowType.FramelessWindowHint
-        )
-        self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
-        self.setAttribute(Qt.WidgetAttribute.WA_InputMethodEnabled)
-        self.setWindowState(
-            self.windowState()
-            | Qt.WindowState.WindowFullScreen
-        )
-
-        self.setWindowIcon(self.themer.get_icon("Capture"))
-        self.setWindowTitle("Fullscreen editor")
-
-        self.scene = QGraphicsScene(self)
-        self.editorView = EditorView(self.scene, self)
-        self.editorView.setRenderHints(
-            QPainter.RenderHint.Antialiasing
-            | QPainter.RenderHint.SmoothPixmapTransform
-        )
+        self.scene = EditorScene(self)
+        self.views: Dict[QScreen, EditorView] = {}
 
         # Floating toolbar
-        toolbar = QToolBar(self)
+        toolbar = QToolBar()
         toolbar.setStyleSheet("""
             QToolBar {
                 background-color: #F3F3F3;
@@ -526,6 +1018,45 @@ class EditorWindow(QLabel):
             partial(self.select_tool, Op.Text)
         )
 
+        self.action_op_pixelate: QAction = toolbar.addAction(
+            self.themer.get_icon("Pixelate"), "Pixelate",
+        )
+        self.action_op_pixelate.setCheckable(True)
+        self.toolGroup.addAction(self.action_op_pixelate)
+        self.action_op_pixelate.triggered.connect(
+            partial(self.select_tool, Op.Pixelate)
+        )
+
+        self.action_op_blur: QAction = toolbar.addAction(
+            self.themer.get_icon("Blur"), "Blur",
+        )
+        self.action_op_blur.setCheckable(True)
+        self.toolGroup.addAction(self.action_op_blur)
+        self.action_op_blur.triggered.connect(
+            partial(self.select_tool, Op.Blur)
+        )
+
+        self.action_op_pen: QAction = toolbar.addAction(
+            self.themer.get_icon("Pen"), "Draw",
+        )
+        self.action_op_pen.setCheckable(True)
+        self.toolGroup.addAction(self.action_op_pen)
+        self.action_op_pen.triggered.connect(
+            partial(self.select_tool, Op.Pen)
+        )
+
+        self.action_trim: QAction = toolbar.addAction("Trim")
+        self.action_trim.setToolTip("Trim uniform borders off the selection")
+        self.action_trim.setShortcut("T")
+        self.action_trim.triggered.connect(self.scene.trim_selection)
+
+        self.tool_actions: Dict[Op, QAction] = {
+            Op.Text: self.action_op_text,
+            Op.Pixelate: self.action_op_pixelate,
+            Op.Blur: self.action_op_blur,
+            Op.Pen: self.action_op_pen,
+        }
+
         toolbar.addSeparator()
         self.action_cancel: QAction = toolbar.addAction(
             self.themer.get_icon("Quit"), "Cancel",
@@ -548,15 +1079,34 @@ class EditorWindow(QLabel):
         )
         self.action_copy.triggered.connect(self.copy_result)
 
+        # not on the toolbar, only reachable through their shortcuts
+        self.action_undo = QAction("Undo", self)
+        self.action_undo.setShortcut(QKeySequence.StandardKey.Undo)
+        self.action_undo.triggered.connect(self.scene.undo_stack.undo)
+        self.action_redo = QAction("Redo", self)
+        self.action_redo.setShortcuts([
+            QKeySequence(QKeySequence.StandardKey.Redo),
+            QKeySequence("Ctrl+Y"),
+        ])
+        self.action_redo.triggered.connect(self.scene.undo_stack.redo)
+        self.action_copy_color = QAction("Copy color", self)
+        self.action_copy_color.setShortcut("C")
+        self.action_copy_color.triggered.connect(self.copy_color)
+        self.action_save_project = QAction("Save project", self)
+        self.action_save_project.setShortcut("Ctrl+Shift+S")
+        self.action_save_project.triggered.connect(self.save_project)
+        # the tray puts this one in its menu, it outlives editing sessions
+        self.action_auto_trim = QAction("Auto-trim selections", self)
+        self.action_auto_trim.setCheckable(True)
+
         self.toolbar = toolbar
         self.toolbar.hide()
-        self.editorView.selectionUpdated.connect(self.update_widgets)
-        self.editorView.editorClosed.connect(self.close)
+        self.scene.selectionUpdated.connect(self.update_widgets)
 
-        self.size_tip = QLabel(self)
+        self.size_tip = QLabel()
         tip_font = QFont("Fira Code", 12)
         if not tip_font.exactMatch():
-            for family in QFont.families():
+            for family in QFontDatabase.families():
                 if 'Mono' in family:
                     tip_font.setFamily(family)
                     break
@@ -576,65 +1126,198 @@ class EditorWindow(QLabel):
         ''')
         self.size_tip.hide()
 
+        # 放大镜和取色器，跟随鼠标
+        self.loupe = Loupe()
+
         self.themer.themeChanged.connect(self.update_icons)
 
     def select_tool(self, op: Op, *args):
         # click checked action to uncheck it
         logger.debug('args: {args}', args=args)
-        if self.editorView.op == op:
+        if self.scene.op == op:
             logger.debug('tool.uncheck {}', op)
             self.toolGroup.setExclusive(False)
-            if op == Op.Text:
-                self.action_op_text.setChecked(False)
-            self.editorView.selectOp(Op.None_)
+            self.tool_actions[op].setChecked(False)
+            self.scene.selectOp(Op.None_)
             self.toolGroup.setExclusive(True)
         else:
-            logger.debug('tool.switch {} => {}', self.editorView.op, op)
+            logger.debug('tool.switch {} => {}', self.scene.op, op)
             self.toolGroup.checkedAction().setChecked(False)
-            if op == Op.Text:
-                self.action_op_text.setChecked(True)
-            self.editorView.selectOp(op)
+            self.tool_actions[op].setChecked(True)
+            self.scene.selectOp(op)
+            self.loupe.hide()
 
     def unset_tool(self):
         self.toolGroup.setExclusive(False)
-        self.action_op_text.setChecked(False)
+        for action in self.tool_actions.values():
+            action.setChecked(False)
         self.toolGroup.setExclusive(True)
 
     def update_icons(self):
-        self.setWindowIcon(self.themer.get_icon("Capture"))
+        for view in self.views.values():
+            view.setWindowIcon(self.themer.get_icon("Capture"))
         self.action_cancel.setIcon(self.themer.get_icon("Quit"))
         self.action_pin.setIcon(self.themer.get_icon("Pin"))
         self.action_save.setIcon(self.themer.get_icon("Save"))
         self.action_copy.setIcon(self.themer.get_icon("CopyToClipboard"))
         self.action_op_text.setIcon(self.themer.get_icon("Text"))
+        self.action_op_pixelate.setIcon(self.themer.get_icon("Pixelate"))
+        self.action_op_blur.setIcon(self.themer.get_icon("Blur"))
+        self.action_op_pen.setIcon(self.themer.get_icon("Pen"))
+
+    def update_views(self):
+        """Create, keep or drop views so there is one per screen."""
+        screens = QGuiApplication.screens()
+        for screen in list(self.views):
+            if screen not in screens:
+                self.views.pop(screen).deleteLater()
+        for screen in screens:
+            view = self.views.get(screen)
+            if view is None:
+                view = EditorView(self.scene, screen)
+                view.setRenderHints(
+                    QPainter.RenderHint.Antialiasing
+                    | QPainter.RenderHint.SmoothPixmapTransform
+                )
+                view.setWindowIcon(self.themer.get_icon("Capture"))
+                view.setWindowTitle(f"Fullscreen editor ({screen.name()})")
+                # so the shortcuts work in whichever window has focus
+                view.addActions(self.toolbar.actions())
+                view.addActions([
+                    self.action_undo, self.action_redo, self.action_copy_color,
+                    self.action_save_project,
+                ])
+                view.editorClosed.connect(self.close)
+                view.cursorMoved.connect(self.update_loupe)
+                self.views[screen] = view
+            else:
+                view.set_screen(screen)
+
+    def view_at(self, point: QPoint) -> EditorView:
+        for view in self.views.values():
+            if view.sceneRect().contains(QPointF(point)):
+                return view
+        return next(iter(self.views.values()))
 
     def edit_new_capture(self, pixmap: QPixmap):
         logger.debug('editor.new_capture')
-        self.editorView.start_edit(pixmap)
-        self.showFullScreen()
+        self.update_views()
+        self.scene.start_edit(pixmap)
+        self.loupe.set_image(self.scene.original_image)
+        for view in self.views.values():
+            view.showFullScreen()
+            view.update_cursor_shape(view.cursor_scene_pos())
+        self.update_loupe(QCursor.pos())
+        active = self.view_at(QCursor.pos())
+        active.activateWindow()
+        active.setFocus()
+
+    def open_project(self, path: str):
+        """Edit a saved project again, as it was when it was saved."""
+        logger.debug('editor.open_project path={}', path)
+        project = ProjectFile(path)
+        try:
+            screens = [
+                (rect_tuple(screen.geometry()), screen.devicePixelRatio())
+                for screen in QGuiApplication.screens()
+            ]
+            if project.data.screens != screens:
+                # the selection and annotations would land on other pixels
+                raise ValueError('it was saved on another screen layout')
+            if project.tileSize == TILE_SIZE:
+                # only the tiles on the screens are inflated, the others
+                # are written back as they are when saving again
+                geometries = QtBackend.native_geometries()
+                origin = QRect()
+                for rect in geometries:
+                    origin = origin.united(rect)
+                image = project.image(
+                    [rect.translated(-origin.topLeft()) for rect in geometries]
+                )
+                kept = project.kept_tiles()
+            else:
+                image = project.image()
+                kept = None
+            self.edit_new_capture(QPixmap.fromImage(image))
+            self.scene.keptTiles = kept
+            self.scene.restore_project(project.data)
+        finally:
+            project.close()
+
+    def save_project(self):
+        selected = QFileDialog.getSaveFileName(
+            None, "Save project as", filter=PROJECT_FILTER,
+        )
+        if len(selected) > 0 and selected[0] != '':
+            self.save_project_to(selected[0])
+
+    def save_project_to(self, path: str):
+        # the text being typed is part of the project too
+        self.scene.clearFocus()
+        write_project(
+            path, self.scene.original_image, self.scene.project_data(),
+            self.scene.keptTiles,
+        )
+
+    def isVisible(self) -> bool:
+        return any(view.isVisible() for view in self.views.values())
 
-    def closeEvent(self, event):
+    def close(self):
         self.toolbar.hide()
         self.size_tip.hide()
-        self.scene.clear()
+        self.loupe.clear()
         self.unset_tool()
-        self.editorView.reset()
-        self.hide()
-        return event.ignore()
+        self.scene.reset()
+        for view in self.views.values():
+            view.unsetCursor()
+            view.hide()
+        self.closed.emit()
 
     def update_widgets(self, selectionArea: QRect):
         area = selectionArea.normalized()
-        if area.isEmpty():
+        areas = self.scene.selection_areas()
+        if not areas:
             self.toolbar.hide()
             return
 
+        # with only kept regions left, the toolbar stays by the last one
+        self.adjust_widget_positions(area if not area.isEmpty() else areas[-1])
+
         if not self.toolbar.isVisible():
             self.toolbar.show()
 
         if not self.size_tip.isVisible():
             self.size_tip.show()
 
-        self.adjust_widget_positions(selectionArea)
+    @staticmethod
+    def move_into(widget: QWidget, view: EditorView, scene_pos: QPoint):
+        """Place a floating widget at `scene_pos` inside the window of `view`."""
+        if widget.parent() is not view:
+            visible = widget.isVisible()
+            widget.setParent(view)
+            widget.setVisible(visible)
+        widget.move(scene_pos - view.sceneRect().topLeft().toPoint())
+
+    def update_loupe(self, point: QPoint):
+        """Follow the cursor at `point` (scene coordinates) with the loupe."""
+        native = self.scene.to_native(point)
+        # only while selecting, the tools need a clear view
+        if self.scene.op != Op.None_ or native is None:
+            self.loupe.hide()
+            return
+        self.loupe.set_position(point, native)
+        view = self.view_at(point)
+        self.move_into(
+            self.loupe, view,
+            self.loupe.place_near(point, view.sceneRect().toRect()),
+        )
+        if not self.loupe.isVisible():
+            self.loupe.show()
+            self.loupe.raise_()
+
+    def copy_color(self):
+        if self.loupe.isVisible():
+            self.loupe.copy_color()
 
     def adjust_widget_positions(self, selectionArea: QRect):
         outsideGap = 5
@@ -643,73 +1326,78 @@ class EditorWindow(QLabel):
         #  - else: on the bottom line of selection area (also to the left)
         area = selectionArea.normalized()
 
+        view = self.view_at(area.bottomLeft())
+        bottom = view.sceneRect().bottom()
         toolbarTopLeft = area.bottomLeft() + QPoint(0, outsideGap + 2)
         # toolbarTopLeft.setX(toolbarTopLeft.x() - 2)  # border width is 2px
-        if toolbarTopLeft.y() + self.toolbar.height() > self.height():
+        if toolbarTopLeft.y() + self.toolbar.height() > bottom:
             toolbarTopLeft.setY(
                 area.bottomLeft().y() - self.toolbar.height() + 2
             )
-        self.toolbar.move(toolbarTopLeft)
+        self.move_into(self.toolbar, view, toolbarTopLeft)
 
         # put size tip label above the selection area, with a gap
         # if there's not enough space above the selection area,
         # try to put it inside the selection area (to the top)
+        view = self.view_at(area.topLeft())
+        top = view.sceneRect().top()
         sizeTipTopLeft = area.topLeft() - QPoint(0, self.size_tip.height() + outsideGap)
-        if sizeTipTopLeft.y() < 0:
+        if sizeTipTopLeft.y() < top:
             sizeTipTopLeft.setY(area.topLeft().y())
         self.size_tip.setText(f'{area.width()}×{area.height()} px')
-        self.size_tip.move(sizeTipTopLeft)
+        self.move_into(self.size_tip, view, sizeTipTopLeft)
+
+    def get_results(self) -> List[ImageData]:
+        if self.action_auto_trim.isChecked():
+            self.scene.trim_selection()
+        return self.scene.get_results()
 
     def pin_result(self):
-        area = self.editorView.selectionArea.normalized()  # FIXME
-        self.pinned.emit(ImageData(
-            image=self.editorView.get_result(),
-            position=area.topLeft(),
-        ))
+        # scene coordinates are global, device independent coordinates,
+        # so each pin opens where its selection was
+        for result in self.get_results():
+            self.pinned.emit(result)
         self.close()
 
     def copy_result(self):
-        self.copied.emit(self.editorView.get_result())
+        # the clipboard holds one image, several selections are stacked
+        pixmaps = [result.image for result in self.get_results()]
+        self.copied.emit(
+            pixmaps[0] if len(pixmaps) == 1 else stack_pixmaps(pixmaps)
+        )
         self.close()
 
     def save_result(self):
-        self.saved.emit(self.editorView.get_result())
+        pixmaps = [result.image for result in self.get_results()]
+        if len(pixmaps) == 1:
+            self.saved.emit(pixmaps[0])
+        else:
+            self.savedAll.emit(pixmaps)
         # self.close()
 
 
 if __name__ == '__main__':
+    from shotter import select_backend
+
     app = QApplication(sys.argv)
     app.setQuitOnLastWindowClosed(True)
 
-    capturer = mss()
-    data: ScreenShotError = capturer.grab(capturer.monitors[0])
-    image = ImageQt.ImageQt(
-        Image.frombytes('RGB', data.size, data.bgra, 'raw', 'BGRX')
-    )
+    image = select_backend().grab()
     logger.debug(
         'shot.new raw_image_size={}, data_valid={}',
-        data.size,
+        image.size(),
         not image.isNull(),
     )
     pixmap = QPixmap.fromImage(image)
-    pixmap.setDevicePixelRatio(
-        QGuiApplication.primaryScreen().devicePixelRatio()
-    )
 
     themer = ThemeContainer()
 
-    class TmpEditorWindow(EditorWindow):
-        def closeEvent(self, event):
-            logger.debug('editor.close')
-            return event.accept()
-
-    editor = TmpEditorWindow(themer)
+    editor = EditorWindow(themer)
     editor.edit_new_capture(pixmap)
 
     text_item = NodeTag('text 1')
     text_item.setPos(300, 400)
-    editor.editorView.history.append(text_item)
-    editor.editorView.scene().addItem(text_item)
+    editor.scene.add_annotation(text_item)
 
     text_2 = QGraphicsTextItem('text 2')
     text_2.setPos(400, 400)
@@ -723,14 +1411,15 @@ if __name__ == '__main__':
     )
     text_2.setZValue(10)
     text_2.setDefaultTextColor(Qt.GlobalColor.green)
-    editor.editorView.history.append(text_2)
-    editor.editorView.scene().addItem(text_2)
+    editor.scene.add_annotation(text_2)
 
     def save_test_image(image: QPixmap):
         logger.debug('save_test_image')
         image.save('/tmp/test.png')
         editor.close()
+        app.quit()
 
     editor.saved.connect(save_test_image)
+    editor.action_cancel.triggered.connect(app.quit)
 
     sys.exit(app.exec())
@@ -0,0 +1,237 @@
+import os
+import time
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from functools import partial
+from multiprocessing import shared_memory
+from typing import List, Optional, Tuple
+
+from PySide6.QtCore import Qt, QObject, Signal
+from PySide6.QtGui import QImage, QPixmap
+from loguru import logger
+
+# file suffix => (Qt image format name, quality), -1 is Qt's default
+FORMATS = {
+    'png': ('png', -1),
+    'webp': ('webp', 90),
+}
+
+
+@dataclass
+class ExportJob:
+    shm_name: str
+    width: int
+    height: int
+    bytes_per_line: int
+    # QImage.Format value
+    image_format: int
+    path: str
+    format: str
+    quality: int
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # before Python 3.13 attaching registers the segment again, with the
+        # resource tracker spawned workers share with the GUI process, where
+        # it is registered already and the GUI's unlink unregisters it
+        return shared_memory.SharedMemory(name=name)
+
+
+def encode(job: ExportJob) -> Tuple[str, bool]:
+    """Worker side: encode the image in `job.shm_name` to `job.path`."""
+    shm = _attach(job.shm_name)
+    try:
+        image = QImage(
+            shm.buf, job.width, job.height, job.bytes_per_line,
+            QImage.Format(job.image_format),
+        )
+        ok = image.save(job.path, job.format, job.quality)
+        del image
+    finally:
+        shm.close()
+    return job.path, ok
+
+
+class BatchExporter(QObject):
+    """Encodes many images on a process pool.
+
+    Each image is copied once into a shared memory segment which the
+    worker wraps in a `QImage` without copying, so no pixels are pickled.
+    Only a few images per worker are staged at a time, which bounds the
+    shared memory in use however many pins are exported. Progress and
+    the result are signals, emitted on the GUI thread.
+    """
+    # done, total
+    progress = Signal(int, int)
+    # paths written, paths failed
+    finished = Signal(list, list)
+    _done = Signal(object, object)
+
+    def __init__(self, workers: Optional[int] = None, parent=None):
+        super().__init__(parent)
+        self.workers = workers or os.cpu_count() or 1
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.pending: List[Tuple[QPixmap, str]] = []
+        self.in_flight = 0
+        self.total = 0
+        self.written: List[str] = []
+        self.failed: List[str] = []
+        self.format = 'png'
+        self.started = 0.0
+        # queued even from the GUI thread: a job done before its callback
+        # is added calls back right away, in the middle of `_feed`
+        self._done.connect(self._on_done, Qt.ConnectionType.QueuedConnection)
+
+    def busy(self) -> bool:
+        return bool(self.pending) or self.in_flight > 0
+
+    def export(
+        self,
+        pixmaps: List[QPixmap],
+        directory: str,
+        format: str = 'png',
+        numbers: Optional[List[int]] = None,
+    ) -> bool:
+        """Start writing `pixmaps` into `directory`, False if already busy.
+
+        Files are numbered after `numbers`, or 1, 2, ... without it.
+        """
+        if self.busy() or format not in FORMATS:
+            return False
+        if self.executor is None:
+            # fork would copy the Qt GUI state of this process
+            self.executor = ProcessPoolExecutor(
+                self.workers, mp_context=multiprocessing.get_context('spawn'),
+            )
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        self.pending = [
+            (pixmap, os.path.join(directory, f'pysp-{stamp}-{index:02}.{format}'))
+            for index, pixmap in zip(numbers or range(1, len(pixmaps) + 1), pixmaps)
+        ]
+        self.format = format
+        self.total = len(self.pending)
+        self.written = []
+        self.failed = []
+        self.started = time.perf_counter()
+        logger.debug(
+            'export.start count={}, format={}, workers={}',
+            self.total, format, self.workers,
+        )
+        if not self.pending:
+            self.finished.emit([], [])
+            return True
+        self._feed()
+        return True
+
+    def _feed(self):
+        name, quality = FORMATS[self.format]
+        while self.pending and self.executor is not None \
+                and self.in_flight < self.workers * 2:
+            pixmap, path = self.pending.pop(0)
+            image = pixmap.toImage()
+            size = image.sizeInBytes()
+            shm = shared_memory.SharedMemory(create=True, size=max(1, size))
+            shm.buf[:size] = image.constBits()
+            job = ExportJob(
+                shm_name=shm.name,
+                width=image.width(),
+                height=image.height(),
+                bytes_per_line=image.bytesPerLine(),
+                image_format=image.format().value,
+                path=path,
+                format=name,
+                quality=quality,
+            )
+            try:
+                future = self.executor.submit(encode, job)
+            except BrokenProcessPool:
+                # a worker died, the job that tells is not reported yet
+                logger.exception('export.failed')
+                shm.close()
+                shm.unlink()
+                self.close()
+                self.failed.append(path)
+                self.progress.emit(len(self.written) + len(self.failed), self.total)
+                break
+            self.in_flight += 1
+            # runs on the executor's thread, hand over to the GUI thread
+            future.add_done_callback(partial(self._done.emit, shm))
+        self._settle()
+
+    def _settle(self):
+        """Fail what is left without a pool, report once nothing is left."""
+        if self.pending and self.executor is None:
+            self.failed.extend(path for _, path in self.pending)
+            self.pending = []
+        if not self.pending and self.in_flight == 0:
+            logger.debug(
+                'export.done written={}, failed={}, seconds={:.2f}',
+                len(self.written), len(self.failed),
+                time.perf_counter() - self.started,
+            )
+            self.finished.emit(self.written, self.failed)
+
+    def _on_done(self, shm: shared_memory.SharedMemory, future: Future):
+        self.in_flight -= 1
+        shm.close()
+        shm.unlink()
+        try:
+            path, ok = future.result()
+        except BrokenProcessPool:
+            logger.exception('export.failed')
+            # a worker died, start over with a new pool next time
+            self.close()
+            path, ok = '', False
+        except Exception:
+            logger.exception('export.failed')
+            path, ok = '', False
+        (self.written if ok else self.failed).append(path)
+        done = len(self.written) + len(self.failed)
+        self.progress.emit(done, self.total)
+        self._feed()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+
+if __name__ == '__main__':
+    # export 4K images with 1..N workers, e.g. `python export.py 40`
+    import sys
+    import tempfile
+    from PySide6.QtCore import QEventLoop
+    from PySide6.QtGui import QGuiApplication, QPainter, QColor
+
+    app = QGuiApplication(sys.argv)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    pixmaps = []
+    for index in range(count):
+        pixmap = QPixmap(3840, 2160)
+        pixmap.fill(QColor.fromHsv(index * 29 % 360, 90, 230))
+        painter = QPainter(pixmap)
+        for line in range(0, 2160, 24):
+            painter.drawText(20, line, f'pin {index} line {line} ' * 20)
+        painter.end()
+        pixmaps.append(pixmap)
+
+    cores = os.cpu_count() or 1
+    for workers in sorted({1, max(1, cores // 2), cores}):
+        exporter = BatchExporter(workers)
+        loop = QEventLoop()
+        exporter.finished.connect(lambda *_: loop.quit())
+        with tempfile.TemporaryDirectory() as directory:
+            # warm the pool up, spawning is not what is measured
+            exporter.export(pixmaps[:workers], directory)
+            loop.exec()
+            start = time.perf_counter()
+            exporter.export(pixmaps, directory)
+            loop.exec()
+            elapsed = time.perf_counter() - start
+        print(f'{workers:2} worker(s): {count} images in {elapsed:.2f} s')
+        exporter.close()
@@ -0,0 +1,434 @@
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import partial
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PySide6.QtCore import (
+    Qt, QAbstractListModel, QBuffer, QIODevice, QModelIndex, QObject, QSize,
+    QStandardPaths, QThreadPool, Signal,
+)
+from PySide6.QtGui import QImage, QPixmap
+from PySide6.QtWidgets import (
+    QDialog, QHBoxLayout, QLabel, QListView, QPushButton, QVBoxLayout,
+)
+from loguru import logger
+
+from op_redact import image_pixels
+
+THUMBNAIL_SIZE = 160
+# environment variable to keep no capture history, `0`
+HISTORY_ENV = 'PYSP_HISTORY'
+
+
+def default_path() -> str:
+    cache = QStandardPaths.writableLocation(
+        QStandardPaths.StandardLocation.GenericCacheLocation
+    )
+    return os.path.join(cache, 'pysp', 'index.sqlite')
+
+
+def dhash(image: QImage) -> int:
+    """64 bit difference hash: is each of 9×8 gray cells brighter than its left one."""
+    small = image.scaled(
+        9, 8,
+        Qt.AspectRatioMode.IgnoreAspectRatio,
+        Qt.TransformationMode.SmoothTransformation,
+    ).convertToFormat(QImage.Format.Format_RGB32)
+    pixels = image_pixels(small).astype(np.float32)
+    gray = pixels[..., 2] * 0.299 + pixels[..., 1] * 0.587 + pixels[..., 0] * 0.114
+    bits = (gray[:, 1:] > gray[:, :-1]).ravel()
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+if hasattr(np, 'bitwise_count'):
+    popcount = np.bitwise_count
+else:
+    _BYTE_BITS = np.array([bin(n).count('1') for n in range(256)], np.uint8)
+
+    def popcount(values: np.ndarray) -> np.ndarray:
+        counts = _BYTE_BITS[values.view(np.uint8)].reshape(-1, 8)
+        return counts.sum(axis=1, dtype=np.uint8)
+
+
+def _signed(value: int) -> int:
+    # SQLite integers are signed 64 bit
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+@dataclass
+class Digest:
+    created: float
+    kind: str
+    width: int
+    height: int
+    hash: int
+    path: str
+    thumbnail: bytes
+
+
+@dataclass
+class Entry:
+    id: int
+    created: float
+    kind: str
+    width: int
+    height: int
+    hash: int
+    path: str
+
+
+class CaptureIndex(QObject):
+    """Perceptual hashes and thumbnails of every pin and saved file.
+
+    Rows live in SQLite. The hashes are also kept in one NumPy array, so
+    a near duplicate lookup is an XOR and a popcount over all of them.
+    Thumbnails and hashes are computed on the global thread pool, only
+    the insert happens on the GUI thread.
+    """
+    # id of a new entry
+    added = Signal(int)
+    # how many of the oldest entries were dropped
+    trimmed = Signal(int)
+    # new pin id, id of the entry it duplicates, hash distance
+    duplicate = Signal(int, int, int)
+    _digested = Signal(object)
+
+    # hashes this close (in bits) are the same picture
+    duplicate_distance = 4
+    # older entries are dropped beyond this many
+    max_entries = 20_000
+
+    def __init__(self, path: Optional[str] = None, parent=None):
+        super().__init__(parent)
+        self.path = path or default_path()
+        # new captures are only indexed while enabled
+        self.enabled = os.environ.get(HISTORY_ENV, '1') != '0'
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('''
+            CREATE TABLE IF NOT EXISTS entries (
+                id INTEGER PRIMARY KEY,
+                created REAL NOT NULL,
+                kind TEXT NOT NULL,
+                width INTEGER NOT NULL,
+                height INTEGER NOT NULL,
+                hash INTEGER NOT NULL,
+                path TEXT NOT NULL DEFAULT '',
+                thumbnail BLOB NOT NULL
+            )
+        ''')
+        self.db.commit()
+
+        start = time.perf_counter()
+        rows = self.db.execute('SELECT id, hash FROM entries ORDER BY id').fetchall()
+        self.count = len(rows)
+        # grown by doubling, only the first `count` are valid
+        capacity = max(1024, self.count * 2)
+        self.ids = np.zeros(capacity, np.int64)
+        self.hashes = np.zeros(capacity, np.uint64)
+        if rows:
+            table = np.array(rows, dtype=np.int64)
+            self.ids[:self.count] = table[:, 0]
+            self.hashes[:self.count] = table[:, 1].view(np.uint64)
+        # decoded thumbnails, most recently used last
+        self.thumbnails: OrderedDict[int, QPixmap] = OrderedDict()
+        self.thumbnail_cache = 512
+        self._digested.connect(self._store)
+        logger.debug(
+            'index.load entries={}, seconds={:.3f}',
+            self.count, time.perf_counter() - start,
+        )
+
+    def add(self, pixmap: QPixmap, kind: str, path: str = ''):
+        """Index `pixmap` in the background, `kind` is pin or file."""
+        if not self.enabled:
+            return
+        # QPixmap belongs to the GUI thread, QImage can travel; a quick
+        # downscale keeps the full sized image from being copied here
+        image = pixmap.scaled(
+            QSize(THUMBNAIL_SIZE * 2, THUMBNAIL_SIZE * 2),
+            Qt.AspectRatioMode.KeepAspectRatio,
+            Qt.TransformationMode.FastTransformation,
+        ).toImage()
+        QThreadPool.globalInstance().start(partial(
+            self._digest, image, pixmap.size(), kind, path, time.time(),
+        ))
+
+    def _digest(self, image: QImage, size: QSize, kind: str, path: str, created: float):
+        thumbnail = image.scaled(
+            QSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE),
+            Qt.AspectRatioMode.KeepAspectRatio,
+            Qt.TransformationMode.SmoothTransformation,
+        )
+        buffer = QBuffer()
+        buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+        thumbnail.save(buffer, 'png')
+        self._digested.emit(Digest(
+            created=created,
+            kind=kind,
+            width=size.width(),
+            height=size.height(),
+            hash=dhash(thumbnail),
+            path=path,
+            thumbnail=bytes(buffer.data()),
+        ))
+
+    def _store(self, digest: Digest):
+        similar = self.similar(digest.hash, self.duplicate_distance, limit=1)
+        cursor = self.db.execute(
+            'INSERT INTO entries (created, kind, width, height, hash, path, thumbnail)'
+            ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (
+                digest.created, digest.kind, digest.width, digest.height,
+                _signed(digest.hash), digest.path, digest.thumbnail,
+            ),
+        )
+        self.db.commit()
+        entry_id = cursor.lastrowid
+        if self.count == len(self.ids):
+            self.ids = np.concatenate([self.ids, np.zeros_like(self.ids)])
+            self.hashes = np.concatenate([self.hashes, np.zeros_like(self.hashes)])
+        self.ids[self.count] = entry_id
+        self.hashes[self.count] = digest.hash
+        self.count += 1
+        logger.debug(
+            'index.add id={}, kind={}, hash={:016x}', entry_id, digest.kind, digest.hash,
+        )
+        self.added.emit(entry_id)
+        if digest.kind == 'pin' and similar:
+            self.duplicate.emit(entry_id, *similar[0])
+        if self.count > self.max_entries:
+            self.trim(self.count - self.max_entries)
+
+    def trim(self, excess: int):
+        """Drop the `excess` oldest entries."""
+        last = int(self.ids[excess - 1])
+        self.db.execute('DELETE FROM entries WHERE id <= ?', (last,))
+        self.db.commit()
+        for entry_id in self.ids[:excess].tolist():
+            self.thumbnails.pop(entry_id, None)
+        self.count -= excess
+        self.ids[:self.count] = self.ids[excess:excess + self.count]
+        self.hashes[:self.count] = self.hashes[excess:excess + self.count]
+        logger.debug('index.trim entries={}, kept={}', excess, self.count)
+        self.trimmed.emit(excess)
+
+    def similar(
+        self, hash: int, max_distance: int = 10, limit: int = 50,
+    ) -> List[Tuple[int, int]]:
+        """(id, distance) of the entries closest to `hash`, closest first."""
+        distances = popcount(self.hashes[:self.count] ^ np.uint64(hash))
+        hits = np.flatnonzero(distances <= max_distance)
+        hits = hits[np.argsort(distances[hits], kind='stable')][:limit]
+        return [(int(self.ids[i]), int(distances[i])) for i in hits]
+
+    def entry(self, entry_id: int) -> Optional[Entry]:
+        row = self.db.execute(
+            'SELECT id, created, kind, width, height, hash, path'
+            ' FROM entries WHERE id = ?', (entry_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        row = list(row)
+        row[5] &= (1 << 64) - 1
+        return Entry(*row)
+
+    def thumbnail(self, entry_id: int) -> QPixmap:
+        pixmap = self.thumbnails.get(entry_id)
+        if pixmap is not None:
+            self.thumbnails.move_to_end(entry_id)
+            return pixmap
+        row = self.db.execute(
+            'SELECT thumbnail FROM entries WHERE id = ?', (entry_id,),
+        ).fetchone()
+        pixmap = QPixmap()
+        if row is not None:
+            pixmap.loadFromData(row[0], 'png')
+        self.thumbnails[entry_id] = pixmap
+        if len(self.thumbnails) > self.thumbnail_cache:
+            self.thumbnails.popitem(last=False)
+        return pixmap
+
+    def close(self):
+        self.db.close()
+
+
+class HistoryModel(QAbstractListModel):
+    """Entries of a `CaptureIndex`, newest first, or only some of them.
+
+    Thumbnails are read when the view asks for them, so only the rows on
+    screen ever touch the database.
+    """
+
+    def __init__(self, index: CaptureIndex, parent=None):
+        super().__init__(parent)
+        self.captures = index
+        # entry ids to show, None for all of them
+        self.selected: Optional[List[int]] = None
+        # entries the view knows of, the index counts a new one before
+        # telling us about it
+        self.rows = index.count
+        index.added.connect(self.entry_added)
+        index.trimmed.connect(self.entries_trimmed)
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        if self.selected is not None:
+            return len(self.selected)
+        return self.rows
+
+    def entry_id(self, row: int) -> int:
+        if self.selected is not None:
+            return self.selected[row]
+        return int(self.captures.ids[self.rows - 1 - row])
+
+    def data(self, model_index: QModelIndex, role=Qt.ItemDataRole.DisplayRole):
+        if not model_index.isValid():
+            return None
+        entry_id = self.entry_id(model_index.row())
+        if role == Qt.ItemDataRole.DecorationRole:
+            return self.captures.thumbnail(entry_id)
+        if role == Qt.ItemDataRole.ToolTipRole:
+            entry = self.captures.entry(entry_id)
+            if entry is None:
+                return None
+            text = '{} {}×{}, {}'.format(
+                entry.kind, entry.width, entry.height,
+                time.strftime('%Y-%m-%d %H:%M', time.localtime(entry.created)),
+            )
+            return f'{text}\n{entry.path}' if entry.path else text
+        if role == Qt.ItemDataRole.UserRole:
+            return entry_id
+        return None
+
+    def show(self, selected: Optional[List[int]]):
+        self.beginResetModel()
+        self.selected = selected
+        self.rows = self.captures.count
+        self.endResetModel()
+
+    def entry_added(self, entry_id: int):
+        if self.selected is not None:
+            return
+        # newest entries are on top
+        self.beginInsertRows(QModelIndex(), 0, 0)
+        self.rows += 1
+        self.endInsertRows()
+
+    def entries_trimmed(self, excess: int):
+        if self.selected is not None:
+            self.rows = self.captures.count
+            return
+        # oldest entries are at the bottom
+        self.beginRemoveRows(QModelIndex(), self.rows - excess, self.rows - 1)
+        self.rows -= excess
+        self.endRemoveRows()
+
+
+class HistoryDialog(QDialog):
+    """Browse indexed thumbnails, double click one to find similar ones."""
+
+    def __init__(self, index: CaptureIndex, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Capture history")
+        self.captures = index
+        self.model = HistoryModel(index, self)
+
+        self.view = QListView()
+        self.view.setViewMode(QListView.ViewMode.IconMode)
+        self.view.setResizeMode(QListView.ResizeMode.Adjust)
+        self.view.setIconSize(QSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        self.view.setGridSize(QSize(THUMBNAIL_SIZE + 12, THUMBNAIL_SIZE + 12))
+        # lets the view lay out 100k items without asking each for its size
+        self.view.setUniformItemSizes(True)
+        self.view.setLayoutMode(QListView.LayoutMode.Batched)
+        self.view.setModel(self.model)
+        self.view.doubleClicked.connect(self.show_similar)
+
+        self.status = QLabel()
+        self.all_button = QPushButton("Show all")
+        self.all_button.clicked.connect(self.show_all)
+
+        bottom = QHBoxLayout()
+        bottom.addWidget(self.status, 1)
+        bottom.addWidget(self.all_button)
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.view)
+        layout.addLayout(bottom)
+        self.resize(900, 600)
+        self.show_all()
+
+    def show_all(self):
+        self.model.show(None)
+        self.status.setText(f'{self.captures.count} entries, double click one to find similar ones')
+
+    def show_similar(self, model_index: QModelIndex):
+        entry = self.captures.entry(model_index.data(Qt.ItemDataRole.UserRole))
+        if entry is None:
+            return
+        start = time.perf_counter()
+        found = self.captures.similar(entry.hash)
+        elapsed = time.perf_counter() - start
+        self.model.show([entry_id for entry_id, _ in found])
+        self.status.setText(
+            f'{len(found)} similar entries, found in {elapsed * 1000:.1f} ms'
+        )
+
+
+if __name__ == '__main__':
+    # lookups over 100k entries, `python history.py [count]`
+    import sys
+    import tempfile
+    from PySide6.QtWidgets import QApplication
+
+    app = QApplication(sys.argv)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'index.sqlite')
+        thumbnail = QImage(THUMBNAIL_SIZE, 90, QImage.Format.Format_RGB32)
+        thumbnail.fill(0x336699)
+        buffer = QBuffer()
+        buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+        thumbnail.save(buffer, 'png')
+        blob = bytes(buffer.data())
+        rng = np.random.default_rng(0)
+        hashes = rng.integers(0, 2 ** 63, count, dtype=np.int64)
+        db = sqlite3.connect(path)
+        db.execute('CREATE TABLE entries (id INTEGER PRIMARY KEY, created REAL NOT NULL,'
+                   ' kind TEXT NOT NULL, width INTEGER NOT NULL, height INTEGER NOT NULL,'
+                   ' hash INTEGER NOT NULL, path TEXT NOT NULL DEFAULT \'\','
+                   ' thumbnail BLOB NOT NULL)')
+        db.executemany(
+            'INSERT INTO entries (created, kind, width, height, hash, thumbnail)'
+            ' VALUES (?, ?, ?, ?, ?, ?)',
+            ((time.time(), 'pin', 1920, 1080, int(h), blob) for h in hashes),
+        )
+        db.commit()
+        db.close()
+
+        start = time.perf_counter()
+        index = CaptureIndex(path)
+        print(f'open {count} entries: {(time.perf_counter() - start) * 1000:7.2f} ms')
+        rounds = 100
+        start = time.perf_counter()
+        for h in hashes[:rounds]:
+            index.similar(int(h))
+        print(f'similar():         {(time.perf_counter() - start) / rounds * 1000:7.2f} ms')
+        ids = index.ids[rng.integers(0, count, rounds)]
+        start = time.perf_counter()
+        for entry_id in ids:
+            index.thumbnail(int(entry_id))
+        print(f'thumbnail():       {(time.perf_counter() - start) / rounds * 1000:7.2f} ms')
+        dialog = HistoryDialog(index)
+        start = time.perf_counter()
+        dialog.show()
+        app.processEvents()
+        print(f'browser shown:     {(time.perf_counter() - start) * 1000:7.2f} ms')
+        dialog.close()
+        index.close()
@@ -0,0 +1,162 @@
+from math import ceil
+from typing import List
+
+import numpy as np
+from PySide6.QtCore import Qt, QObject, QRect, QTimer, Signal
+from PySide6.QtGui import QImage
+from loguru import logger
+
+from shotter import Shotter
+from op_redact import image_pixels
+
+
+class TileHasher:
+    """Hash an RGB32 frame in square tiles, vectorized.
+
+    Each pixel is multiplied by a fixed random odd weight for its place
+    in the tile (wrapping in 32 bits) and the products of a tile are
+    summed. The padded copy and the products live in buffers kept from
+    one frame to the next.
+    """
+
+    def __init__(self, width: int, height: int, tile: int) -> None:
+        self.tile = tile
+        self.width = width
+        self.height = height
+        self.rows = ceil(height / tile)
+        self.cols = ceil(width / tile)
+        rng = np.random.default_rng(0x5059_5350)
+        self.weights = (
+            rng.integers(0, 2 ** 31, (1, tile, 1, tile), dtype=np.uint32) * 2 + 1
+        )
+        self.padded = np.zeros((self.rows * tile, self.cols * tile), np.uint32)
+        self.products = np.empty(
+            (self.rows, tile, self.cols, tile), np.uint32,
+        )
+
+    def hashes(self, pixels: np.ndarray) -> np.ndarray:
+        """(rows, cols) tile hashes of a (height, width, 4) pixel array."""
+        self.padded[:self.height, :self.width] = pixels.view(np.uint32)[..., 0]
+        np.multiply(
+            self.padded.reshape(self.rows, self.tile, self.cols, self.tile),
+            self.weights,
+            out=self.products,
+        )
+        return self.products.sum(axis=(1, 3), dtype=np.uint64)
+
+
+class LiveMirror(QObject):
+    """Re-captures one screen region and reports the tiles that changed.
+
+    Only changed tiles are copied into `frame`, the image live pins paint
+    from. While nothing changes the polling interval doubles, up to
+    `max_backoff` times the configured one, and drops back on the first
+    change. `paused` skips polling without stopping the timer.
+    """
+    tile = 64
+    max_backoff = 8
+    # List[QRect] of changed areas, in `frame` pixels
+    changed = Signal(list)
+
+    def __init__(self, shotter: Shotter, region: QRect, interval: int, parent=None):
+        """`region` is in native pixels, `interval` in milliseconds."""
+        super().__init__(parent)
+        self.shotter = shotter
+        self.region = region
+        self.interval = interval
+        self.paused = False
+        self.idle = 0
+
+        self.frame = QImage(region.size(), QImage.Format.Format_RGB32)
+        self.frame.fill(0)
+        self.frame_pixels = image_pixels(self.frame, writable=True)
+        self.hasher = TileHasher(region.width(), region.height(), self.tile)
+        self.previous = None
+
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.TimerType.CoarseTimer)
+        self.timer.timeout.connect(self.poll)
+
+    def start(self):
+        self.idle = 0
+        self.timer.start(self.interval)
+        self.poll()
+
+    def stop(self):
+        self.timer.stop()
+
+    def set_interval(self, interval: int):
+        self.interval = interval
+        self.idle = 0
+        if self.timer.isActive():
+            self.timer.start(interval)
+
+    def poll(self):
+        if self.paused:
+            return
+        image = self.shotter.grab_image(self.region)
+        if image.size() != self.frame.size():
+            logger.debug('live.skip size={}', image.size())
+            return
+        pixels = image_pixels(image)
+        hashes = self.hasher.hashes(pixels)
+        if self.previous is None:
+            changed = np.ones(hashes.shape, dtype=bool)
+        else:
+            changed = hashes != self.previous
+        self.previous = hashes
+
+        if not changed.any():
+            self.idle += 1
+            interval = self.interval * min(2 ** self.idle, self.max_backoff)
+            if self.timer.interval() != interval:
+                self.timer.setInterval(interval)
+            return
+        if self.idle:
+            self.idle = 0
+            self.timer.setInterval(self.interval)
+
+        t = self.tile
+        rects: List[QRect] = []
+        if changed.all():
+            self.frame_pixels[...] = pixels
+            rects.append(self.frame.rect())
+        else:
+            for row, col in zip(*np.nonzero(changed)):
+                y, x = int(row) * t, int(col) * t
+                self.frame_pixels[y:y + t, x:x + t] = pixels[y:y + t, x:x + t]
+                rects.append(QRect(x, y, t, t).intersected(self.frame.rect()))
+        logger.debug('live.update tiles={}', len(rects))
+        self.changed.emit(rects)
+
+
+if __name__ == '__main__':
+    # cost of one poll of a 1080p region, and what it means in CPU time
+    import sys
+    import time
+    from PySide6.QtWidgets import QApplication
+    from shotter import FakeBackend
+
+    app = QApplication(sys.argv)
+    region = QRect(0, 0, 1920, 1080)
+    shotter = Shotter(backend=FakeBackend([region]))
+    mirror = LiveMirror(shotter, region, 1000)
+    mirror.poll()
+
+    rounds = 50
+    start = time.perf_counter()
+    for _ in range(rounds):
+        shotter.grab_image(region)
+    grabbed = time.perf_counter()
+    for _ in range(rounds):
+        mirror.poll()
+    polled = time.perf_counter()
+    grab = (grabbed - start) / rounds
+    poll = (polled - grabbed) / rounds
+    print(f'grab:            {grab * 1000:6.2f} ms')
+    print(f'hash + compare:  {(poll - grab) * 1000:6.2f} ms')
+    for pins, rate in ((1, 1), (4, 1), (4, 2)):
+        print(
+            f'{pins} pin(s) at {rate}/s: {poll * pins * rate * 100:4.1f}% of one core'
+            ' before idle backoff'
+        )
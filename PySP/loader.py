@@ -0,0 +1,134 @@
+import itertools
+from functools import partial
+from typing import Callable, Optional
+
+from PySide6.QtCore import QBuffer, QByteArray, QIODevice, QObject, QSize, QThreadPool, Qt, Signal
+from PySide6.QtGui import QImage, QImageReader, QImageIOHandler
+from loguru import logger
+
+# longest side of the preview shown while the full image decodes
+PREVIEW_SIZE = 1024
+# formats whose handlers decode straight to a smaller size, JPEG scales
+# its DCT blocks; the others decode everything and scale afterwards, a
+# preview would only delay the full image
+SCALED_DECODE_FORMATS = {'jpeg', 'jpg'}
+
+
+def image_filter() -> str:
+    """A QFileDialog name filter of every image format Qt can read."""
+    patterns = ' '.join(
+        f'*.{bytes(format).decode()}'
+        for format in QImageReader.supportedImageFormats()
+    )
+    return f'Images ({patterns})'
+
+
+class ImageLoader(QObject):
+    """Decodes image files and clipboard data on the global thread pool.
+
+    Large images whose format can decode at a reduced size first send a
+    `preview`, then the full image follows in `loaded`. The QImages cross
+    over to the GUI thread, where they become pixmaps.
+    """
+    # job, preview, full size
+    preview = Signal(int, QImage, QSize)
+    # job, full image
+    loaded = Signal(int, QImage)
+    # job, what went wrong
+    failed = Signal(int, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.jobs = itertools.count(1)
+
+    def load_file(self, path: str) -> int:
+        return self._start(partial(QImageReader, path), path)
+
+    def load_data(self, data: bytes, format: str = '') -> int:
+        """Decode encoded image bytes, e.g. PNG data from the clipboard."""
+        def reader() -> QImageReader:
+            buffer = QBuffer()
+            buffer.setData(QByteArray(data))
+            buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+            reader = QImageReader(buffer, format.encode())
+            # the reader does not own the buffer
+            reader.buffer = buffer
+            return reader
+        return self._start(reader, f'<{len(data)} bytes>')
+
+    def _start(self, reader: Callable[[], QImageReader], name: str) -> int:
+        job = next(self.jobs)
+        logger.debug('loader.start job={}, source={}', job, name)
+        QThreadPool.globalInstance().start(partial(self._decode, job, reader, name))
+        return job
+
+    def _decode(self, job: int, reader: Callable[[], QImageReader], name: str):
+        first = reader()
+        first.setAutoTransform(True)
+        size = first.size()
+        if not first.canRead():
+            self.failed.emit(job, first.errorString())
+            return
+        preview = self._preview_size(first, size)
+        if preview is not None:
+            first.setScaledSize(preview)
+            image = first.read()
+            if not image.isNull():
+                logger.debug('loader.preview job={}, size={}', job, image.size())
+                self.preview.emit(job, image, size)
+            # a reader reads once, the full image needs another
+            first = reader()
+            first.setAutoTransform(True)
+        image = first.read()
+        if image.isNull():
+            logger.debug('loader.failed job={}, source={}, error={}', job, name, first.errorString())
+            self.failed.emit(job, first.errorString())
+            return
+        logger.debug('loader.done job={}, size={}', job, image.size())
+        self.loaded.emit(job, image)
+
+    @staticmethod
+    def _preview_size(reader: QImageReader, size: QSize) -> Optional[QSize]:
+        if not size.isValid() or max(size.width(), size.height()) <= 2 * PREVIEW_SIZE:
+            return None
+        if bytes(reader.format()).decode() not in SCALED_DECODE_FORMATS:
+            return None
+        if not reader.supportsOption(QImageIOHandler.ImageOption.ScaledSize):
+            return None
+        return size.scaled(PREVIEW_SIZE, PREVIEW_SIZE, Qt.AspectRatioMode.KeepAspectRatio)
+
+
+if __name__ == '__main__':
+    # time to the first pixels and to the full image of an 8K picture,
+    # decoded by the loader, e.g. `python loader.py`
+    import os
+    import sys
+    import tempfile
+    import time
+    from PySide6.QtCore import QEventLoop
+    from PySide6.QtGui import QGuiApplication, QPainter, QColor
+
+    app = QGuiApplication(sys.argv)
+    source = QImage(7680, 4320, QImage.Format.Format_RGB32)
+    source.fill(QColor('#EEEEEE'))
+    painter = QPainter(source)
+    for line in range(0, source.height(), 20):
+        painter.drawText(10, line, f'line {line} of a large screenshot ' * 40)
+    painter.end()
+
+    loader = ImageLoader()
+    with tempfile.TemporaryDirectory() as directory:
+        for format in ('png', 'jpg'):
+            path = os.path.join(directory, f'large.{format}')
+            source.save(path)
+            times = {}
+            loop = QEventLoop()
+            loader.preview.connect(lambda *_: times.setdefault('preview', time.perf_counter()))
+            loader.loaded.connect(lambda *_: (times.setdefault('full', time.perf_counter()), loop.quit()))
+            start = time.perf_counter()
+            loader.load_file(path)
+            loop.exec()
+            loader.preview.disconnect()
+            loader.loaded.disconnect()
+            preview = f'{(times["preview"] - start) * 1000:5.0f} ms' if 'preview' in times else '    -   '
+            print(f'{format}: preview {preview}, full {(times["full"] - start) * 1000:5.0f} ms')
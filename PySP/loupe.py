@@ -0,0 +1,161 @@
+from typing import Optional
+
+import numpy as np
+from PySide6.QtWidgets import QWidget, QApplication
+from PySide6.QtCore import Qt, QPoint, QRect, QSize
+from PySide6.QtGui import QImage, QPainter, QPaintEvent, QPen, QColor, QFont
+from loguru import logger
+
+from op_redact import image_pixels
+
+
+class Loupe(QWidget):
+    """Magnified view of the capture around the cursor, with its color.
+
+    Pixels are read straight from the capture's `QImage` buffer through a
+    NumPy view made once per session. Each move copies the N×N patch into
+    one persistent small image, which `paintEvent` scales up with nearest
+    neighbour sampling, so following the cursor allocates nothing and
+    costs the same on an 8K capture as on a small one.
+    """
+    # pixels on each side of the patch, odd so there is a center pixel
+    cells = 15
+    # on screen size of one magnified pixel
+    zoom = 8
+    text_height = 36
+    # distance between the cursor and the loupe
+    gap = 24
+
+    def __init__(self, parent: Optional[QWidget] = None):
+        super().__init__(parent)
+        self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self.setAttribute(Qt.WidgetAttribute.WA_OpaquePaintEvent)
+        side = self.cells * self.zoom
+        self.setFixedSize(side, side + self.text_height)
+
+        self.patch = QImage(
+            self.cells, self.cells, QImage.Format.Format_RGB32,
+        )
+        self.patch.fill(Qt.GlobalColor.black)
+        self.patch_pixels = image_pixels(self.patch, writable=True)
+        self.pixels: Optional[np.ndarray] = None
+        # position of the center pixel, scene and native coordinates
+        self.position = QPoint()
+        self.native = QPoint()
+        self.color = QColor()
+
+        font = QFont(self.font())
+        font.setStyleHint(QFont.StyleHint.Monospace)
+        font.setFamily('monospace')
+        self.setFont(font)
+        self.hide()
+
+    def set_image(self, image: QImage):
+        """Use `image` (RGB32, native pixels) until the next session."""
+        self.pixels = image_pixels(image) if not image.isNull() else None
+
+    def clear(self):
+        self.pixels = None
+        self.hide()
+
+    def set_position(self, position: QPoint, native: QPoint):
+        """Show the pixels around `native`, labelled with `position`."""
+        if self.pixels is None:
+            return
+        self.position = position
+        self.native = native
+        height, width = self.pixels.shape[:2]
+        half = self.cells // 2
+        x, y = native.x(), native.y()
+        x0, y0 = x - half, y - half
+        # the part of the patch inside the capture
+        sx0, sy0 = max(0, x0), max(0, y0)
+        sx1 = min(width, x0 + self.cells)
+        sy1 = min(height, y0 + self.cells)
+        if sx0 > x0 or sy0 > y0 or sx1 < x0 + self.cells \
+                or sy1 < y0 + self.cells:
+            self.patch_pixels[...] = 0
+        if sx0 < sx1 and sy0 < sy1:
+            self.patch_pixels[sy0 - y0:sy1 - y0, sx0 - x0:sx1 - x0] = \
+                self.pixels[sy0:sy1, sx0:sx1]
+        b, g, r, _ = self.patch_pixels[half, half].tolist()
+        self.color = QColor(r, g, b)
+        self.update()
+
+    def hex_color(self) -> str:
+        return self.color.name(QColor.NameFormat.HexRgb).upper()
+
+    def copy_color(self):
+        text = self.hex_color()
+        QApplication.clipboard().setText(text)
+        logger.debug('loupe.copy color={}', text)
+
+    def place_near(self, cursor: QPoint, bounds: QRect) -> QPoint:
+        """Top left corner next to `cursor`, flipped to stay in `bounds`."""
+        size = self.size()
+        x = cursor.x() + self.gap
+        y = cursor.y() + self.gap
+        if x + size.width() > bounds.right():
+            x = cursor.x() - self.gap - size.width()
+        if y + size.height() > bounds.bottom():
+            y = cursor.y() - self.gap - size.height()
+        return QPoint(x, y)
+
+    def paintEvent(self, event: QPaintEvent) -> None:
+        side = self.cells * self.zoom
+        painter = QPainter(self)
+        # nearest neighbour, every pixel becomes a sharp square
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform, False)
+        painter.drawImage(QRect(0, 0, side, side), self.patch)
+
+        center = (self.cells // 2) * self.zoom
+        painter.setPen(QPen(QColor(255, 255, 255, 200), 1))
+        painter.drawRect(center - 1, center - 1, self.zoom + 1, self.zoom + 1)
+        painter.setPen(QPen(QColor(0, 0, 0, 200), 1))
+        painter.drawRect(center, center, self.zoom - 1, self.zoom - 1)
+
+        text_rect = QRect(0, side, side, self.text_height)
+        painter.fillRect(text_rect, QColor('#2C2C2C'))
+        painter.fillRect(
+            QRect(4, side + 4, 12, self.text_height - 8), self.color,
+        )
+        painter.setPen(QColor('#F3F3F3'))
+        painter.drawText(
+            text_rect.adjusted(20, 0, 0, 0),
+            Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft,
+            f'({self.position.x()}, {self.position.y()})\n{self.hex_color()}',
+        )
+        painter.setPen(QColor('#007ACC'))
+        painter.drawRect(0, 0, side - 1, side + self.text_height - 1)
+        painter.end()
+
+
+if __name__ == '__main__':
+    # cost of following the cursor on an 8K capture
+    import sys
+    import random
+    import time
+
+    app = QApplication(sys.argv)
+    image = QImage(QSize(7680, 4320), QImage.Format.Format_RGB32)
+    image.fill(QColor(30, 60, 90))
+    loupe = Loupe()
+    loupe.set_image(image)
+    loupe.show()
+
+    random.seed(1)
+    points = [
+        QPoint(random.randrange(-10, 7690), random.randrange(-10, 4330))
+        for _ in range(5000)
+    ]
+    start = time.perf_counter()
+    for point in points:
+        loupe.set_position(point, point)
+    moved = time.perf_counter()
+    for point in points[:500]:
+        loupe.set_position(point, point)
+        loupe.repaint()
+    painted = time.perf_counter()
+    print(f'patch update: {(moved - start) / len(points) * 1e6:.1f} us')
+    print(f'update + paint: {(painted - moved) / 500 * 1e6:.1f} us')
+    print(f'color at last point: {loupe.hex_color()}')
@@ -0,0 +1,166 @@
+from typing import Optional
+
+import numpy as np
+from PySide6.QtWidgets import QGraphicsItem, QStyleOptionGraphicsItem, QWidget
+from PySide6.QtCore import Qt, QRectF, QPointF, QLineF
+from PySide6.QtGui import QPainter, QPen, QColor, QPainterPath
+
+from loguru import logger
+
+
+def simplify(points: np.ndarray, epsilon: float) -> np.ndarray:
+    """Ramer–Douglas–Peucker, iterative, distances computed with NumPy.
+
+    Returns the kept points, always including the first and the last one.
+    """
+    count = len(points)
+    if count < 3:
+        return points
+    keep = np.zeros(count, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, count - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        start, end = points[first], points[last]
+        inner = points[first + 1:last]
+        direction = end - start
+        length = np.hypot(*direction)
+        if length == 0:
+            distances = np.hypot(*(inner - start).T)
+        else:
+            # distance to the line through start and end
+            distances = np.abs(
+                direction[0] * (inner[:, 1] - start[1])
+                - direction[1] * (inner[:, 0] - start[0])
+            ) / length
+        index = int(np.argmax(distances))
+        if distances[index] > epsilon:
+            index += first + 1
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return points[keep]
+
+
+class PenStroke(QGraphicsItem):
+    """A freehand stroke.
+
+    Points are appended to a float32 array that grows by doubling. While
+    drawing, only the rectangle around the newest segment is invalidated
+    and `paint` only draws the segments within the exposed rectangle.
+    Lifting the pen simplifies the points and turns them into one
+    `QPainterPath`. Only paths with many points are cached as a device
+    pixmap, a short one draws faster than a pixmap of its bounds is kept.
+    """
+    # how much the bounding rect grows ahead of the stroke, so it does
+    # not have to change (and repaint everything) on every move
+    grow_margin = 64
+    epsilon = 0.6
+    # strokes with at least this many points after simplification are
+    # cached, below it drawing the path takes well under a millisecond
+    cache_points = 100
+
+    def __init__(
+        self,
+        start: QPointF,
+        color: QColor = QColor(Qt.GlobalColor.red),
+        width: float = 3,
+        parent: Optional[QGraphicsItem] = None,
+    ):
+        super().__init__(parent)
+        self.setFlag(
+            QGraphicsItem.GraphicsItemFlag.ItemUsesExtendedStyleOption, True
+        )
+        self.setZValue(11)
+        self.setPos(start)
+
+        self.pen = QPen(
+            color, width,
+            Qt.PenStyle.SolidLine,
+            Qt.PenCapStyle.RoundCap,
+            Qt.PenJoinStyle.RoundJoin,
+        )
+        # points relative to pos(), only the first `count` rows are used
+        self.points = np.zeros((64, 2), dtype=np.float32)
+        self.count = 1
+        self.path: Optional[QPainterPath] = None
+        self.bounds = QRectF(-self.grow_margin, -self.grow_margin,
+                             2 * self.grow_margin, 2 * self.grow_margin)
+
+    def boundingRect(self) -> QRectF:
+        return self.bounds
+
+    def add_point(self, scene_point: QPointF):
+        point = scene_point - self.pos()
+        last = self.points[self.count - 1]
+        if point.x() == last[0] and point.y() == last[1]:
+            return
+        if self.count == len(self.points):
+            self.points = np.resize(self.points, (2 * self.count, 2))
+        self.points[self.count] = (point.x(), point.y())
+        self.count += 1
+
+        pad = self.pen.widthF()
+        segment = QRectF(
+            QPointF(float(last[0]), float(last[1])), point,
+        ).normalized().adjusted(-pad, -pad, pad, pad)
+        if not self.bounds.contains(segment):
+            m = self.grow_margin
+            self.prepareGeometryChange()
+            self.bounds = self.bounds.united(segment.adjusted(-m, -m, m, m))
+        self.update(segment)
+
+    def finish(self, simplified: bool = False):
+        """`simplified` skips the simplification, for points kept from before."""
+        points = self.points[:self.count]
+        if not simplified:
+            points = simplify(points, self.epsilon)
+        logger.debug(
+            'item.pen done points={}, kept={}', self.count, len(points),
+        )
+        self.points = np.ascontiguousarray(points)
+        self.count = len(points)
+
+        points = points.tolist()
+        path = QPainterPath(QPointF(*points[0]))
+        for x, y in points[1:]:
+            path.lineTo(x, y)
+        pad = self.pen.widthF()
+        self.prepareGeometryChange()
+        self.path = path
+        self.bounds = path.boundingRect().adjusted(-pad, -pad, pad, pad)
+        if self.count >= self.cache_points:
+            self.setCacheMode(QGraphicsItem.CacheMode.DeviceCoordinateCache)
+
+    def paint(self, painter: QPainter, option: QStyleOptionGraphicsItem, widget: Optional[QWidget] = None) -> None:
+        painter.setPen(self.pen)
+        if self.path is not None:
+            painter.drawPath(self.path)
+            return
+
+        if self.count == 1:
+            painter.drawPoint(QPointF(*self.points[0].tolist()))
+            return
+        # segments whose bounding box touches the exposed rect
+        exposed = option.exposedRect.adjusted(
+            -self.pen.widthF(), -self.pen.widthF(),
+            self.pen.widthF(), self.pen.widthF(),
+        )
+        starts = self.points[:self.count - 1]
+        ends = self.points[1:self.count]
+        low = np.minimum(starts, ends)
+        high = np.maximum(starts, ends)
+        visible = np.flatnonzero(
+            (high[:, 0] >= exposed.left())
+            & (low[:, 0] <= exposed.right())
+            & (high[:, 1] >= exposed.top())
+            & (low[:, 1] <= exposed.bottom())
+        )
+        painter.drawLines([
+            QLineF(x1, y1, x2, y2)
+            for (x1, y1), (x2, y2) in zip(
+                starts[visible].tolist(), ends[visible].tolist(),
+            )
+        ])
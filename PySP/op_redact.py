@@ -0,0 +1,181 @@
+from enum import Enum
+from math import ceil, floor
+from typing import Optional, List, Tuple, Dict
+
+import numpy as np
+from PySide6.QtWidgets import QGraphicsItem, QGraphicsRectItem, QGraphicsPixmapItem
+from PySide6.QtCore import Qt, QRect, QRectF, QPointF
+from PySide6.QtGui import QImage, QPixmap, QPen, QBrush
+
+from loguru import logger
+
+
+class RedactMode(Enum):
+    Pixelate = 1
+    Blur = 2
+
+
+def image_pixels(image: QImage, writable: bool = False) -> np.ndarray:
+    """A (height, width, 4) BGRA view over the buffer of an RGB32 image.
+
+    No pixel is copied, the image must outlive the returned array. A
+    writable view detaches the image first, so it must not be shared.
+    """
+    return np.ndarray(
+        shape=(image.height(), image.width(), 4),
+        dtype=np.uint8,
+        buffer=image.bits() if writable else image.constBits(),
+        strides=(image.bytesPerLine(), 4, 1),
+    )
+
+
+class BlockCache:
+    """Per-block averages of a pixel array, on a grid anchored at (0, 0).
+
+    Only a rectangular range of blocks is kept. Moving or growing that
+    range reuses the blocks already averaged and only computes the new
+    ones, so redrawing while dragging costs the newly covered strip.
+    """
+
+    def __init__(self, pixels: np.ndarray, block: int) -> None:
+        self.pixels = pixels
+        self.block = block
+        self.rows = ceil(pixels.shape[0] / block)
+        self.cols = ceil(pixels.shape[1] / block)
+        # (row_start, row_end, col_start, col_end), end exclusive
+        self.range = (0, 0, 0, 0)
+        self.blocks = np.zeros((0, 0, 4), dtype=np.uint8)
+
+    def average(self, r0: int, r1: int, c0: int, c1: int) -> np.ndarray:
+        b = self.block
+        sub = self.pixels[r0 * b:r1 * b, c0 * b:c1 * b]
+        row_starts = np.arange(0, sub.shape[0], b)
+        col_starts = np.arange(0, sub.shape[1], b)
+        # reduceat also copes with the partial blocks on the far edges
+        sums = np.add.reduceat(sub, row_starts, axis=0, dtype=np.uint32)
+        sums = np.add.reduceat(sums, col_starts, axis=1, dtype=np.uint32)
+        heights = np.diff(np.append(row_starts, sub.shape[0]))
+        widths = np.diff(np.append(col_starts, sub.shape[1]))
+        counts = np.outer(heights, widths)[..., None]
+        means = (sums // counts).astype(np.uint8)
+        means[..., 3] = 255
+        return means
+
+    def update(self, r0: int, r1: int, c0: int, c1: int) -> np.ndarray:
+        r0, r1 = max(0, r0), min(self.rows, r1)
+        c0, c1 = max(0, c0), min(self.cols, c1)
+        if (r0, r1, c0, c1) == self.range:
+            return self.blocks
+
+        blocks = np.empty((max(0, r1 - r0), max(0, c1 - c0), 4), np.uint8)
+        o0, o1, p0, p1 = self.range
+        # the part both the old and the new range cover
+        i0, i1 = max(r0, o0), min(r1, o1)
+        j0, j1 = max(c0, p0), min(c1, p1)
+        if i0 < i1 and j0 < j1:
+            blocks[i0 - r0:i1 - r0, j0 - c0:j1 - c0] = \
+                self.blocks[i0 - o0:i1 - o0, j0 - p0:j1 - p0]
+            strips = [
+                (r0, i0, c0, c1),  # above
+                (i1, r1, c0, c1),  # below
+                (i0, i1, c0, j0),  # left
+                (i0, i1, j1, c1),  # right
+            ]
+        else:
+            strips = [(r0, r1, c0, c1)]
+        for s0, s1, t0, t1 in strips:
+            if s0 < s1 and t0 < t1:
+                blocks[s0 - r0:s1 - r0, t0 - c0:t1 - c0] = \
+                    self.average(s0, s1, t0, t1)
+
+        self.range = (r0, r1, c0, c1)
+        self.blocks = blocks
+        return blocks
+
+
+class RedactItem(QGraphicsRectItem):
+    """Pixelates or blurs a rectangle of the capture.
+
+    The averages are computed from the original capture pixels and shown
+    as a small image scaled back up, without smoothing for pixelate and
+    with it for blur. The covered area is rounded out to whole blocks, so
+    no original pixel is left around the edges.
+    """
+    # block size in device independent pixels
+    block_size = 12
+
+    def __init__(
+        self,
+        mode: RedactMode,
+        sources: List[Tuple[QRect, float, np.ndarray]],
+        parent: Optional[QGraphicsItem] = None,
+    ):
+        """`sources` holds (scene geometry, dpr, native pixels) per screen."""
+        super().__init__(parent)
+        self.setPen(QPen(Qt.PenStyle.NoPen))
+        self.setBrush(QBrush(Qt.BrushStyle.NoBrush))
+        self.setZValue(5)
+
+        self.mode = mode
+        self.sources = sources
+        self.area = QRect()
+        self.caches: Dict[int, BlockCache] = {}
+        self.patches: Dict[int, QGraphicsPixmapItem] = {}
+
+    def set_area(self, area: QRect):
+        """Redact `area` (scene coordinates), reusing averaged blocks."""
+        area = area.normalized()
+        self.area = area
+        covered = QRectF()
+        for index, (geometry, dpr, pixels) in enumerate(self.sources):
+            part = area.intersected(geometry)
+            patch = self.patches.get(index)
+            if part.isEmpty():
+                if patch is not None:
+                    patch.hide()
+                continue
+
+            cache = self.caches.get(index)
+            if cache is None:
+                block = max(1, round(self.block_size * dpr))
+                cache = BlockCache(pixels, block)
+                self.caches[index] = cache
+            b = cache.block
+            local = part.translated(-geometry.topLeft())
+            r0 = floor(local.top() * dpr) // b
+            r1 = ceil((local.bottom() + 1) * dpr / b)
+            c0 = floor(local.left() * dpr) // b
+            c1 = ceil((local.right() + 1) * dpr / b)
+            blocks = cache.update(r0, r1, c0, c1)
+            r0, _, c0, _ = cache.range
+            if blocks.size == 0:
+                continue
+
+            rows, cols = blocks.shape[:2]
+            image = QImage(
+                blocks.data, cols, rows, cols * 4, QImage.Format.Format_RGB32,
+            )
+            if patch is None:
+                patch = QGraphicsPixmapItem(self)
+                patch.setTransformationMode(
+                    Qt.TransformationMode.FastTransformation
+                    if self.mode == RedactMode.Pixelate
+                    else Qt.TransformationMode.SmoothTransformation
+                )
+                patch.setScale(b / dpr)
+                self.patches[index] = patch
+            # fromImage copies, `blocks` may be replaced on the next update
+            patch.setPixmap(QPixmap.fromImage(image))
+            patch.setPos(
+                QPointF(geometry.topLeft()) + QPointF(c0 * b, r0 * b) / dpr
+            )
+            patch.show()
+            covered = covered.united(patch.mapRectToParent(patch.boundingRect()))
+        self.setRect(covered)
+
+    def finish(self):
+        # the block caches are only needed while dragging
+        logger.debug(
+            'item.redact done mode={}, area={}', self.mode, self.area,
+        )
+        self.caches.clear()
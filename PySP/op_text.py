@@ -1,8 +1,8 @@
 from enum import Enum
-from typing import Optional
+from typing import Optional, Tuple, List, Any
 
 from PySide6.QtWidgets import QGraphicsTextItem, QGraphicsSceneMouseEvent, QStyleOptionGraphicsItem, QWidget, QStyleOption, QGraphicsScale, QGraphicsItem, QStyle
-from PySide6.QtCore import Qt, QEvent, QPoint, QRect, QRectF, QPointF
+from PySide6.QtCore import Qt, QEvent, QPoint, QRect, QRectF, QPointF, Signal
 from PySide6.QtGui import QFocusEvent, QFont, QInputMethodEvent, QKeyEvent, QPainter, QPen, QColor, QCursor
 
 from loguru import logger
@@ -16,7 +16,21 @@ class ResizeDir(Enum):
 
 
 class NodeTag(QGraphicsTextItem):
+    """Editable text label.
+
+    Outside of editing, the label is cached as a device pixmap, so moving
+    it is a blit and the text is only rasterized again when its content
+    or its scale changes. While it has focus it is painted directly, as
+    the text cursor and the selection change on every keystroke.
+    """
+    # (old, new) values, emitted once an interaction is over
+    moved = Signal(QPointF, QPointF)
+    scaled = Signal(float, float)
+    edited = Signal(str, str)
+
     handle_size = 4
+    # scale changes smaller than this are not worth re-rendering for
+    scale_epsilon = 0.005
 
     def __init__(self, text, parent: Optional[QGraphicsItem] = None):
         super().__init__(text, parent)
@@ -34,20 +48,95 @@ class NodeTag(QGraphicsTextItem):
         self.setFont(QFont("Fira Code", 16))
         self.setPos(0, 0)
         self.setZValue(12)
+        self.setCacheMode(QGraphicsItem.CacheMode.DeviceCoordinateCache)
 
         self.resizing = False
         self.resizing_dir = ResizeDir.TopLeft
         self.current_scale = 1.0
+        # right and bottom handle edges, cached until the text is relaid out
+        self._handle_edges: Optional[Tuple[float, float]] = None
+        self._handle_rects: List[QRectF] = []
+        self.document().documentLayout().documentSizeChanged.connect(
+            self.invalidate_handles
+        )
+        # where the item was last painted, in scene coordinates
+        self._scene_rect = QRectF()
+        # state at the start of a drag or an edit
+        self._press_pos = QPointF()
+        self._press_scale = 1.0
+        self._text_before = text
+
+    def invalidate_handles(self, *_):
+        self._handle_edges = None
+        self._handle_rects = []
+
+    def handle_rects(self) -> List[QRectF]:
+        """The border and the four resizing handles, in item coordinates."""
+        if not self._handle_rects:
+            rect = self.boundingRect()
+            handle_size = self.handle_size
+            right = rect.width() - handle_size - 1
+            bottom = rect.height() - handle_size - 1
+            self._handle_rects = [
+                rect.adjusted(1, 1, -1, -1),
+                QRectF(1, 1, handle_size, handle_size),
+                QRectF(right, 1, handle_size, handle_size),
+                QRectF(1, bottom, handle_size, handle_size),
+                QRectF(right, bottom, handle_size, handle_size),
+            ]
+        return self._handle_rects
+
+    def itemChange(self, change: QGraphicsItem.GraphicsItemChange, value: Any) -> Any:
+        if change in (
+            QGraphicsItem.GraphicsItemChange.ItemPositionHasChanged,
+            QGraphicsItem.GraphicsItemChange.ItemScaleHasChanged,
+            QGraphicsItem.GraphicsItemChange.ItemTransformHasChanged,
+        ) and self.scene() is not None:
+            # repaint just where the item was, in case anything is left
+            # over there, instead of the whole view
+            rect = self.sceneBoundingRect()
+            if not self._scene_rect.isEmpty():
+                self.scene().update(self._scene_rect.adjusted(-1, -1, 1, 1))
+            self._scene_rect = rect
+        return super().itemChange(change, value)
+
+    def handle_edges(self) -> Tuple[float, float]:
+        if self._handle_edges is None:
+            rect = self.boundingRect()
+            self._handle_edges = (
+                rect.width() - self.handle_size,
+                rect.height() - self.handle_size,
+            )
+        return self._handle_edges
+
+    def handle_at(self, point: QPointF) -> Optional[ResizeDir]:
+        handle_size = self.handle_size
+        right, bottom = self.handle_edges()
+        if point.x() < handle_size and point.y() < handle_size:
+            return ResizeDir.TopLeft
+        elif point.x() > right and point.y() < handle_size:
+            return ResizeDir.TopRight
+        elif point.x() < handle_size and point.y() > bottom:
+            return ResizeDir.BottomLeft
+        elif point.x() > right and point.y() > bottom:
+            return ResizeDir.BottomRight
+        return None
 
     def focusOutEvent(self, event: QFocusEvent) -> None:
         # self.setTextInteractionFlags(Qt.TextInteractionFlag.NoTextInteraction)
+        self.setCacheMode(QGraphicsItem.CacheMode.DeviceCoordinateCache)
         self.setSelected(False)
         cursor = self.textCursor()
         cursor.clearSelection()
         self.setTextCursor(cursor)
+        text = self.toPlainText()
+        if text != self._text_before:
+            self.edited.emit(self._text_before, text)
         return super().focusOutEvent(event)
 
     def focusInEvent(self, event: QFocusEvent) -> None:
+        self.setCacheMode(QGraphicsItem.CacheMode.NoCache)
+        self._text_before = self.toPlainText()
         if self.textInteractionFlags() == Qt.TextInteractionFlag.NoTextInteraction:
             self.setTextInteractionFlags(
                 Qt.TextInteractionFlag.TextEditable
@@ -74,35 +163,13 @@ class NodeTag(QGraphicsTextItem):
                 Qt.PenCapStyle.FlatCap,
                 Qt.PenJoinStyle.MiterJoin,
             )
+            border, *handles = self.handle_rects()
             painter.setPen(border_pen)
-            painter.drawRect(self.boundingRect().adjusted(1, 1, -1, -1))
+            painter.drawRect(border)
             # draw four small filled rectangles inside the corners, as resizing handles
             painter.setBrush(QColor(0, 122, 204, 255))
             painter.setPen(Qt.PenStyle.NoPen)
-            handle_size = self.handle_size
-            # top left
-            painter.drawRect(QRectF(1, 1, handle_size, handle_size))
-            # top right
-            painter.drawRect(QRectF(
-                self.boundingRect().width() - handle_size - 1,
-                1,
-                handle_size,
-                handle_size,
-            ))
-            # bottom left
-            painter.drawRect(QRectF(
-                1,
-                self.boundingRect().height() - handle_size - 1,
-                handle_size,
-                handle_size,
-            ))
-            # bottom right
-            painter.drawRect(QRectF(
-                self.boundingRect().width() - handle_size - 1,
-                self.boundingRect().height() - handle_size - 1,
-                handle_size,
-                handle_size,
-            ))
+            painter.drawRects(handles)
             painter.restore()
             super().paint(painter, option, widget)
             return
@@ -110,56 +177,40 @@ class NodeTag(QGraphicsTextItem):
 
     def get_cursor_shape(self, point: QPoint) -> Qt.CursorShape:
         handle_size = self.handle_size
+        right, bottom = self.handle_edges()
         # check if mouse is inside one of the four handles
-        rect = self.boundingRect()
-        if point.x() < handle_size and point.y() < handle_size:
-            # top left
+        handle = self.handle_at(point)
+        if handle in (ResizeDir.TopLeft, ResizeDir.BottomRight):
             return Qt.CursorShape.SizeFDiagCursor
-        elif point.x() > rect.width() - handle_size and point.y() < handle_size:
-            # top right
-            return Qt.CursorShape.SizeBDiagCursor
-        elif point.x() < handle_size and point.y() > rect.height() - handle_size:
-            # bottom left
+        elif handle in (ResizeDir.TopRight, ResizeDir.BottomLeft):
             return Qt.CursorShape.SizeBDiagCursor
-        elif point.x() > rect.width() - handle_size and point.y() > rect.height() - handle_size:
-            # bottom right
-            return Qt.CursorShape.SizeFDiagCursor
         # check if mouse is on one of the borders, and if so, change to move cursor
-        elif point.x() < handle_size or point.x() > rect.width() - handle_size:
+        elif point.x() < handle_size or point.x() > right:
             return Qt.CursorShape.DragMoveCursor
-        elif point.y() < handle_size or point.y() > rect.height() - handle_size:
+        elif point.y() < handle_size or point.y() > bottom:
             return Qt.CursorShape.DragMoveCursor
         else:
             return Qt.CursorShape.IBeamCursor
 
     def mousePressEvent(self, event: QGraphicsSceneMouseEvent) -> None:
-        point = event.pos()
-        scene_point = event.scenePos()
-        handle_size = self.handle_size
+        self._press_pos = self.pos()
+        self._press_scale = self.current_scale
         # check if mouse is inside one of the four handles
-        rect = self.boundingRect()
-        if point.x() < handle_size and point.y() < handle_size:
-            # top left
-            self.resizing = True
-            self.resizing_dir = ResizeDir.TopLeft
-        elif point.x() > rect.width() - handle_size and point.y() < handle_size:
-            # top right
-            self.resizing = True
-            self.resizing_dir = ResizeDir.TopRight
-        elif point.x() < handle_size and point.y() > rect.height() - handle_size:
-            # bottom left
+        handle = self.handle_at(event.pos())
+        if handle is not None:
             self.resizing = True
-            self.resizing_dir = ResizeDir.BottomLeft
-        elif point.x() > rect.width() - handle_size and point.y() > rect.height() - handle_size:
-            # bottom right
-            self.resizing = True
-            self.resizing_dir = ResizeDir.BottomRight
+            self.resizing_dir = handle
+            self.setTransformOriginPoint(self.boundingRect().center())
         else:
             self.resizing = False
             return super().mousePressEvent(event)
 
     def mouseReleaseEvent(self, event: QGraphicsSceneMouseEvent) -> None:
         self.resizing = False
+        if self.current_scale != self._press_scale:
+            self.scaled.emit(self._press_scale, self.current_scale)
+        if self.pos() != self._press_pos:
+            self.moved.emit(self._press_pos, self.pos())
         return super().mouseReleaseEvent(event)
 
     def mouseMoveEvent(self, event: QGraphicsSceneMouseEvent) -> None:
@@ -172,7 +223,6 @@ class NodeTag(QGraphicsTextItem):
             scale = self.current_scale
             preview = self.sceneBoundingRect()
             base = self.sceneBoundingRect()
-            rect = self.boundingRect()
             if self.resizing_dir == ResizeDir.TopLeft:
                 preview.setTopLeft(scene_point)
             elif self.resizing_dir == ResizeDir.TopRight:
@@ -186,8 +236,10 @@ class NodeTag(QGraphicsTextItem):
                 preview.width() / base.width(),
                 preview.height() / base.height(),
             ) * self.current_scale
+            # every scale change means rasterizing the text again
+            if abs(scale - self.current_scale) < self.scale_epsilon:
+                return
             logger.debug(f"text.scale: {scale:.2f}")
-            self.setTransformOriginPoint(rect.center())
             self.setScale(scale)
             self.current_scale = scale
             return
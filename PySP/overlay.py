@@ -0,0 +1,376 @@
+from typing import Dict, List, Optional
+
+from PySide6.QtCore import Qt, QObject, QPoint, QPointF, QRectF, QSizeF, QTimer, Signal
+from PySide6.QtGui import QPixmap, QPixmapCache, QPainter, QPen, QColor, QAction, QClipboard, QGuiApplication, QRegion, QScreen
+from PySide6.QtWidgets import QGraphicsObject, QGraphicsScene, QGraphicsView, QGraphicsItem, QGraphicsSceneWheelEvent, QGraphicsSceneMouseEvent, QGraphicsSceneContextMenuEvent, QStyleOptionGraphicsItem, QWidget, QMenu, QApplication, QFileDialog, QFrame
+from loguru import logger
+
+from theme import ThemeContainer
+from shadow import ShadowStyle, nine_patch, shadow_margin
+from png_writer import SAVE_FILTERS, PNG_FILTER, save_png
+
+
+class PinItem(QGraphicsObject):
+    """A pinned image drawn on the shared overlay instead of its own window.
+
+    Behaves like `ImageLabel`: drag to move, wheel to zoom around the
+    cursor, Ctrl + wheel for opacity, and the same context menu. The
+    shadow comes from a pre-rendered nine-patch and the item is cached as
+    a device pixmap, so moving it only blits that pixmap.
+    """
+    shadow_style = ShadowStyle()
+
+    def __init__(self, img: QPixmap, pos: QPoint, themer: ThemeContainer, parent=None):
+        super().__init__(parent)
+        self.original_pixmap = img
+        self.display_size = img.deviceIndependentSize()
+        self.themer = themer
+        self.setPos(QPointF(pos))
+        self.setFlags(
+            QGraphicsItem.GraphicsItemFlag.ItemIsMovable
+            | QGraphicsItem.GraphicsItemFlag.ItemSendsGeometryChanges
+        )
+        self.setCacheMode(QGraphicsItem.CacheMode.DeviceCoordinateCache)
+        self.margin = shadow_margin(self.shadow_style)
+        # scene area covered before the current move
+        self.old_area = QRectF()
+
+    def rect(self) -> QRectF:
+        return QRectF(QPointF(0, 0), self.display_size)
+
+    def boundingRect(self) -> QRectF:
+        m = self.margin
+        return self.rect().adjusted(-m, -m, m, m)
+
+    def geometry(self) -> QRectF:
+        """Where the image is, in global device independent coordinates."""
+        return self.rect().translated(self.pos())
+
+    def paint(self, painter: QPainter, option: QStyleOptionGraphicsItem, widget: Optional[QWidget] = None) -> None:
+        rect = self.rect()
+        dpr = painter.device().devicePixelRatioF()
+        nine_patch(self.shadow_style, dpr).draw(painter, rect)
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+        painter.drawPixmap(rect, self.original_pixmap, QRectF(self.original_pixmap.rect()))
+        painter.setPen(QPen(Qt.GlobalColor.black, 1))
+        painter.drawRect(rect.adjusted(0.5, 0.5, -0.5, -0.5))
+
+    def itemChange(self, change: QGraphicsItem.GraphicsItemChange, value):
+        if change == QGraphicsItem.GraphicsItemChange.ItemPositionChange:
+            self.old_area = self.sceneBoundingRect()
+        elif change == QGraphicsItem.GraphicsItemChange.ItemPositionHasChanged:
+            self.notify(self.old_area)
+        return super().itemChange(change, value)
+
+    def notify(self, old_area: QRectF, resized: bool = False):
+        """Tell the scene the pin left `old_area` for where it is now."""
+        scene = self.scene()
+        if isinstance(scene, PinScene):
+            scene.pinsChanged.emit(old_area.united(self.sceneBoundingRect()), resized)
+
+    def mousePressEvent(self, event: QGraphicsSceneMouseEvent):
+        scene = self.scene()
+        if isinstance(scene, PinScene):
+            scene.raise_pin(self)
+        super().mousePressEvent(event)
+
+    def wheelEvent(self, event: QGraphicsSceneWheelEvent):
+        if event.delta() == 0:
+            return event.ignore()
+
+        # control + mouse wheel to adjust opacity, up is more opaque, down is more transparent
+        if event.modifiers() & Qt.KeyboardModifier.ControlModifier:
+            opacity = self.opacity()
+            opacity += 0.05 if event.delta() > 0 else -0.05
+            self.setOpacity(max(0.05, min(1, opacity)))
+            return event.accept()
+
+        zoom_factor = 1.1 if event.delta() > 0 else 0.9
+        logger.debug(
+            'pin.zoom.{op}, zoom_factor={zf}, from={cw}*{ch}',
+            op='out' if zoom_factor < 1 else 'in',
+            zf=zoom_factor,
+            cw=self.display_size.width(),
+            ch=self.display_size.height(),
+        )
+        # keep the point under the cursor where it is
+        self.resize(self.display_size * zoom_factor, event.pos())
+        event.accept()
+
+    def resize(self, size: QSizeF, anchor: QPointF):
+        ratio = size.width() / self.display_size.width()
+        old_area = self.sceneBoundingRect()
+        self.prepareGeometryChange()
+        self.setPos(self.pos() + anchor * (1 - ratio))
+        self.display_size = size
+        self.update()
+        self.notify(old_area, resized=True)
+
+    def contextMenuEvent(self, event: QGraphicsSceneContextMenuEvent):
+        menu = QMenu()
+
+        copy_action = QAction(
+            self.themer.get_icon('CopyToClipboard'), "Copy", menu,
+        )
+        copy_action.triggered.connect(self.copy_image)
+        menu.addAction(copy_action)
+
+        save_action = QAction(
+            self.themer.get_icon('Save'), "Save", menu,
+        )
+        save_action.triggered.connect(self.save_image)
+        menu.addAction(save_action)
+
+        if self.display_size != self.original_pixmap.deviceIndependentSize():
+            reset_zoom_action = QAction(
+                self.themer.get_icon('ZoomReset'), "Reset Zoom", menu,
+            )
+            reset_zoom_action.triggered.connect(
+                lambda: self.reset_zoom(event.pos())
+            )
+            menu.addAction(reset_zoom_action)
+
+        destroy_action = QAction(
+            self.themer.get_icon('Delete'), "Destroy", menu,
+        )
+        destroy_action.triggered.connect(self.destroy_image)
+        menu.addAction(destroy_action)
+
+        menu.exec(event.screenPos())
+
+    def current_pixmap(self) -> QPixmap:
+        return self.original_pixmap
+
+    def replace_pixmap(self, pixmap: QPixmap):
+        """Swap in the full image for a preview of the same size, keeping the zoom."""
+        self.original_pixmap = pixmap
+        self.update()
+
+    def displayed_pixmap(self) -> QPixmap:
+        size = self.original_pixmap.deviceIndependentSize()
+        if self.display_size == size:
+            return self.original_pixmap
+        dpr = self.original_pixmap.devicePixelRatio()
+        pixmap = self.original_pixmap.scaled(
+            (self.display_size * dpr).toSize(),
+            Qt.AspectRatioMode.KeepAspectRatio,
+            Qt.TransformationMode.SmoothTransformation,
+        )
+        pixmap.setDevicePixelRatio(dpr)
+        return pixmap
+
+    def copy_image(self):
+        logger.debug('pin.copy')
+        QApplication.clipboard().setPixmap(
+            self.displayed_pixmap(), mode=QClipboard.Mode.Clipboard,
+        )
+
+    def save_image(self):
+        selected = QFileDialog.getSaveFileName(
+            None, "Save image as",
+            filter=SAVE_FILTERS, selectedFilter=PNG_FILTER,
+        )
+        if len(selected) > 0 and selected[0] != '':
+            save_png(self.original_pixmap, selected[0], selected[1])
+
+    def reset_zoom(self, anchor: QPointF):
+        self.resize(self.original_pixmap.deviceIndependentSize(), anchor)
+        logger.debug('pin.zoom.reset')
+
+    def destroy_image(self):
+        logger.debug('pin.destroy')
+        scene = self.scene()
+        if scene is not None:
+            area = self.sceneBoundingRect()
+            scene.removeItem(self)
+            if isinstance(scene, PinScene):
+                scene.pinsChanged.emit(area, True)
+        self.deleteLater()
+
+
+class PinScene(QGraphicsScene):
+    """All overlay pins; scene coordinates are global device independent coordinates."""
+    # scene area whose pins changed, whether pins were resized, added or removed
+    pinsChanged = Signal(QRectF, bool)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.top_z = 0
+
+    def raise_pin(self, item: PinItem):
+        self.top_z += 1
+        item.setZValue(self.top_z)
+
+    def pins(self) -> List[PinItem]:
+        return [item for item in self.items() if isinstance(item, PinItem)]
+
+
+class PinOverlay(QGraphicsView):
+    """Transparent, click-through window over one screen showing pins.
+
+    Only the areas covered by pins (and their shadows) are part of the
+    window mask, everywhere else clicks go to the windows below.
+    """
+
+    def __init__(self, scene: PinScene, screen: QScreen, parent=None):
+        super().__init__(scene, parent)
+        self.setWindowFlags(
+            Qt.WindowType.FramelessWindowHint
+            | Qt.WindowType.WindowStaysOnTopHint
+            | Qt.WindowType.BypassWindowManagerHint
+            | Qt.WindowType.Tool
+        )
+        self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
+        self.setAttribute(Qt.WidgetAttribute.WA_ShowWithoutActivating)
+        self.setStyleSheet('background: transparent;')
+        self.setFrameStyle(QFrame.Shape.NoFrame)
+        self.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.setAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop)
+        self.setViewportUpdateMode(
+            QGraphicsView.ViewportUpdateMode.SmartViewportUpdate
+        )
+        self.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+        self.set_screen(screen)
+
+    def set_screen(self, screen: QScreen):
+        self.screen_ = screen
+        self.setScreen(screen)
+        self.setSceneRect(QRectF(screen.geometry()))
+        self.setGeometry(screen.geometry())
+
+    def update_mask(self) -> bool:
+        """Shape the window around the pins, returns whether any is visible."""
+        area = self.sceneRect()
+        region = QRegion()
+        for item in self.scene().pins():
+            rect = item.sceneBoundingRect()
+            if rect.intersects(area):
+                region += rect.translated(-area.topLeft()).toAlignedRect()
+        if region.isEmpty():
+            return False
+        self.setMask(region)
+        return True
+
+
+class PinCompositor(QObject):
+    """Keeps one `PinOverlay` per screen over a shared `PinScene`.
+
+    Pin changes are gathered until the event loop comes back, then only
+    the overlays they touched are reshaped.
+    """
+
+    def __init__(self, themer: ThemeContainer, parent=None):
+        super().__init__(parent)
+        self.themer = themer
+        self.scene = PinScene(self)
+        self.overlays: Dict[QScreen, PinOverlay] = {}
+        # what changed since the last update
+        self.dirty_area = QRectF()
+        self.dirty_sizes = False
+        self.update_timer = QTimer(self)
+        self.update_timer.setSingleShot(True)
+        self.update_timer.setInterval(0)
+        self.update_timer.timeout.connect(self.flush)
+        # the limit to go back to once the pins no longer need more
+        self.cache_limit = QPixmapCache.cacheLimit()
+        self.scene.pinsChanged.connect(self.schedule)
+        app = QGuiApplication.instance()
+        app.screenAdded.connect(lambda _: self.update_overlays())
+        app.screenRemoved.connect(lambda _: self.update_overlays())
+
+    def add(self, img: QPixmap, pos: QPoint) -> PinItem:
+        item = PinItem(img, pos, self.themer)
+        self.scene.addItem(item)
+        self.scene.raise_pin(item)
+        self.reserve_cache()
+        self.update_overlays(item.sceneBoundingRect())
+        return item
+
+    def schedule(self, area: QRectF, resized: bool):
+        self.dirty_area = self.dirty_area.united(area)
+        self.dirty_sizes = self.dirty_sizes or resized
+        if not self.update_timer.isActive():
+            self.update_timer.start()
+
+    def flush(self):
+        if self.dirty_sizes:
+            self.reserve_cache()
+        area = self.dirty_area
+        self.dirty_area = QRectF()
+        self.dirty_sizes = False
+        self.update_overlays(area)
+
+    def reserve_cache(self):
+        # item caches live in QPixmapCache, once they outgrow it every
+        # frame repaints all pins from scratch
+        needed = 0
+        for pin in self.scene.pins():
+            rect = pin.boundingRect()
+            dpr = pin.original_pixmap.devicePixelRatio()
+            needed += int(rect.width() * rect.height() * dpr * dpr * 4)
+        # both screens of a pin spanning two may keep a copy
+        needed = max(needed * 2 // 1024, self.cache_limit)
+        if QPixmapCache.cacheLimit() != needed:
+            QPixmapCache.setCacheLimit(needed)
+
+    def update_overlays(self, area: Optional[QRectF] = None):
+        """Reshape the overlays of the screens `area` touches, all without one."""
+        screens = QGuiApplication.screens()
+        for screen in list(self.overlays):
+            if screen not in screens:
+                self.overlays.pop(screen).deleteLater()
+        for screen in screens:
+            overlay = self.overlays.get(screen)
+            if overlay is None:
+                overlay = PinOverlay(self.scene, screen)
+                self.overlays[screen] = overlay
+            elif area is not None and not area.intersects(overlay.sceneRect()):
+                continue
+            else:
+                overlay.set_screen(screen)
+            if overlay.update_mask():
+                if not overlay.isVisible():
+                    overlay.show()
+            elif overlay.isVisible():
+                overlay.hide()
+
+
+if __name__ == '__main__':
+    # drag and zoom cost with many pins, e.g. `python overlay.py 50`
+    import sys
+    import time
+    import random
+    from PySide6.QtCore import QRect
+
+    app = QApplication(sys.argv)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    themer = ThemeContainer()
+    compositor = PinCompositor(themer)
+    random.seed(1)
+    geometry = QGuiApplication.primaryScreen().geometry()
+    pins = []
+    for index in range(count):
+        pixmap = QPixmap(320, 200)
+        pixmap.fill(QColor.fromHsv(index * 37 % 360, 120, 220))
+        pins.append(compositor.add(pixmap, QPoint(
+            random.randrange(geometry.width() - 320),
+            random.randrange(geometry.height() - 200),
+        )))
+    overlay = next(iter(compositor.overlays.values()))
+    for _ in range(5):
+        app.processEvents()
+
+    pin = pins[-1]
+    start = time.perf_counter()
+    for step in range(200):
+        pin.setPos(pin.pos() + QPointF(1, 1))
+        app.processEvents()
+    moved = time.perf_counter()
+    for step in range(100):
+        pin.resize(pin.display_size * (1.01 if step % 2 else 0.99), QPointF())
+        app.processEvents()
+    zoomed = time.perf_counter()
+    print(f'{count} pins')
+    print(f'drag frame: {(moved - start) / 200 * 1000:.2f} ms')
+    print(f'zoom frame: {(zoomed - moved) / 100 * 1000:.2f} ms')
@@ -0,0 +1,305 @@
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional, Sequence, Tuple, Union
+
+import numpy as np
+from PySide6.QtGui import QImage, QPixmap
+from loguru import logger
+
+from op_redact import image_pixels
+
+PNG_FILTER = "PNG image (*.png)"
+OPTIMIZED_PNG_FILTER = "Optimized PNG image (*.png)"
+# lossy beyond 256 colors
+REDUCED_PNG_FILTER = "Optimized PNG image, reduced colors (*.png)"
+# for QFileDialog.getSaveFileName
+SAVE_FILTERS = ';;'.join((PNG_FILTER, OPTIMIZED_PNG_FILTER, REDUCED_PNG_FILTER))
+
+# the filter strategies tried, each is compressed on its own thread
+STRATEGIES = ('none', 'sub', 'up', 'paeth', 'adaptive')
+# strategies are ranked at this level, level 9 is ten times slower
+TRIAL_LEVEL = 6
+_FILTER_TYPES = {'none': 0, 'sub': 1, 'up': 2, 'average': 3, 'paeth': 4}
+
+COLOR_TYPE_RGB = 2
+COLOR_TYPE_PALETTE = 3
+COLOR_TYPE_RGBA = 6
+
+
+@dataclass
+class Raster:
+    """Pixel rows as they go into the PNG, before filtering."""
+    rows: np.ndarray
+    # bytes per complete pixel, at least 1, what the filters look back by
+    bpp: int
+    color_type: int
+    bit_depth: int
+    # ARGB colors of a palette image
+    palette: Optional[np.ndarray] = None
+
+
+def palette_indices(
+    values: np.ndarray, opaque: bool, max_colors: int = 256,
+) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """Index image and palette of ARGB `values`, None with too many colors."""
+    if opaque:
+        # 24 bit colors, a table marking the ones seen beats sorting them
+        rgb = values & 0xFFFFFF
+        seen = np.zeros(1 << 24, dtype=bool)
+        seen[rgb] = True
+        colors = np.flatnonzero(seen)
+        if len(colors) > max_colors:
+            return None
+        lut = np.zeros(1 << 24, dtype=np.uint8)
+        lut[colors] = np.arange(len(colors), dtype=np.uint8)
+        return lut[rgb], colors.astype(np.uint32) | 0xFF000000
+    colors, inverse = np.unique(values, return_inverse=True)
+    if len(colors) > max_colors:
+        return None
+    return inverse.reshape(values.shape).astype(np.uint8), colors
+
+
+def posterize(
+    values: np.ndarray, opaque: bool, max_colors: int = 256,
+) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """Drop low bits of each color channel until `max_colors` are left.
+
+    This is lossy: each color becomes the middle of its bucket. Alpha is
+    kept exact.
+    """
+    for shift in range(1, 6):
+        keep = (0xFF << shift) & 0xFF
+        mask = np.uint32(0xFF000000 | keep * 0x010101)
+        center = np.uint32((1 << (shift - 1)) * 0x010101)
+        found = palette_indices(values & mask, opaque, max_colors)
+        if found is not None:
+            indices, colors = found
+            logger.debug('png.posterize shift={}, colors={}', shift, len(colors))
+            return indices, colors | center
+    return None
+
+
+def _pack(indices: np.ndarray, depth: int) -> np.ndarray:
+    """Pack 8 bit palette indices into rows of `depth` bit samples."""
+    if depth == 8:
+        return indices
+    per_byte = 8 // depth
+    height, width = indices.shape
+    padded = np.pad(indices, ((0, 0), (0, -width % per_byte)))
+    padded = padded.reshape(height, -1, per_byte)
+    shifts = (8 - depth * np.arange(1, per_byte + 1)).astype(np.uint8)
+    return (padded << shifts).sum(axis=2, dtype=np.uint8)
+
+
+def raster(image: QImage, quantize: bool = False) -> Raster:
+    """The smallest lossless layout for `image`, a palette if possible."""
+    image = image.convertToFormat(QImage.Format.Format_ARGB32)
+    pixels = image_pixels(image)
+    values = pixels.view(np.uint32)[..., 0]
+    opaque = bool((pixels[..., 3] == 255).all())
+
+    found = palette_indices(values, opaque)
+    if found is None and quantize:
+        found = posterize(values, opaque)
+    if found is not None:
+        indices, colors = found
+        depth = next(d for d in (1, 2, 4, 8) if len(colors) <= 1 << d)
+        return Raster(
+            rows=_pack(indices, depth),
+            bpp=1,
+            color_type=COLOR_TYPE_PALETTE,
+            bit_depth=depth,
+            palette=colors,
+        )
+    # memory order is B, G, R, A
+    if opaque:
+        rows = pixels[..., [2, 1, 0]]
+        return Raster(rows.reshape(image.height(), -1), 3, COLOR_TYPE_RGB, 8)
+    rows = pixels[..., [2, 1, 0, 3]]
+    return Raster(rows.reshape(image.height(), -1), 4, COLOR_TYPE_RGBA, 8)
+
+
+def _filter(rows: np.ndarray, bpp: int, kind: str) -> np.ndarray:
+    """Apply one PNG filter to every row, vectorized over the whole image."""
+    if kind == 'none':
+        return rows
+    left = np.zeros_like(rows)
+    left[:, bpp:] = rows[:, :-bpp]
+    if kind == 'sub':
+        return rows - left
+    up = np.zeros_like(rows)
+    up[1:] = rows[:-1]
+    if kind == 'up':
+        return rows - up
+    if kind == 'average':
+        return rows - ((left.astype(np.uint16) + up) >> 1).astype(np.uint8)
+    # paeth
+    up_left = np.zeros_like(rows)
+    up_left[1:, bpp:] = rows[:-1, :-bpp]
+    a = left.astype(np.int16)
+    b = up.astype(np.int16)
+    c = up_left.astype(np.int16)
+    pa = np.abs(b - c)
+    pb = np.abs(a - c)
+    pc = np.abs(a + b - 2 * c)
+    predicted = np.where(
+        (pa <= pb) & (pa <= pc), a, np.where(pb <= pc, b, c)
+    ).astype(np.uint8)
+    return rows - predicted
+
+
+def filtered(rows: np.ndarray, bpp: int, strategy: str) -> bytes:
+    """Filtered scanlines, each prefixed by its filter type."""
+    if strategy == 'adaptive':
+        # per row the filter with the smallest sum of signed bytes, the
+        # heuristic the PNG specification suggests
+        kinds = list(_FILTER_TYPES)
+        stack = np.stack([_filter(rows, bpp, kind) for kind in kinds])
+        scores = np.abs(stack.view(np.int8).astype(np.int32)).sum(axis=2)
+        best = scores.argmin(axis=0)
+        data = stack[best, np.arange(len(rows))]
+        types = np.array([_FILTER_TYPES[k] for k in kinds], np.uint8)[best]
+    else:
+        data = _filter(rows, bpp, strategy)
+        types = np.full(len(rows), _FILTER_TYPES[strategy], np.uint8)
+    return np.concatenate([types[:, None], data], axis=1).tobytes()
+
+
+def _chunk(kind: bytes, data: bytes) -> bytes:
+    return (
+        struct.pack('>I', len(data)) + kind + data
+        + struct.pack('>I', zlib.crc32(kind + data))
+    )
+
+
+def encode_png(
+    image: QImage, quantize: bool = False, strategies: Sequence[str] = STRATEGIES,
+) -> bytes:
+    """Encode `image` as small as we can.
+
+    Palette PNG when there are 256 colors or fewer (or after posterizing,
+    with `quantize`), and the smallest result of several filter
+    strategies, compressed in parallel. zlib and most of NumPy release
+    the GIL, so threads are enough. Palette data is small, its winner is
+    compressed again at level 9.
+    """
+    r = raster(image, quantize)
+    height, width = image.height(), image.width()
+
+    def trial(strategy: str) -> Tuple[bytes, bytes, str]:
+        data = filtered(r.rows, r.bpp, strategy)
+        return zlib.compress(data, TRIAL_LEVEL), data, strategy
+
+    with ThreadPoolExecutor(len(strategies)) as pool:
+        results = list(pool.map(trial, strategies))
+    idat, data, strategy = min(results, key=lambda result: len(result[0]))
+    del results
+    if r.palette is not None:
+        idat = min(idat, zlib.compress(data, 9), key=len)
+    logger.debug(
+        'png.encode size=({}*{}), color_type={}, depth={}, strategy={}, bytes={}',
+        width, height, r.color_type, r.bit_depth, strategy, len(idat),
+    )
+
+    chunks = [_chunk(b'IHDR', struct.pack(
+        '>IIBBBBB', width, height, r.bit_depth, r.color_type, 0, 0, 0,
+    ))]
+    if r.palette is not None:
+        argb = r.palette.astype('>u4').view(np.uint8).reshape(-1, 4)
+        chunks.append(_chunk(b'PLTE', argb[:, 1:].tobytes()))
+        alpha = argb[:, 0]
+        if (alpha < 255).any():
+            # trailing opaque entries may be left out
+            last = int(np.flatnonzero(alpha < 255)[-1])
+            chunks.append(_chunk(b'tRNS', alpha[:last + 1].tobytes()))
+    chunks.append(_chunk(b'IDAT', idat))
+    chunks.append(_chunk(b'IEND', b''))
+    return b'\x89PNG\r\n\x1a\n' + b''.join(chunks)
+
+
+def save_png(
+    image: Union[QImage, QPixmap], path: str, name_filter: str = PNG_FILTER,
+) -> bool:
+    """Save as PNG, optimized when `name_filter` asks for it."""
+    if name_filter not in (OPTIMIZED_PNG_FILTER, REDUCED_PNG_FILTER):
+        return image.save(path, "png")
+    if isinstance(image, QPixmap):
+        image = image.toImage()
+    try:
+        with open(path, 'wb') as f:
+            f.write(encode_png(image, name_filter == REDUCED_PNG_FILTER))
+    except OSError:
+        logger.exception('png.save path={}', path)
+        return False
+    return True
+
+
+if __name__ == '__main__':
+    # size and time of Qt's PNG writer against ours, on generated
+    # screenshots and any image files given as arguments
+    import sys
+    import time
+    from PySide6.QtCore import QBuffer, QIODevice, Qt
+    from PySide6.QtGui import QColor, QFont, QPainter
+    from PySide6.QtWidgets import (
+        QApplication, QCheckBox, QComboBox, QFormLayout, QLineEdit,
+        QPushButton, QWidget,
+    )
+
+    app = QApplication(sys.argv)
+
+    def dialog() -> QImage:
+        widget = QWidget()
+        form = QFormLayout(widget)
+        for index in range(12):
+            form.addRow(f'Setting {index}', QLineEdit(f'value {index}'))
+            form.addRow(QCheckBox(f'Enable feature {index}'))
+        combo = QComboBox()
+        combo.addItems(['First', 'Second'])
+        form.addRow('Choice', combo)
+        form.addRow(QPushButton('Apply'))
+        widget.resize(1280, 900)
+        return widget.grab().toImage()
+
+    def terminal() -> QImage:
+        image = QImage(1920, 1080, QImage.Format.Format_RGB32)
+        image.fill(QColor(30, 30, 30))
+        painter = QPainter(image)
+        painter.setFont(QFont('monospace', 11))
+        colors = [QColor(200, 200, 200), QColor(120, 200, 120), QColor(220, 120, 80)]
+        for line in range(60):
+            painter.setPen(colors[line % 3])
+            painter.drawText(8, 18 * (line + 1), f'$ make -j8 target_{line:03} ' * 4)
+        painter.end()
+        return image
+
+    def photo() -> QImage:
+        rng = np.random.default_rng(1)
+        y, x = np.mgrid[0:720, 0:1280]
+        image = QImage(1280, 720, QImage.Format.Format_RGB32)
+        pixels = image_pixels(image, writable=True)
+        pixels[..., 0] = (x / 5 + rng.integers(0, 8, x.shape)).astype(np.uint8)
+        pixels[..., 1] = (y / 3).astype(np.uint8)
+        pixels[..., 2] = ((x + y) / 8).astype(np.uint8)
+        pixels[..., 3] = 255
+        del pixels
+        return image
+
+    corpus = [('dialog', dialog()), ('terminal', terminal()), ('gradient', photo())]
+    corpus += [(path, QImage(path)) for path in sys.argv[1:]]
+
+    print(f'{"image":>10} {"qt png":>16} {"optimized":>16} {"posterized":>16}')
+    for name, image in corpus:
+        row = [f'{name[-10:]:>10}']
+        start = time.perf_counter()
+        buffer = QBuffer()
+        buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+        image.save(buffer, 'png')
+        row.append(f'{buffer.size():>8} {(time.perf_counter() - start) * 1000:5.0f} ms')
+        for quantize in (False, True):
+            start = time.perf_counter()
+            size = len(encode_png(image, quantize))
+            row.append(f'{size:>8} {(time.perf_counter() - start) * 1000:5.0f} ms')
+        print(' '.join(row))
@@ -0,0 +1,357 @@
+import hashlib
+import json
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from functools import partial
+from typing import Dict, List, Optional, Set, Tuple, Union, TYPE_CHECKING
+
+import numpy as np
+from PySide6.QtCore import QPointF, QRect
+from PySide6.QtGui import QColor, QFont, QImage
+from PySide6.QtWidgets import QGraphicsItem
+from loguru import logger
+
+from op_pen import PenStroke
+from op_redact import RedactItem, RedactMode, image_pixels
+from op_text import NodeTag
+
+if TYPE_CHECKING:
+    from editor import EditorScene
+
+PROJECT_FILTER = "PySP project (*.pysp)"
+VERSION = 1
+# square tiles of the capture, in native pixels
+TILE_SIZE = 256
+# tiles are raw BGRA rows, deflated
+TILE_LEVEL = 6
+
+Rect = Tuple[int, int, int, int]
+
+
+def rect_tuple(rect: QRect) -> Rect:
+    return rect.x(), rect.y(), rect.width(), rect.height()
+
+
+@dataclass
+class TextNote:
+    x: float
+    y: float
+    text: str
+    font: str
+    point_size: float
+    # '#AARRGGBB'
+    color: str
+    scale: float = 1.0
+    origin: Tuple[float, float] = (0.0, 0.0)
+    kind: str = 'text'
+
+
+@dataclass
+class Stroke:
+    x: float
+    y: float
+    # relative to (x, y), already simplified
+    points: List[Tuple[float, float]]
+    color: str
+    width: float
+    kind: str = 'stroke'
+
+
+@dataclass
+class Redaction:
+    mode: str
+    area: Rect
+    kind: str = 'redact'
+
+
+Annotation = Union[TextNote, Stroke, Redaction]
+ANNOTATION_TYPES = {cls.kind: cls for cls in (TextNote, Stroke, Redaction)}
+
+
+@dataclass
+class ProjectData:
+    """What a project file holds besides the capture pixels."""
+    # native size of the capture
+    width: int
+    height: int
+    # the selection being edited, and the kept regions, scene coordinates
+    selection: Rect = (0, 0, 0, 0)
+    regions: List[Rect] = field(default_factory=list)
+    annotations: List[Annotation] = field(default_factory=list)
+    # (geometry, dpr) of the screens the capture was taken on
+    screens: List[Tuple[Rect, float]] = field(default_factory=list)
+
+
+@dataclass
+class KeptTiles:
+    """Tiles of a reopened project that were never decoded.
+
+    Their pixels in the editor are placeholders, so saving again writes
+    them back from here, still compressed.
+    """
+    # key of every tile, as in the project file
+    keys: List[Union[int, str]]
+    # indices of the tiles that were decoded
+    decoded: Set[int]
+    # compressed blobs of the other tiles
+    blobs: Dict[str, bytes]
+
+
+def annotation_of(item: QGraphicsItem) -> Optional[Annotation]:
+    """Vector data of an editor annotation item."""
+    if isinstance(item, NodeTag):
+        origin = item.transformOriginPoint()
+        return TextNote(
+            x=item.x(), y=item.y(),
+            text=item.toPlainText(),
+            font=item.font().family(),
+            point_size=item.font().pointSizeF(),
+            color=item.defaultTextColor().name(QColor.NameFormat.HexArgb),
+            scale=item.current_scale,
+            origin=(origin.x(), origin.y()),
+        )
+    if isinstance(item, PenStroke):
+        return Stroke(
+            x=item.x(), y=item.y(),
+            points=item.points[:item.count].tolist(),
+            color=item.pen.color().name(QColor.NameFormat.HexArgb),
+            width=item.pen.widthF(),
+        )
+    if isinstance(item, RedactItem):
+        return Redaction(mode=item.mode.name, area=rect_tuple(item.area))
+    return None
+
+
+def build_item(annotation: Annotation, scene: 'EditorScene') -> QGraphicsItem:
+    """An editor item for `annotation`, not added to `scene` yet."""
+    if isinstance(annotation, TextNote):
+        item = NodeTag(annotation.text)
+        item.setFont(QFont(annotation.font, annotation.point_size))
+        item.setDefaultTextColor(QColor(annotation.color))
+        item.setPos(annotation.x, annotation.y)
+        item.setTransformOriginPoint(QPointF(*annotation.origin))
+        item.setScale(annotation.scale)
+        item.current_scale = annotation.scale
+        return item
+    if isinstance(annotation, Stroke):
+        item = PenStroke(
+            QPointF(annotation.x, annotation.y),
+            QColor(annotation.color), annotation.width,
+        )
+        item.points = np.array(annotation.points, dtype=np.float32).reshape(-1, 2)
+        item.count = len(item.points)
+        item.finish(simplified=True)
+        return item
+    # the blocks are averaged from the capture again, only the area is kept
+    item = RedactItem(RedactMode[annotation.mode], scene.redact_sources())
+    item.set_area(QRect(*annotation.area))
+    item.finish()
+    return item
+
+
+def _tile_rects(width: int, height: int, size: int = TILE_SIZE) -> List[QRect]:
+    return [
+        QRect(x, y, min(size, width - x), min(size, height - y))
+        for y in range(0, height, size)
+        for x in range(0, width, size)
+    ]
+
+
+def write_project(
+    path: str, image: QImage, data: ProjectData, kept: Optional[KeptTiles] = None,
+):
+    """Write the capture as tiles, next to the vector data, into `path`.
+
+    A tile of one color is stored as that color, identical tiles are
+    stored once, the rest are deflated on a thread pool. Tiles in `kept`
+    that were not decoded are copied as they are, not read from `image`.
+    """
+    image = image.convertToFormat(QImage.Format.Format_RGB32)
+    pixels = image_pixels(image)
+    rects = _tile_rects(image.width(), image.height())
+    if kept is None:
+        encoded = list(range(len(rects)))
+        tiles: List[Union[int, str]] = [0] * len(rects)
+    else:
+        encoded = sorted(kept.decoded)
+        tiles = list(kept.keys)
+
+    def encode(rect: QRect) -> Tuple[Union[int, str], Optional[bytes]]:
+        tile = np.ascontiguousarray(pixels[
+            rect.top():rect.bottom() + 1, rect.left():rect.right() + 1,
+        ])
+        values = tile.view(np.uint32)
+        if (values == values.flat[0]).all():
+            return int(values.flat[0]), None
+        raw = tile.tobytes()
+        return hashlib.blake2b(raw, digest_size=12).hexdigest(), raw
+
+    blobs: Dict[str, bytes] = {}
+    with ThreadPoolExecutor() as pool, zipfile.ZipFile(path, 'w') as archive:
+        for index, (key, raw) in zip(encoded, pool.map(encode, [rects[i] for i in encoded])):
+            tiles[index] = key
+            if raw is not None:
+                blobs[key] = raw
+        compressed = pool.map(partial(zlib.compress, level=TILE_LEVEL), blobs.values())
+        for key, blob in zip(blobs, compressed):
+            # deflated already
+            archive.writestr(f'tiles/{key}', blob)
+        if kept is not None:
+            for key, blob in kept.blobs.items():
+                # the same key is the same pixels
+                if key not in blobs:
+                    archive.writestr(f'tiles/{key}', blob)
+        meta = asdict(data)
+        meta.update(version=VERSION, tile_size=TILE_SIZE, tiles=tiles)
+        archive.writestr(
+            'project.json', json.dumps(meta), compress_type=zipfile.ZIP_DEFLATED,
+        )
+    logger.debug(
+        'project.write path={}, tiles={}, stored={}, annotations={}',
+        path, len(tiles), len(blobs), len(data.annotations),
+    )
+
+
+class ProjectFile:
+    """An open project file.
+
+    Opening only reads the vector data. Tiles are read and inflated when
+    `image` asks for a part of the capture they cover.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.archive = zipfile.ZipFile(path)
+        meta = json.loads(self.archive.read('project.json'))
+        if meta.get('version', 0) > VERSION:
+            raise ValueError(f'{path}: project version {meta["version"]} is too new')
+        self.tileSize: int = meta['tile_size']
+        self.tiles: List[Union[int, str]] = meta['tiles']
+        self.data = ProjectData(
+            width=meta['width'],
+            height=meta['height'],
+            selection=tuple(meta['selection']),
+            regions=[tuple(rect) for rect in meta['regions']],
+            annotations=[
+                ANNOTATION_TYPES[record['kind']](**record)
+                for record in meta['annotations']
+            ],
+            screens=[(tuple(rect), dpr) for rect, dpr in meta['screens']],
+        )
+        # inflated tiles, shared by identical ones
+        self.blobs: Dict[str, bytes] = {}
+        # indices of the tiles `image` filled in
+        self.decoded: Set[int] = set()
+
+    def close(self):
+        self.archive.close()
+        self.blobs.clear()
+
+    def image(self, rects: Optional[List[QRect]] = None) -> QImage:
+        """The capture, with only the tiles touching `rects` filled in.
+
+        Tiles are inflated on a thread pool, zlib lets go of the GIL.
+        """
+        width, height = self.data.width, self.data.height
+        image = QImage(width, height, QImage.Format.Format_RGB32)
+        image.fill(0)
+        pixels = image_pixels(image, writable=True)
+        if rects is None:
+            rects = [QRect(0, 0, width, height)]
+        needed = [
+            (index, tile, key)
+            for index, (tile, key) in enumerate(zip(_tile_rects(width, height, self.tileSize), self.tiles))
+            if any(tile.intersects(rect) for rect in rects)
+        ]
+        missing = list({
+            key for _, _, key in needed
+            if isinstance(key, str) and key not in self.blobs
+        })
+        compressed = [self.archive.read(f'tiles/{key}') for key in missing]
+        with ThreadPoolExecutor() as pool:
+            self.blobs.update(zip(missing, pool.map(zlib.decompress, compressed)))
+        for index, tile, key in needed:
+            self.decoded.add(index)
+            target = pixels[
+                tile.top():tile.bottom() + 1, tile.left():tile.right() + 1,
+            ]
+            if isinstance(key, int):
+                target.view(np.uint32)[...] = key
+            else:
+                target[...] = np.frombuffer(self.blobs[key], np.uint8).reshape(
+                    tile.height(), tile.width(), 4,
+                )
+        logger.debug(
+            'project.image tiles={}/{}, inflated={}',
+            len(needed), len(self.tiles), len(missing),
+        )
+        return image
+
+    def kept_tiles(self) -> KeptTiles:
+        """What saving again needs of the tiles `image` did not decode."""
+        missing = {
+            key for index, key in enumerate(self.tiles)
+            if index not in self.decoded and isinstance(key, str)
+        }
+        return KeptTiles(
+            keys=list(self.tiles),
+            decoded=set(self.decoded),
+            blobs={key: self.archive.read(f'tiles/{key}') for key in missing},
+        )
+
+
+if __name__ == '__main__':
+    # save and reopen a 4K capture with hundreds of annotations, e.g.
+    # `QT_QPA_PLATFORM=offscreen python project.py`
+    import os
+    import sys
+    import tempfile
+    import time
+    from PySide6.QtGui import QPainter, QPixmap
+    from PySide6.QtWidgets import QApplication
+    from editor import EditorWindow
+    from theme import ThemeContainer
+
+    app = QApplication(sys.argv)
+    editor = EditorWindow(ThemeContainer())
+    capture = QImage(3840, 2160, QImage.Format.Format_RGB32)
+    capture.fill(QColor('#F3F3F3'))
+    painter = QPainter(capture)
+    for line in range(0, 2160, 22):
+        painter.drawText(40, line, f'{line} the quick brown fox jumps over the lazy dog ' * 8)
+    painter.end()
+    editor.edit_new_capture(QPixmap.fromImage(capture))
+    scene = editor.scene
+    scene.selectionArea = scene.sceneRect().toRect().adjusted(20, 20, -20, -20)
+    scene.update_selection_area()
+    for index in range(300):
+        x, y = 40 + index * 7 % 700, 40 + index * 13 % 500
+        if index % 3 == 0:
+            item = NodeTag(f'note {index}')
+            item.setPos(x, y)
+        elif index % 3 == 1:
+            item = PenStroke(QPointF(x, y))
+            for step in range(40):
+                item.add_point(QPointF(x + step * 3, y + (step % 7) * 4))
+            item.finish()
+        else:
+            item = RedactItem(RedactMode.Pixelate, scene.redact_sources())
+            item.set_area(QRect(x, y, 60, 30))
+            item.finish()
+        scene.add_annotation(item)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'capture.pysp')
+        start = time.perf_counter()
+        editor.save_project_to(path)
+        saved = time.perf_counter() - start
+        print(f'save:   {saved * 1000:6.1f} ms, {os.path.getsize(path) / 1024:.0f} KiB')
+        editor.close()
+
+        start = time.perf_counter()
+        editor.open_project(path)
+        opened = time.perf_counter() - start
+        print(f'reopen: {opened * 1000:6.1f} ms, {len(scene.history)} annotations')
+        editor.close()
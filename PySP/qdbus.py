@@ -1,5 +1,8 @@
+import json
+
 from PySide6.QtDBus import QDBusAbstractAdaptor, QDBusConnection
 from PySide6.QtCore import QObject, Signal, ClassInfo, Slot
+from PySide6.QtGui import QImageReader
 
 from loguru import logger
 
@@ -11,6 +14,19 @@ SERVICE_ID = 'info.mynook.pysp'
     'D-Bus Introspection': f"""
 <interface name="{SERVICE_ID}">
   <method name="takeScreenshot"></method>
+  <method name="pinFile">
+    <arg name="path" type="s" direction="in"/>
+    <arg name="started" type="b" direction="out"/>
+  </method>
+  <method name="captureStats">
+    <arg name="stats" type="s" direction="out"/>
+  </method>
+  <method name="exportImages">
+    <arg name="directory" type="s" direction="in"/>
+    <arg name="format" type="s" direction="in"/>
+    <arg name="numbers" type="s" direction="in"/>
+    <arg name="started" type="b" direction="out"/>
+  </method>
 </interface>
 """,
 })
@@ -25,4 +41,24 @@ class DBusAdapter(QDBusAbstractAdaptor):
 
     @Slot(name='takeScreenshot', result=None)
     def takeScreenshot(self):
-        self.parent().shotter.take()
+        # only queued, the reply must not wait for the capture
+        self.parent().scheduler.request('dbus')
+
+    @Slot(str, name='pinFile', result=bool)
+    def pinFile(self, path: str):
+        """Pin an image file, False if it is not an image Qt can read."""
+        if not QImageReader(path).canRead():
+            return False
+        self.parent().pin_file(path)
+        return True
+
+    @Slot(name='captureStats', result=str)
+    def captureStats(self):
+        """Queue depth, wait times and counters of capture requests as JSON."""
+        return json.dumps(self.parent().scheduler.stats.as_dict())
+
+    @Slot(str, str, str, name='exportImages', result=bool)
+    def exportImages(self, directory: str, format: str, numbers: str):
+        """`numbers` is a comma separated list of pins, empty for all."""
+        selected = [int(n) for n in numbers.split(',') if n.strip().isdigit()]
+        return self.parent().export_images(directory, format or 'png', selected)
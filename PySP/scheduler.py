@@ -0,0 +1,128 @@
+import time
+from collections import deque
+from dataclasses import dataclass, asdict
+from enum import Enum
+from typing import Callable, Deque, Tuple
+
+from PySide6.QtCore import QObject, QTimer, Signal
+
+from loguru import logger
+
+
+class BusyPolicy(Enum):
+    # run the request once the editor closes
+    Queue = 1
+    # drop requests while the editor is open
+    Reject = 2
+
+
+@dataclass
+class SchedulerStats:
+    requested: int = 0
+    # duplicates inside the debounce window, or beyond the queue limit
+    coalesced: int = 0
+    rejected: int = 0
+    dispatched: int = 0
+    depth: int = 0
+    max_depth: int = 0
+    # seconds from request to capture
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    @property
+    def mean_wait(self) -> float:
+        return self.total_wait / self.dispatched if self.dispatched else 0.0
+
+    def as_dict(self) -> dict:
+        return {**asdict(self), 'mean_wait': self.mean_wait}
+
+
+class CaptureScheduler(QObject):
+    """Serializes capture requests from the tray, the menu and D-Bus.
+
+    `request` only records the request and returns, the capture itself runs
+    from the event loop, so callers such as D-Bus slots are answered right
+    away. Requests within `debounce` seconds of the previous one are
+    coalesced into it. While `busy()` is true, i.e. the editor is open,
+    requests wait in a short queue or are rejected after `policy`; `idle`
+    runs the next waiting one.
+    """
+    # source, seconds waited
+    dispatched = Signal(str, float)
+    # source
+    rejected = Signal(str)
+
+    def __init__(
+        self,
+        capture: Callable[[], None],
+        busy: Callable[[], bool],
+        debounce: float = 0.3,
+        max_queued: int = 1,
+        policy: BusyPolicy = BusyPolicy.Queue,
+        parent=None,
+    ):
+        super().__init__(parent)
+        self.capture = capture
+        self.busy = busy
+        self.debounce = debounce
+        self.maxQueued = max_queued
+        self.policy = policy
+        # (source, request time)
+        self.queue: Deque[Tuple[str, float]] = deque()
+        # a capture is on its way through the event loop
+        self.scheduled = False
+        self.lastRequest = float('-inf')
+        self.stats = SchedulerStats()
+
+    def request(self, source: str = 'tray') -> bool:
+        """Ask for a capture, False if it was rejected."""
+        now = time.monotonic()
+        self.stats.requested += 1
+        if now - self.lastRequest < self.debounce:
+            self.stats.coalesced += 1
+            logger.debug('capture.coalesced source={}', source)
+            return True
+        self.lastRequest = now
+        if self.policy == BusyPolicy.Reject and (self.scheduled or self.busy()):
+            self.stats.rejected += 1
+            logger.debug('capture.rejected source={}', source)
+            self.rejected.emit(source)
+            return False
+        if len(self.queue) >= self.maxQueued:
+            # one more capture after the editor closes is all anyone wants
+            self.stats.coalesced += 1
+            logger.debug('capture.coalesced source={}, depth={}', source, len(self.queue))
+            return True
+        self.queue.append((source, now))
+        self.stats.depth = len(self.queue)
+        self.stats.max_depth = max(self.stats.max_depth, self.stats.depth)
+        logger.debug('capture.queued source={}, depth={}', source, self.stats.depth)
+        self.pump()
+        return True
+
+    def idle(self):
+        """The editor closed, run what waited for it."""
+        self.pump()
+
+    def pump(self):
+        if self.queue and not self.scheduled and not self.busy():
+            self.scheduled = True
+            QTimer.singleShot(0, self._dispatch)
+
+    def _dispatch(self):
+        self.scheduled = False
+        if not self.queue or self.busy():
+            return
+        source, requested = self.queue.popleft()
+        waited = time.monotonic() - requested
+        self.stats.depth = len(self.queue)
+        self.stats.dispatched += 1
+        self.stats.total_wait += waited
+        self.stats.max_wait = max(self.stats.max_wait, waited)
+        logger.debug('capture.dispatch source={}, waited={:.3f}', source, waited)
+        self.dispatched.emit(source, waited)
+        self.capture()
+
+    def clear(self):
+        self.queue.clear()
+        self.stats.depth = 0
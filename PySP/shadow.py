@@ -0,0 +1,133 @@
+from math import ceil
+from functools import lru_cache
+from dataclasses import dataclass
+
+import numpy as np
+from PySide6.QtCore import Qt, QRectF
+from PySide6.QtGui import QImage, QPixmap, QPainter, QColor, QGuiApplication
+
+from op_redact import image_pixels
+from shotter import _load_xlibs
+
+
+@dataclass(frozen=True)
+class ShadowStyle:
+    blur_radius: float = 10
+    offset: float = 1
+    # ARGB, as accepted by QColor.fromRgba
+    color: int = 0xFF000000
+
+
+def _gaussian(sigma: float, extent: int) -> np.ndarray:
+    x = np.arange(-extent, extent + 1, dtype=np.float32)
+    kernel = np.exp(-0.5 * (x / sigma) ** 2)
+    return kernel / kernel.sum()
+
+
+class NinePatch:
+    """A drop shadow rendered once and stretched to any rectangle.
+
+    The texture is the blurred shadow of a square just big enough for the
+    blur of two opposite edges not to meet. Its corners are drawn as they
+    are and its one pixel wide middle row and column are stretched along
+    the edges, so any size costs eight `drawPixmap` calls and no blur.
+    The inside of the shadow is left out, the image covers it.
+    """
+
+    def __init__(self, style: ShadowStyle, dpr: float) -> None:
+        self.style = style
+        self.dpr = dpr
+        # how far the shadow reaches out of the rect, device independent
+        self.margin = ceil(style.blur_radius * 1.5)
+        # corners span the margin outside and the same distance inside
+        m = ceil(self.margin * dpr)
+        self.corner = 2 * m
+        side = 4 * m + 1
+        alpha = np.zeros((side, side), dtype=np.float32)
+        alpha[m:side - m, m:side - m] = 1
+        sigma = max(0.5, style.blur_radius / 2 * dpr)
+        kernel = _gaussian(sigma, m)
+        # separable blur, the box is far enough from the borders that
+        # "same" convolution never reads past them
+        alpha = np.apply_along_axis(np.convolve, 0, alpha, kernel, 'same')
+        alpha = np.apply_along_axis(np.convolve, 1, alpha, kernel, 'same')
+
+        color = QColor.fromRgba(style.color)
+        image = QImage(side, side, QImage.Format.Format_ARGB32_Premultiplied)
+        pixels = image_pixels(image, writable=True)
+        a = alpha * color.alpha()
+        pixels[..., 0] = (a * color.blue() / 255).astype(np.uint8)
+        pixels[..., 1] = (a * color.green() / 255).astype(np.uint8)
+        pixels[..., 2] = (a * color.red() / 255).astype(np.uint8)
+        pixels[..., 3] = a.astype(np.uint8)
+        del pixels
+        self.pixmap = QPixmap.fromImage(image)
+        self.side = side
+
+    def draw(self, painter: QPainter, rect: QRectF):
+        """Draw the shadow of `rect` (device independent coordinates)."""
+        rect = rect.translated(self.style.offset, self.style.offset)
+        c = self.corner
+        s = self.side
+        # device independent size of a corner
+        d = c / self.dpr
+        m = self.margin
+        outer = rect.adjusted(-m, -m, m, m)
+        if outer.width() < 2 * d or outer.height() < 2 * d:
+            # too small to stretch, scale the whole texture instead
+            painter.drawPixmap(outer, self.pixmap, QRectF(self.pixmap.rect()))
+            return
+        left, top = outer.left(), outer.top()
+        right, bottom = outer.right() - d, outer.bottom() - d
+        inner_w = outer.width() - 2 * d
+        inner_h = outer.height() - 2 * d
+        pieces = [
+            # corners
+            (QRectF(left, top, d, d), QRectF(0, 0, c, c)),
+            (QRectF(right, top, d, d), QRectF(s - c, 0, c, c)),
+            (QRectF(left, bottom, d, d), QRectF(0, s - c, c, c)),
+            (QRectF(right, bottom, d, d), QRectF(s - c, s - c, c, c)),
+            # edges, stretched from the middle row or column
+            (QRectF(left + d, top, inner_w, d), QRectF(c, 0, 1, c)),
+            (QRectF(left + d, bottom, inner_w, d), QRectF(c, s - c, 1, c)),
+            (QRectF(left, top + d, d, inner_h), QRectF(0, c, c, 1)),
+            (QRectF(right, top + d, d, inner_h), QRectF(s - c, c, c, 1)),
+        ]
+        for target, source in pieces:
+            painter.drawPixmap(target, self.pixmap, source)
+
+
+@lru_cache(maxsize=16)
+def nine_patch(style: ShadowStyle, dpr: float) -> NinePatch:
+    """The shadow texture of `style` at `dpr`, built on first use."""
+    return NinePatch(style, dpr)
+
+
+def compositing() -> bool:
+    """Whether translucent windows are blended over what is below them.
+
+    Only X11 may run without a compositor, it then fills the transparent
+    parts of a window with black. Elsewhere, or when the X server cannot
+    be asked, this is True.
+    """
+    if QGuiApplication.platformName() != 'xcb':
+        return True
+    libs = _load_xlibs()
+    if libs is None:
+        return True
+    xlib = libs[0]
+    display = xlib.XOpenDisplay(None)
+    if not display:
+        return True
+    try:
+        # a compositing manager owns this selection for its screen
+        name = f'_NET_WM_CM_S{xlib.XDefaultScreen(display)}'.encode()
+        atom = xlib.XInternAtom(display, name, False)
+        return xlib.XGetSelectionOwner(display, atom) != 0
+    finally:
+        xlib.XCloseDisplay(display)
+
+
+def shadow_margin(style: ShadowStyle) -> float:
+    """How far the shadow of `style` reaches out of its rect."""
+    return ceil(style.blur_radius * 1.5) + abs(style.offset)
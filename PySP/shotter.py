@@ -1,41 +1,777 @@
-from PySide6.QtCore import QObject, Signal
-from PySide6.QtGui import QPixmap, QGuiApplication
-from typing import Optional, Any
-from mss import mss
-from mss.models import Monitor
-from mss.screenshot import ScreenShot
+import os
+import time
+import ctypes
+import ctypes.util
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Optional, List, Type, Dict
+
+from PySide6.QtCore import QObject, Signal, QRect, QPoint, QSize, Qt
+from PySide6.QtGui import QPixmap, QGuiApplication, QImage, QPainter, QColor
 from loguru import logger
 
-from PIL import ImageQt, Image
+# environment variable to force a capture backend by name, e.g. `fake`
+BACKEND_ENV = 'PYSP_CAPTURE_BACKEND'
+# environment variable to capture and encode in a separate process, e.g. `1`
+DAEMON_ENV = 'PYSP_CAPTURE_DAEMON'
+
+
+@dataclass
+class Capabilities:
+    # can grab a single monitor without grabbing the whole desktop
+    per_monitor: bool
+    # can grab an arbitrary rectangle of the desktop
+    per_region: bool
+    # the mouse cursor is included in the captured image
+    cursor: bool
+
+
+class CaptureBackend:
+    """Base class of all capture backends.
+
+    All rectangles are in native (physical) pixels, relative to the
+    top left corner of the virtual desktop, which is what X11 uses for the
+    root window. Images returned by `grab` are `QImage.Format_RGB32`.
+    """
+    name = 'base'
+    capabilities = Capabilities(
+        per_monitor=False, per_region=False, cursor=False,
+    )
+
+    @classmethod
+    def available(cls) -> bool:
+        return True
+
+    def desktop(self) -> QRect:
+        raise NotImplementedError
+
+    def monitors(self) -> List[QRect]:
+        raise NotImplementedError
+
+    def grab(self, region: Optional[QRect] = None) -> QImage:
+        raise NotImplementedError
+
+    def grab_shared(self, region: Optional[QRect] = None) -> QImage:
+        """Like `grab`, but the image may be reused by the next call.
+
+        Backends with persistent buffers return them without copying,
+        callers must copy the image if it has to outlive the next grab.
+        """
+        return self.grab(region)
+
+    def close(self):
+        pass
+
+
+class MssBackend(CaptureBackend):
+    name = 'mss'
+    capabilities = Capabilities(
+        per_monitor=True, per_region=True, cursor=False,
+    )
+
+    def __init__(self) -> None:
+        from mss import mss
+        self.capturer = mss()
+
+    @classmethod
+    def available(cls) -> bool:
+        try:
+            import mss  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    @staticmethod
+    def _to_rect(monitor: dict) -> QRect:
+        return QRect(
+            monitor['left'], monitor['top'],
+            monitor['width'], monitor['height'],
+        )
+
+    def desktop(self) -> QRect:
+        return self._to_rect(self.capturer.monitors[0])
+
+    def monitors(self) -> List[QRect]:
+        return [self._to_rect(m) for m in self.capturer.monitors[1:]]
+
+    def grab(self, region: Optional[QRect] = None) -> QImage:
+        region = region or self.desktop()
+        data = self.capturer.grab({
+            'left': region.x(),
+            'top': region.y(),
+            'width': region.width(),
+            'height': region.height(),
+        })
+        # BGRA byte order is what Format_RGB32 expects on little endian
+        image = QImage(
+            data.raw,
+            data.width,
+            data.height,
+            data.width * 4,
+            QImage.Format.Format_RGB32,
+        )
+        # detach from the buffer owned by mss
+        return image.copy()
+
+    def close(self):
+        self.capturer.close()
+
+
+class XImage(ctypes.Structure):
+    # only the leading members are declared, the rest is never touched
+    _fields_ = [
+        ('width', ctypes.c_int),
+        ('height', ctypes.c_int),
+        ('xoffset', ctypes.c_int),
+        ('format', ctypes.c_int),
+        ('data', ctypes.c_void_p),
+        ('byte_order', ctypes.c_int),
+        ('bitmap_unit', ctypes.c_int),
+        ('bitmap_bit_order', ctypes.c_int),
+        ('bitmap_pad', ctypes.c_int),
+        ('depth', ctypes.c_int),
+        ('bytes_per_line', ctypes.c_int),
+        ('bits_per_pixel', ctypes.c_int),
+        ('red_mask', ctypes.c_ulong),
+        ('green_mask', ctypes.c_ulong),
+        ('blue_mask', ctypes.c_ulong),
+    ]
+
+
+class XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [
+        ('shmseg', ctypes.c_ulong),
+        ('shmid', ctypes.c_int),
+        ('shmaddr', ctypes.c_void_p),
+        ('readOnly', ctypes.c_int),
+    ]
+
+
+class XWindowAttributes(ctypes.Structure):
+    _fields_ = [
+        ('x', ctypes.c_int),
+        ('y', ctypes.c_int),
+        ('width', ctypes.c_int),
+        ('height', ctypes.c_int),
+        ('border_width', ctypes.c_int),
+        ('depth', ctypes.c_int),
+        ('visual', ctypes.c_void_p),
+        ('root', ctypes.c_ulong),
+        ('class_', ctypes.c_int),
+        ('bit_gravity', ctypes.c_int),
+        ('win_gravity', ctypes.c_int),
+        ('backing_store', ctypes.c_int),
+        ('backing_planes', ctypes.c_ulong),
+        ('backing_pixel', ctypes.c_ulong),
+        ('save_under', ctypes.c_int),
+        ('colormap', ctypes.c_ulong),
+        ('map_installed', ctypes.c_int),
+        ('map_state', ctypes.c_int),
+        # the remaining members are not used
+        ('_rest', ctypes.c_byte * 256),
+    ]
+
+
+class XErrorEvent(ctypes.Structure):
+    _fields_ = [
+        ('type', ctypes.c_int),
+        ('display', ctypes.c_void_p),
+        ('resourceid', ctypes.c_ulong),
+        ('serial', ctypes.c_ulong),
+        ('error_code', ctypes.c_ubyte),
+        ('request_code', ctypes.c_ubyte),
+        ('minor_code', ctypes.c_ubyte),
+    ]
+
+
+X_ERROR_HANDLER = ctypes.CFUNCTYPE(
+    ctypes.c_int, ctypes.c_void_p, ctypes.POINTER(XErrorEvent),
+)
+# error codes seen while `trap_x_errors` is active
+_x_errors: List[int] = []
+# the handler is global to the process, one trap at a time
+_x_errors_lock = threading.Lock()
+
+
+@X_ERROR_HANDLER
+def _record_x_error(display, event):
+    _x_errors.append(event.contents.error_code)
+    return 0
+
+
+@contextmanager
+def trap_x_errors(xlib, display):
+    """Record X errors instead of letting Xlib exit the process.
+
+    Yields the list of error codes, complete once the block is left;
+    requests made in the block are synced before the old handler is back.
+    """
+    with _x_errors_lock:
+        xlib.XSync(display, 0)
+        _x_errors.clear()
+        errors: List[int] = []
+        previous = xlib.XSetErrorHandler(
+            ctypes.cast(_record_x_error, ctypes.c_void_p),
+        )
+        try:
+            yield errors
+        finally:
+            xlib.XSync(display, 0)
+            xlib.XSetErrorHandler(previous)
+            errors.extend(_x_errors)
+            _x_errors.clear()
+
+
+Z_PIXMAP = 2
+IS_VIEWABLE = 2
+ALL_PLANES = ctypes.c_ulong(-1)
+IPC_PRIVATE = 0
+IPC_CREAT = 0o1000
+IPC_RMID = 0
+
+
+def _load_xlibs():
+    """Load libX11, libXext and libc, with the prototypes we call."""
+    names = [ctypes.util.find_library(n) for n in ('X11', 'Xext', 'c')]
+    if not all(names):
+        return None
+    xlib, xext, libc = [ctypes.CDLL(n) for n in names]
+
+    xlib.XOpenDisplay.argtypes = [ctypes.c_char_p]
+    xlib.XOpenDisplay.restype = ctypes.c_void_p
+    xlib.XCloseDisplay.argtypes = [ctypes.c_void_p]
+    xlib.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+    xlib.XDefaultRootWindow.restype = ctypes.c_ulong
+    xlib.XGetWindowAttributes.argtypes = [
+        ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(XWindowAttributes),
+    ]
+    xlib.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    # handlers go through as plain pointers, the old one may be NULL
+    xlib.XSetErrorHandler.argtypes = [ctypes.c_void_p]
+    xlib.XSetErrorHandler.restype = ctypes.c_void_p
+    xlib.XQueryTree.argtypes = [
+        ctypes.c_void_p, ctypes.c_ulong,
+        ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(ctypes.c_ulong),
+        ctypes.POINTER(ctypes.POINTER(ctypes.c_ulong)),
+        ctypes.POINTER(ctypes.c_uint),
+    ]
+    xlib.XQueryTree.restype = ctypes.c_int
+    xlib.XTranslateCoordinates.argtypes = [
+        ctypes.c_void_p, ctypes.c_ulong, ctypes.c_ulong,
+        ctypes.c_int, ctypes.c_int,
+        ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_int),
+        ctypes.POINTER(ctypes.c_ulong),
+    ]
+    xlib.XTranslateCoordinates.restype = ctypes.c_int
+    xlib.XFree.argtypes = [ctypes.c_void_p]
+    xlib.XDefaultScreen.argtypes = [ctypes.c_void_p]
+    xlib.XInternAtom.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int]
+    xlib.XInternAtom.restype = ctypes.c_ulong
+    xlib.XGetSelectionOwner.argtypes = [ctypes.c_void_p, ctypes.c_ulong]
+    xlib.XGetSelectionOwner.restype = ctypes.c_ulong
+    xlib.XDestroyImage.argtypes = [ctypes.POINTER(XImage)]
+
+    xext.XShmQueryExtension.argtypes = [ctypes.c_void_p]
+    xext.XShmQueryExtension.restype = ctypes.c_int
+    xext.XShmCreateImage.argtypes = [
+        ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int,
+        ctypes.c_char_p, ctypes.POINTER(XShmSegmentInfo),
+        ctypes.c_uint, ctypes.c_uint,
+    ]
+    xext.XShmCreateImage.restype = ctypes.POINTER(XImage)
+    xext.XShmAttach.argtypes = [
+        ctypes.c_void_p, ctypes.POINTER(XShmSegmentInfo),
+    ]
+    xext.XShmDetach.argtypes = [
+        ctypes.c_void_p, ctypes.POINTER(XShmSegmentInfo),
+    ]
+    xext.XShmGetImage.argtypes = [
+        ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(XImage),
+        ctypes.c_int, ctypes.c_int, ctypes.c_ulong,
+    ]
+    xext.XShmGetImage.restype = ctypes.c_int
+
+    libc.shmget.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]
+    libc.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+    libc.shmat.restype = ctypes.c_void_p
+    libc.shmdt.argtypes = [ctypes.c_void_p]
+    libc.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+    return xlib, xext, libc
+
+
+class ShmFrame:
+    """One MIT-SHM segment, its `XImage` and a `QImage` wrapping it."""
+
+    def __init__(self, engine: 'ShmCaptureEngine', size: QSize) -> None:
+        self.engine = engine
+        self.size = size
+        self.shminfo = XShmSegmentInfo()
+        self.ximage = engine.xext.XShmCreateImage(
+            engine.display,
+            engine.attributes.visual,
+            engine.attributes.depth,
+            Z_PIXMAP,
+            None,
+            ctypes.byref(self.shminfo),
+            size.width(),
+            size.height(),
+        )
+        if not self.ximage:
+            raise RuntimeError('XShmCreateImage failed')
+        depth = self.ximage.contents.depth
+        bits_per_pixel = self.ximage.contents.bits_per_pixel
+        if depth not in (24, 32) or bits_per_pixel != 32:
+            self._destroy_image()
+            raise RuntimeError(
+                f'unsupported visual, depth {depth}, {bits_per_pixel} bpp'
+            )
+        bytes_per_line = self.ximage.contents.bytes_per_line
+        length = bytes_per_line * size.height()
+        self.shminfo.shmid = engine.libc.shmget(
+            IPC_PRIVATE, length, IPC_CREAT | 0o600,
+        )
+        if self.shminfo.shmid < 0:
+            self._destroy_image()
+            raise RuntimeError('shmget failed')
+        address = engine.libc.shmat(self.shminfo.shmid, None, 0)
+        # shmat returns (void *) -1 on failure
+        if address is None or address == ctypes.c_void_p(-1).value:
+            engine.libc.shmctl(self.shminfo.shmid, IPC_RMID, None)
+            self._destroy_image()
+            raise RuntimeError('shmat failed')
+        self.shminfo.shmaddr = address
+        self.shminfo.readOnly = 0
+        self.ximage.contents.data = address
+        # a remote or sandboxed server fails the attach with BadAccess,
+        # which Xlib's default handler would turn into an exit
+        with trap_x_errors(engine.xlib, engine.display) as errors:
+            attached = engine.xext.XShmAttach(
+                engine.display, ctypes.byref(self.shminfo),
+            )
+        # the segment goes away as soon as both sides have detached
+        engine.libc.shmctl(self.shminfo.shmid, IPC_RMID, None)
+        if not attached or errors:
+            engine.libc.shmdt(address)
+            self._destroy_image()
+            raise RuntimeError(f'XShmAttach failed, X errors {errors}')
+
+        # keep a reference to the buffer, the image does not own it
+        self.buffer = (ctypes.c_char * length).from_address(
+            self.shminfo.shmaddr,
+        )
+        self.image = QImage(
+            self.buffer,
+            size.width(),
+            size.height(),
+            bytes_per_line,
+            QImage.Format.Format_RGB32,
+        )
+        logger.debug(
+            'shot.shm.new size={}*{}, bytes={}',
+            size.width(), size.height(), length,
+        )
+
+    def grab(self, origin: QPoint) -> QImage:
+        engine = self.engine
+        # BadMatch for an area past the root window would exit otherwise
+        with trap_x_errors(engine.xlib, engine.display) as errors:
+            ok = engine.xext.XShmGetImage(
+                engine.display, engine.root, self.ximage,
+                origin.x(), origin.y(), ALL_PLANES,
+            )
+        if not ok or errors:
+            raise RuntimeError(f'XShmGetImage failed, X errors {errors}')
+        return self.image
 
+    def _destroy_image(self):
+        # XDestroyImage would free() the shared memory address
+        self.ximage.contents.data = None
+        self.engine.xlib.XDestroyImage(self.ximage)
+        self.ximage = None
 
-class SimpleScreenShot(ScreenShot):
-    def __init__(self, data: bytearray, monitor: Monitor, **_: Any) -> None:
-        self.data = data
-        self.monitor = monitor
+    def release(self):
+        if self.ximage is None:
+            return
+        engine = self.engine
+        self.image = None
+        self.buffer = None
+        engine.xext.XShmDetach(engine.display, ctypes.byref(self.shminfo))
+        self._destroy_image()
+        engine.libc.shmdt(self.shminfo.shmaddr)
+
+
+class ShmCaptureEngine:
+    """Keep MIT-SHM segments alive across grabs.
+
+    There is one segment per slot, a slot being the whole desktop, one
+    monitor, or "any other region". A segment is only re-created when the
+    size of its slot changes, so repeated captures of the same geometry
+    do not allocate any frame-sized memory.
+    """
+    # segments kept for slots other than the desktop and the monitors
+    max_region_frames = 4
+
+    def __init__(self) -> None:
+        self.xlib, self.xext, self.libc = _load_xlibs()
+        self.display = self.xlib.XOpenDisplay(None)
+        if not self.display:
+            raise RuntimeError('cannot open X display')
+        if not self.xext.XShmQueryExtension(self.display):
+            self.xlib.XCloseDisplay(self.display)
+            self.display = None
+            raise RuntimeError('MIT-SHM extension not available')
+        self.root = self.xlib.XDefaultRootWindow(self.display)
+        self.attributes = XWindowAttributes()
+        self.frames: Dict[str, ShmFrame] = {}
+        # segments created so far, for the benchmark
+        self.created = 0
+        self.refresh()
+
+    def refresh(self):
+        """Re-read the root window geometry, e.g. after a monitor change."""
+        self.xlib.XGetWindowAttributes(
+            self.display, self.root, ctypes.byref(self.attributes),
+        )
+
+    def desktop(self) -> QRect:
+        # one round trip, cheap next to a grab; monitors come and go
+        # (hot-plug, xrandr) without telling us
+        self.refresh()
+        return QRect(0, 0, self.attributes.width, self.attributes.height)
+
+    def grab(self, slot: str, region: QRect) -> QImage:
+        """Grab `region` into the segment of `slot`.
+
+        The returned image is reused by the next grab of the same slot,
+        copy it if it has to outlive that. Parts of `region` outside the
+        root window are left out.
+        """
+        # as last read, `XShmBackend` reads it again before each grab
+        root = QRect(0, 0, self.attributes.width, self.attributes.height)
+        region = region.intersected(root)
+        if region.isEmpty():
+            raise RuntimeError('region is outside the desktop')
+        frame = self.frames.pop(slot, None)
+        if frame is not None and frame.size != region.size():
+            frame.release()
+            frame = None
+        if frame is None:
+            frame = ShmFrame(self, region.size())
+            self.created += 1
+            regions = [k for k in self.frames if k.startswith('region')]
+            if slot.startswith('region') \
+                    and len(regions) >= self.max_region_frames:
+                # least recently used first
+                self.frames.pop(regions[0]).release()
+        # most recently used last
+        self.frames[slot] = frame
+        return frame.grab(region.topLeft())
+
+    def close(self):
+        for frame in self.frames.values():
+            frame.release()
+        self.frames.clear()
+        if self.display:
+            self.xlib.XCloseDisplay(self.display)
+            self.display = None
+
+
+class XShmBackend(CaptureBackend):
+    """Grab the X11 root window through the MIT-SHM extension.
+
+    The X server writes pixels straight into a shared memory segment,
+    which skips the socket transfer `XGetImage` does.
+    """
+    name = 'xshm'
+    capabilities = Capabilities(
+        per_monitor=True, per_region=True, cursor=False,
+    )
+
+    def __init__(self) -> None:
+        self.engine = ShmCaptureEngine()
+
+    @classmethod
+    def available(cls) -> bool:
+        return bool(os.environ.get('DISPLAY')) and _load_xlibs() is not None
+
+    def desktop(self) -> QRect:
+        return self.engine.desktop()
+
+    def monitors(self) -> List[QRect]:
+        # X11 itself has no notion of monitors, ask Qt which talks RandR
+        return QtBackend.native_geometries() or [self.desktop()]
+
+    def _slot(self, region: QRect) -> str:
+        if region == self.desktop():
+            return 'desktop'
+        for index, monitor in enumerate(self.monitors()):
+            if region == monitor:
+                return f'monitor{index}'
+        # live pins grab the same few regions over and over, one segment
+        # per size keeps them from re-creating each other's segment
+        return f'region{region.width()}x{region.height()}'
+
+    def grab(self, region: Optional[QRect] = None) -> QImage:
+        return self.grab_shared(region).copy()
+
+    def grab_shared(self, region: Optional[QRect] = None) -> QImage:
+        region = region or self.desktop()
+        return self.engine.grab(self._slot(region), region)
+
+    def close(self):
+        self.engine.close()
+
+
+class QtBackend(CaptureBackend):
+    name = 'qt'
+    capabilities = Capabilities(
+        per_monitor=True, per_region=True, cursor=False,
+    )
+
+    @classmethod
+    def available(cls) -> bool:
+        return QGuiApplication.instance() is not None
+
+    @staticmethod
+    def native_geometries() -> List[QRect]:
+        # Qt scales a screen around its top left corner, so only the size
+        # differs between device independent and native geometry
+        return [
+            QRect(
+                screen.geometry().topLeft(),
+                screen.geometry().size() * screen.devicePixelRatio(),
+            )
+            for screen in QGuiApplication.screens()
+        ]
+
+    @staticmethod
+    def to_native(rect: QRect) -> QRect:
+        """Device independent global rect to native pixels of its screen."""
+        screen = QGuiApplication.screenAt(rect.center()) \
+            or QGuiApplication.primaryScreen()
+        origin = screen.geometry().topLeft()
+        dpr = screen.devicePixelRatio()
+        return QRect(
+            origin + (rect.topLeft() - origin) * dpr,
+            rect.size() * dpr,
+        )
+
+    def desktop(self) -> QRect:
+        desktop = QRect()
+        for rect in self.native_geometries():
+            desktop = desktop.united(rect)
+        return desktop
+
+    def monitors(self) -> List[QRect]:
+        return self.native_geometries()
+
+    def grab(self, region: Optional[QRect] = None) -> QImage:
+        region = region or self.desktop()
+        image = QImage(region.size(), QImage.Format.Format_RGB32)
+        image.fill(Qt.GlobalColor.black)
+        painter = QPainter(image)
+        for screen, rect in zip(
+            QGuiApplication.screens(), self.native_geometries(),
+        ):
+            part = rect.intersected(region)
+            if part.isEmpty():
+                continue
+            dpr = screen.devicePixelRatio()
+            # grabWindow takes device independent coordinates
+            # relative to the screen
+            local = part.translated(-rect.topLeft())
+            shot = screen.grabWindow(
+                0,
+                int(local.x() / dpr), int(local.y() / dpr),
+                int(local.width() / dpr), int(local.height() / dpr),
+            )
+            shot.setDevicePixelRatio(1)
+            painter.drawPixmap(part.topLeft() - region.topLeft(), shot)
+        painter.end()
+        return image
+
+
+class FakeBackend(CaptureBackend):
+    """In-memory backend which renders a deterministic test pattern.
+
+    Needs neither a display nor a screen, so it can be used with the
+    offscreen Qt platform or under Xvfb.
+    """
+    name = 'fake'
+    capabilities = Capabilities(
+        per_monitor=True, per_region=True, cursor=False,
+    )
+
+    def __init__(
+        self,
+        monitors: Optional[List[QRect]] = None,
+        capabilities: Optional[Capabilities] = None,
+    ) -> None:
+        self._monitors = monitors or [QRect(0, 0, 1920, 1080)]
+        if capabilities is not None:
+            self.capabilities = capabilities
+        self.frames = 0
+
+    def desktop(self) -> QRect:
+        desktop = QRect()
+        for rect in self._monitors:
+            desktop = desktop.united(rect)
+        return desktop
+
+    def monitors(self) -> List[QRect]:
+        return list(self._monitors)
+
+    def grab(self, region: Optional[QRect] = None) -> QImage:
+        region = region or self.desktop()
+        self.frames += 1
+        image = QImage(region.size(), QImage.Format.Format_RGB32)
+        image.fill(Qt.GlobalColor.black)
+        painter = QPainter(image)
+        for index, rect in enumerate(self._monitors):
+            color = QColor.fromHsv((index * 70) % 360, 80, 200)
+            painter.fillRect(rect.translated(-region.topLeft()), color)
+        painter.end()
+        return image
+
+
+BACKENDS: List[Type[CaptureBackend]] = [
+    XShmBackend, MssBackend, QtBackend, FakeBackend,
+]
+
+
+def benchmark_backend(backend: CaptureBackend, rounds: int = 3) -> float:
+    """Return the best time of `rounds` full desktop grabs, in seconds."""
+    backend.grab()  # warm up
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        backend.grab()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def select_backend(
+    candidates: Optional[List[Type[CaptureBackend]]] = None,
+    rounds: int = 3,
+) -> CaptureBackend:
+    """Pick the fastest working backend on this machine.
+
+    The fake backend only takes part when explicitly listed in
+    `candidates` or requested through `PYSP_CAPTURE_BACKEND`.
+    """
+    forced = os.environ.get(BACKEND_ENV)
+    if candidates is None:
+        candidates = [b for b in BACKENDS if b is not FakeBackend]
+    if forced:
+        candidates = [b for b in BACKENDS if b.name == forced]
+
+    best, best_time = None, float('inf')
+    for cls in candidates:
+        if not cls.available():
+            continue
+        try:
+            backend = cls()
+            elapsed = benchmark_backend(backend, rounds)
+        except Exception as e:
+            logger.debug('shot.backend.fail name={}, error={}', cls.name, e)
+            continue
+        logger.debug(
+            'shot.backend.bench name={}, best_ms={:.2f}',
+            cls.name, elapsed * 1000,
+        )
+        if elapsed < best_time:
+            if best is not None:
+                best.close()
+            best, best_time = backend, elapsed
+        else:
+            backend.close()
+
+    if best is None:
+        raise RuntimeError('no usable capture backend')
+    logger.debug('shot.backend.select name={}', best.name)
+    return best
 
 
 class Shotter (QObject):
 
     captured = Signal(QPixmap)
 
-    def __init__(self, parent: Optional[QObject] = None) -> None:
+    def __init__(
+        self,
+        parent: Optional[QObject] = None,
+        backend: Optional[CaptureBackend] = None,
+    ) -> None:
         super().__init__(parent)
-        self.capturer = mss()
-        # self.capturer.cls_image = SimpleScreenShot
+        # the capture and encode process, see daemon.py
+        self.daemon = None
+        if backend is None and os.environ.get(DAEMON_ENV):
+            from daemon import CaptureDaemon, DaemonBackend
+            self.daemon = CaptureDaemon(self)
+            backend = DaemonBackend(self.daemon)
+        self.backend = backend or select_backend()
+
+    def grab_image(self, region: Optional[QRect] = None) -> QImage:
+        """Grab without emitting, for repeated captures.
+
+        The image is only valid until the next call, see
+        `CaptureBackend.grab_shared`.
+        """
+        return self.backend.grab_shared(region)
+
+    def close(self):
+        self.backend.close()
 
     def take(self):
-        data: ScreenShot = self.capturer.grab(self.capturer.monitors[0])
-        image = ImageQt.ImageQt(
-            Image.frombytes('RGB', data.size, data.bgra, 'raw', 'BGRX')
-        )
+        # a private image: QPixmap.fromImage keeps pointing at the pixels
+        # of a shared one, which the next grab overwrites
+        image = self.backend.grab()
         logger.debug(
-            'shot.new raw_image_size={}, data_valid={}',
-            data.size,
+            'shot.new backend={}, raw_image_size={}, data_valid={}',
+            self.backend.name,
+            image.size(),
             not image.isNull(),
         )
+        # native pixels of the whole virtual desktop, the editor tags each
+        # screen's part with that screen's own pixel ratio
         pixmap = QPixmap.fromImage(image)
-        pixmap.setDevicePixelRatio(
-            QGuiApplication.primaryScreen().devicePixelRatio()
-        )
         self.captured.emit(pixmap)
+
+
+if __name__ == '__main__':
+    # compare all usable backends, e.g. `xvfb-run python shotter.py`
+    import sys
+    from PySide6.QtWidgets import QApplication
+
+    app = QApplication(sys.argv)
+    from bench import rss_mib
+    print(f'{"backend":8} {"grab":>10} {"shared":>10}  {"segments":>8} {"rss":>9}')
+    for cls in BACKENDS:
+        if not cls.available():
+            print(f'{cls.name:8} unavailable')
+            continue
+        try:
+            backend = cls()
+        except Exception as e:
+            print(f'{cls.name:8} failed: {e}')
+            continue
+        elapsed = benchmark_backend(backend, rounds=10)
+
+        # steady state: frame sized allocations over repeated grabs, as
+        # segments created (XShm only) and resident memory grown
+        best = float('inf')
+        backend.grab_shared()
+        engine = getattr(backend, 'engine', None)
+        created = engine.created if engine is not None else 0
+        before = rss_mib()
+        for _ in range(10):
+            start = time.perf_counter()
+            backend.grab_shared()
+            best = min(best, time.perf_counter() - start)
+        grown = rss_mib() - before
+        segments = f'{engine.created - created:8}' if engine is not None else f'{"-":>8}'
+        print(
+            f'{cls.name:8} {elapsed * 1000:7.2f} ms {best * 1000:7.2f} ms'
+            f'  {segments} {grown:+5.1f} MiB'
+        )
+        backend.close()
@@ -0,0 +1,322 @@
+import os
+import ctypes
+from functools import partial
+from typing import List, Optional, Set
+
+import numpy as np
+from PySide6.QtCore import QObject, QRect, QPoint, QThreadPool, Signal
+from PySide6.QtGui import QImage
+from loguru import logger
+
+from shotter import XWindowAttributes, IS_VIEWABLE, _load_xlibs, trap_x_errors
+from op_redact import image_pixels
+
+INPUT_ONLY = 2
+
+
+def _children(xlib, display, window: int) -> List[int]:
+    """Children of `window`, bottom to top in stacking order."""
+    root = ctypes.c_ulong()
+    parent = ctypes.c_ulong()
+    children = ctypes.POINTER(ctypes.c_ulong)()
+    count = ctypes.c_uint()
+    if not xlib.XQueryTree(
+        display, window,
+        ctypes.byref(root), ctypes.byref(parent),
+        ctypes.byref(children), ctypes.byref(count),
+    ):
+        return []
+    try:
+        return children[:count.value]
+    finally:
+        if children:
+            xlib.XFree(children)
+
+
+def _walk(xlib, display, root: int, window: int, depth: int,
+          exclude: Set[int], rects: List[QRect]) -> bool:
+    """Append `window` and its viewable descendants to `rects`.
+
+    Returns False if the subtree holds one of the `exclude` windows.
+    """
+    if window in exclude:
+        return False
+    attributes = XWindowAttributes()
+    if not xlib.XGetWindowAttributes(display, window, ctypes.byref(attributes)):
+        return True
+    if attributes.map_state != IS_VIEWABLE \
+            or attributes.class_ == INPUT_ONLY \
+            or attributes.width < 4 or attributes.height < 4:
+        return True
+    x, y = ctypes.c_int(), ctypes.c_int()
+    unused = ctypes.c_ulong()
+    if not xlib.XTranslateCoordinates(
+        display, window, root, 0, 0,
+        ctypes.byref(x), ctypes.byref(y), ctypes.byref(unused),
+    ):
+        # gone meanwhile, or on another screen
+        return True
+    rects.append(QRect(x.value, y.value, attributes.width, attributes.height))
+    if depth > 1:
+        for child in _children(xlib, display, window):
+            if not _walk(xlib, display, root, child, depth - 1, exclude, rects):
+                return False
+    return True
+
+
+def window_rects(exclude: Set[int] = frozenset(), depth: int = 2) -> List[QRect]:
+    """Geometry of the viewable X11 windows, in native root coordinates.
+
+    Windows are listed bottom to top, each followed by its descendants
+    down to `depth` levels (the window manager frame and the client
+    window it holds). Top level windows holding one of the `exclude`
+    windows are left out. Returns an empty list without an X display.
+    """
+    if not os.environ.get('DISPLAY'):
+        return []
+    libs = _load_xlibs()
+    if libs is None:
+        return []
+    xlib = libs[0]
+    display = xlib.XOpenDisplay(None)
+    if not display:
+        return []
+    try:
+        root = xlib.XDefaultRootWindow(display)
+        rects: List[QRect] = []
+        # windows can be destroyed while we walk the tree, the BadWindow
+        # errors that follow would make Xlib exit the process
+        with trap_x_errors(xlib, display) as errors:
+            for top in _children(xlib, display, root):
+                subtree: List[QRect] = []
+                if _walk(xlib, display, root, top, depth, exclude, subtree):
+                    rects.extend(subtree)
+        if errors:
+            logger.debug('snap.windows.errors count={}', len(errors))
+        return rects
+    finally:
+        xlib.XCloseDisplay(display)
+
+
+def _windows(mask: np.ndarray, length: int, combine) -> np.ndarray:
+    """`combine` over every window of `length` cells along axis 0.
+
+    Windows are doubled in size at each step, so it takes about
+    log2(length) passes over the array.
+    """
+    span = 1
+    while span * 2 <= length:
+        mask = combine(mask[:-span], mask[span:])
+        span *= 2
+    if span < length:
+        rest = length - span
+        mask = combine(mask[:-rest], mask[rest:])
+    return mask
+
+
+def long_runs(mask: np.ndarray, length: int) -> np.ndarray:
+    """Keep the True cells of `mask` in runs of at least `length` along axis 0."""
+    if mask.shape[0] < length:
+        return np.zeros_like(mask)
+    # full[i]: the run covers [i, i + length)
+    full = _windows(mask, length, np.logical_and)
+    # a cell is kept when a full window covering it starts in
+    # [i - length + 1, i]
+    pad = np.zeros((length - 1,) + mask.shape[1:], dtype=bool)
+    return _windows(np.concatenate([pad, full, pad]), length, np.logical_or)
+
+
+def edge_maps(image: QImage, threshold: int, length: int):
+    """Long vertical and horizontal edges of an RGB32 image.
+
+    Returns `vertical`, shaped (height, width - 1), where `[y, x]` marks an
+    edge between columns x and x + 1, and `horizontal`, shaped
+    (width, height - 1) (transposed, so a column is contiguous), where
+    `[x, y]` marks an edge between rows y and y + 1.
+    """
+    pixels = image_pixels(image)
+    # integer luma from the BGRA bytes
+    gray = (
+        pixels[..., 0].astype(np.uint16) * 29
+        + pixels[..., 1].astype(np.uint16) * 150
+        + pixels[..., 2].astype(np.uint16) * 77
+    ) >> 8
+    gray = gray.astype(np.int16)
+    vertical = np.abs(np.diff(gray, axis=1)) > threshold
+    horizontal = np.abs(np.diff(gray, axis=0)) > threshold
+    del gray
+    vertical = long_runs(vertical, length)
+    horizontal = np.ascontiguousarray(long_runs(horizontal.T, length))
+    return vertical, horizontal
+
+
+class SnapMap:
+    """Snapping targets of one capture, precomputed for fast lookups.
+
+    Holds the window rectangles (as a NumPy array, bottom to top) and
+    boolean maps of the long straight edges in the captured image, all
+    in native pixels of the capture. A lookup tests every window at
+    once and scans one row and one column of the edge maps, which keeps
+    it in the tens of microseconds even on a 4K capture.
+    """
+    # gray level difference counted as an edge
+    edge_threshold = 24
+    # shortest straight edge (native pixels) kept in the map
+    edge_length = 24
+    # smallest region worth snapping to
+    min_size = 8
+
+    def __init__(self, windows: List[QRect], vertical: np.ndarray,
+                 horizontal: np.ndarray) -> None:
+        self.windows = np.array(
+            [(r.left(), r.top(), r.right(), r.bottom()) for r in windows],
+            dtype=np.int32,
+        ).reshape(-1, 4)
+        self.vertical = vertical
+        self.horizontal = horizontal
+        self.height = vertical.shape[0]
+        self.width = horizontal.shape[0]
+
+    @classmethod
+    def build(cls, image: QImage, windows: List[QRect]) -> 'SnapMap':
+        vertical, horizontal = edge_maps(
+            image, cls.edge_threshold, cls.edge_length,
+        )
+        return cls(windows, vertical, horizontal)
+
+    def windows_at(self, point: QPoint) -> List[QRect]:
+        """Windows containing `point`, innermost (topmost) first."""
+        x, y = point.x(), point.y()
+        w = self.windows
+        hits = np.flatnonzero(
+            (w[:, 0] <= x) & (x <= w[:, 2]) & (w[:, 1] <= y) & (y <= w[:, 3])
+        )
+        return [
+            QRect(QPoint(*w[i, :2].tolist()), QPoint(*w[i, 2:].tolist()))
+            for i in hits[::-1]
+        ]
+
+    def region_at(self, point: QPoint) -> Optional[QRect]:
+        """The box between the nearest edges around `point`."""
+        x, y = point.x(), point.y()
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        # edge i lies between pixel i and i + 1
+        xs = np.flatnonzero(self.vertical[y])
+        i = int(np.searchsorted(xs, x))
+        left = int(xs[i - 1]) + 1 if i > 0 else 0
+        right = int(xs[i]) if i < len(xs) else self.width - 1
+        ys = np.flatnonzero(self.horizontal[x])
+        i = int(np.searchsorted(ys, y))
+        top = int(ys[i - 1]) + 1 if i > 0 else 0
+        bottom = int(ys[i]) if i < len(ys) else self.height - 1
+        if right - left + 1 < self.min_size or bottom - top + 1 < self.min_size:
+            return None
+        return QRect(QPoint(left, top), QPoint(right, bottom))
+
+    def candidates_at(self, point: QPoint) -> List[QRect]:
+        """Snapping targets around `point`, smallest first."""
+        windows = self.windows_at(point)
+        candidates: List[QRect] = []
+        region = self.region_at(point)
+        if region is not None:
+            if windows:
+                region = region.intersected(windows[0])
+            if region.width() >= self.min_size \
+                    and region.height() >= self.min_size:
+                candidates.append(region)
+        for rect in windows:
+            if not candidates or rect != candidates[-1]:
+                candidates.append(rect)
+        return candidates
+
+
+class SnapMapBuilder(QObject):
+    """Builds `SnapMap`s on the global thread pool.
+
+    `ready` carries the key given to `start` along with the map, so a
+    result for an older capture can be told apart.
+    """
+    ready = Signal(int, object)
+
+    def start(self, key: int, image: QImage, origin: QPoint,
+              exclude: Set[int]):
+        # QImage is implicitly shared, the copy keeps the pixels alive
+        QThreadPool.globalInstance().start(
+            partial(self.run, key, QImage(image), QPoint(origin), set(exclude))
+        )
+
+    def run(self, key: int, image: QImage, origin: QPoint, exclude: Set[int]):
+        try:
+            windows = [
+                rect.translated(-origin) for rect in window_rects(exclude)
+            ]
+            snap = SnapMap.build(image, windows)
+        except Exception:
+            logger.exception('snap.build failed')
+            return
+        logger.debug(
+            'snap.build key={}, windows={}', key, len(snap.windows),
+        )
+        self.ready.emit(key, snap)
+
+
+if __name__ == '__main__':
+    # build a map over a few synthetic windows and time the lookups,
+    # e.g. `xvfb-run python snap.py`; without X11 only edges are used
+    import sys
+    import random
+    import time
+    from PySide6.QtWidgets import QApplication, QWidget
+    from PySide6.QtCore import Qt
+    from shotter import select_backend
+
+    app = QApplication(sys.argv)
+    geometries = [
+        QRect(100, 100, 640, 480),
+        QRect(400, 300, 500, 400),
+        QRect(1000, 150, 300, 600),
+    ]
+    widgets = []
+    for index, rect in enumerate(geometries):
+        widget = QWidget(
+            None,
+            Qt.WindowType.FramelessWindowHint
+            | Qt.WindowType.BypassWindowManagerHint,
+        )
+        widget.setStyleSheet(
+            f'background-color: hsv({index * 110}, 160, 220);'
+        )
+        widget.setGeometry(rect)
+        widget.show()
+        widgets.append(widget)
+    for _ in range(20):
+        app.processEvents()
+        time.sleep(0.02)
+
+    backend = select_backend()
+    image = backend.grab()
+    start = time.perf_counter()
+    windows = window_rects()
+    collected = time.perf_counter()
+    snap = SnapMap.build(image, windows)
+    built = time.perf_counter()
+    print(f'capture {image.width()}x{image.height()} via {backend.name}')
+    print(f'windows: {len(windows)} in {(collected - start) * 1000:.1f} ms')
+    print(f'edge map: {(built - collected) * 1000:.1f} ms')
+
+    for rect in geometries:
+        found = snap.candidates_at(rect.center())
+        print(f'{rect} -> {found[0] if found else None}')
+
+    random.seed(1)
+    points = [
+        QPoint(random.randrange(image.width()), random.randrange(image.height()))
+        for _ in range(5000)
+    ]
+    start = time.perf_counter()
+    for point in points:
+        snap.candidates_at(point)
+    elapsed = (time.perf_counter() - start) / len(points)
+    print(f'lookup: {elapsed * 1e6:.1f} us')
+    backend.close()
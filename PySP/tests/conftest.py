@@ -0,0 +1,15 @@
+import os
+import sys
+
+# the modules import each other by their flat names, as main.py runs them
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# no display needed, spawned capture daemons inherit this too
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import pytest
+from PySide6.QtWidgets import QApplication
+
+
+@pytest.fixture(scope='session')
+def app():
+    return QApplication.instance() or QApplication([])
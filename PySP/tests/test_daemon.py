@@ -0,0 +1,80 @@
+import os
+import signal
+
+import pytest
+from PySide6.QtCore import QEventLoop, QRect, QTimer
+
+import daemon
+from daemon import CaptureDaemon, DaemonBackend
+from png_writer import PNG_FILTER
+from shotter import BACKEND_ENV, DAEMON_ENV, FakeBackend, Shotter
+
+
+@pytest.fixture
+def capture_daemon(app, monkeypatch):
+    # the daemon inherits the environment and picks the fake backend
+    monkeypatch.setenv(BACKEND_ENV, FakeBackend.name)
+    capture = CaptureDaemon()
+    yield capture
+    capture.close()
+
+
+def test_round_trip(capture_daemon):
+    backend = DaemonBackend(capture_daemon)
+    assert capture_daemon.backend_name == FakeBackend.name
+    assert backend.desktop() == QRect(0, 0, 1920, 1080)
+    assert backend.monitors() == [QRect(0, 0, 1920, 1080)]
+    region = QRect(100, 50, 64, 32)
+    assert backend.grab(region) == FakeBackend().grab(region)
+    assert backend.fallback is None
+
+
+def test_save(capture_daemon, tmp_path):
+    path = str(tmp_path / 'frame.png')
+    results = []
+    loop = QEventLoop()
+    capture_daemon.saved.connect(lambda *result: (results.append(result), loop.quit()))
+    QTimer.singleShot(5000, loop.quit)
+    assert capture_daemon.save(FakeBackend().grab(QRect(0, 0, 64, 64)), path, PNG_FILTER)
+    loop.exec()
+    assert results == [(path, True)]
+    assert os.path.getsize(path) > 0
+
+
+def test_falls_back_when_the_daemon_dies(capture_daemon, tmp_path):
+    backend = DaemonBackend(capture_daemon)
+    capture_daemon.process.kill()
+    capture_daemon.process.join(5)
+    region = QRect(0, 0, 64, 64)
+    assert backend.grab(region) == FakeBackend().grab(region)
+    assert isinstance(backend.fallback, FakeBackend)
+    assert capture_daemon.lost
+    image = backend.grab(region)
+    assert not capture_daemon.save(image, str(tmp_path / 'lost.png'), PNG_FILTER)
+
+
+def test_falls_back_when_the_daemon_is_stuck(capture_daemon, monkeypatch):
+    monkeypatch.setattr(daemon, 'REQUEST_TIMEOUT', 0.2)
+    backend = DaemonBackend(capture_daemon)
+    os.kill(capture_daemon.process.pid, signal.SIGSTOP)
+    assert backend.desktop() == QRect(0, 0, 1920, 1080)
+    assert isinstance(backend.fallback, FakeBackend)
+    assert capture_daemon.lost
+
+
+def test_take_through_the_daemon_is_private(app, monkeypatch):
+    monkeypatch.setenv(BACKEND_ENV, FakeBackend.name)
+    monkeypatch.setenv(DAEMON_ENV, '1')
+    shotter = Shotter()
+    try:
+        assert isinstance(shotter.backend, DaemonBackend)
+        captured = []
+        shotter.captured.connect(captured.append)
+        shotter.take()
+        before = captured[0].toImage().pixel(0, 0)
+        # both frame slots of the daemon get overwritten, with black
+        for _ in range(daemon.FRAME_SLOTS):
+            shotter.grab_image(QRect(3000, 3000, 64, 64))
+        assert captured[0].toImage().pixel(0, 0) == before
+    finally:
+        shotter.close()
@@ -0,0 +1,70 @@
+import pytest
+from PySide6.QtCore import QRect
+from PySide6.QtGui import QColor
+
+from shotter import (
+    BACKEND_ENV, CaptureBackend, Capabilities, FakeBackend, QtBackend,
+    Shotter, select_backend,
+)
+
+
+class BrokenBackend(CaptureBackend):
+    name = 'broken'
+    capabilities = Capabilities(per_monitor=False, per_region=False, cursor=False)
+
+    def __init__(self) -> None:
+        raise RuntimeError('no display')
+
+
+class UnavailableBackend(BrokenBackend):
+    name = 'unavailable'
+
+    @classmethod
+    def available(cls) -> bool:
+        return False
+
+
+def test_fake_grabs_its_monitors():
+    left, right = QRect(0, 0, 100, 80), QRect(100, 0, 60, 80)
+    backend = FakeBackend([left, right])
+    assert backend.desktop() == QRect(0, 0, 160, 80)
+    assert backend.monitors() == [left, right]
+
+    image = backend.grab(QRect(90, 10, 20, 20))
+    assert image.size() == QRect(0, 0, 20, 20).size()
+    assert image.pixel(0, 0) == QColor.fromHsv(0, 80, 200).rgb()
+    assert image.pixel(19, 0) == QColor.fromHsv(70, 80, 200).rgb()
+
+
+def test_select_backend_takes_only_usable_candidates(app):
+    backend = select_backend([UnavailableBackend, BrokenBackend, FakeBackend], rounds=1)
+    assert isinstance(backend, FakeBackend)
+
+
+def test_select_backend_fails_without_candidates(app):
+    with pytest.raises(RuntimeError):
+        select_backend([BrokenBackend], rounds=1)
+
+
+def test_select_backend_leaves_fake_out_by_default(app, monkeypatch):
+    monkeypatch.delenv(BACKEND_ENV, raising=False)
+    # offscreen there is no X display, Qt is what is left
+    assert select_backend(rounds=1).name == QtBackend.name
+
+
+def test_backend_forced_by_environment(app, monkeypatch):
+    monkeypatch.setenv(BACKEND_ENV, FakeBackend.name)
+    assert isinstance(select_backend(rounds=1), FakeBackend)
+    assert isinstance(Shotter().backend, FakeBackend)
+
+
+def test_take_emits_a_private_capture(app):
+    shotter = Shotter(backend=FakeBackend([QRect(0, 0, 320, 200)]))
+    captured = []
+    shotter.captured.connect(captured.append)
+    shotter.take()
+    assert len(captured) == 1
+    before = captured[0].toImage().pixel(0, 0)
+    for _ in range(3):
+        shotter.grab_image(QRect(300, 180, 64, 64))
+    assert captured[0].toImage().pixel(0, 0) == before
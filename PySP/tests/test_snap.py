@@ -0,0 +1,49 @@
+import numpy as np
+from PySide6.QtCore import QPoint, QRect, Qt
+from PySide6.QtGui import QImage
+
+from snap import SnapMap, long_runs, window_rects
+
+
+def synthetic_capture() -> QImage:
+    """A white 400x300 capture with one black 200x150 box at (50, 40)."""
+    image = QImage(400, 300, QImage.Format.Format_RGB32)
+    image.fill(Qt.GlobalColor.white)
+    for y in range(40, 190):
+        for x in range(50, 250):
+            image.setPixel(x, y, 0xFF000000)
+    return image
+
+
+def test_long_runs_drops_short_runs():
+    mask = np.array([1, 1, 0, 1, 1, 1, 1, 0, 1], dtype=bool)
+    assert long_runs(mask, 3).tolist() == [0, 0, 0, 1, 1, 1, 1, 0, 0]
+
+
+def test_candidates_inside_a_box():
+    window = QRect(20, 20, 300, 250)
+    snap = SnapMap.build(synthetic_capture(), [window])
+    assert snap.candidates_at(QPoint(100, 100)) == [QRect(50, 40, 200, 150), window]
+
+
+def test_candidates_outside_the_box_are_the_window():
+    window = QRect(20, 20, 300, 250)
+    snap = SnapMap.build(synthetic_capture(), [window])
+    # the edges around it are the whole capture, cut down to the window
+    assert snap.candidates_at(QPoint(30, 30)) == [window]
+    # no window there, the whole capture is all that is left
+    assert snap.candidates_at(QPoint(350, 280)) == [QRect(0, 0, 400, 300)]
+
+
+def test_windows_innermost_first():
+    frame, client = QRect(10, 10, 300, 250), QRect(15, 30, 290, 225)
+    other = QRect(330, 10, 60, 60)
+    snap = SnapMap.build(synthetic_capture(), [frame, client, other])
+    assert snap.windows_at(QPoint(20, 40)) == [client, frame]
+    assert snap.windows_at(QPoint(12, 12)) == [frame]
+    assert snap.windows_at(QPoint(395, 295)) == []
+
+
+def test_no_windows_without_a_display(monkeypatch):
+    monkeypatch.delenv('DISPLAY', raising=False)
+    assert window_rects() == []
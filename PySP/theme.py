@@ -24,6 +24,9 @@ class IconSet:
     IconAbout: QIcon
     IconPin: QIcon
     IconText: QIcon
+    IconPixelate: QIcon
+    IconBlur: QIcon
+    IconPen: QIcon
 
 
 class ThemeContainer(QObject):
@@ -69,6 +72,9 @@ class ThemeContainer(QObject):
                 IconAbout=QIcon(os.path.join(icon_dir, "info.png")),
                 IconPin=QIcon(os.path.join(icon_dir, "pin.png")),
                 IconText=QIcon(os.path.join(icon_dir, "text.png")),
+                IconPixelate=QIcon(os.path.join(icon_dir, "pixelate.png")),
+                IconBlur=QIcon(os.path.join(icon_dir, "blur.png")),
+                IconPen=QIcon(os.path.join(icon_dir, "pen.png")),
             ))
         return sets
 
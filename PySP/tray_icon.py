@@ -1,17 +1,25 @@
-from PySide6.QtCore import QRect, QPoint, QPropertyAnimation, QEasingCurve, Qt
+from PySide6.QtCore import QRect, QPoint, QPointF, QSize, QPropertyAnimation, QEasingCurve, Qt
 from PySide6.QtWidgets import QSystemTrayIcon, QMenu, QApplication, QFileDialog
-from PySide6.QtGui import QIcon, QAction, QGuiApplication, QActionGroup, QPixmap
+from PySide6.QtGui import QIcon, QAction, QGuiApplication, QActionGroup, QPixmap, QImage, QImageReader, QCursor
 from functools import partial
+import time
 
 from loguru import logger
-from typing import List
+from typing import Dict, List, Union
 from about import AboutDialog
 from qdbus import DBusAdapter
 
 from shotter import Shotter
+from scheduler import BusyPolicy, CaptureScheduler
 from image import ImageLabel
+from overlay import PinCompositor, PinItem
 from editor import EditorWindow, ImageData
 from theme import ThemeContainer
+from export import BatchExporter
+from png_writer import SAVE_FILTERS, PNG_FILTER, save_png
+from history import CaptureIndex, HistoryDialog
+from project import PROJECT_FILTER
+from loader import ImageLoader, image_filter
 
 
 class TrayIcon(QSystemTrayIcon):
@@ -22,15 +30,43 @@ class TrayIcon(QSystemTrayIcon):
         self.themer = ThemeContainer()
         self.themer.themeChanged.connect(self.update_icons)
 
-        self.images: List[ImageLabel] = []
+        self.images: List[Union[ImageLabel, PinItem]] = []
         self.animations = []
         self.shotter = Shotter(self)
+        if self.shotter.daemon is not None:
+            self.shotter.daemon.saved.connect(self.image_saved)
+        # path => image being saved by the daemon, indexed once it is written
+        self.saving: Dict[str, QPixmap] = {}
+        # draws pins on one transparent overlay per screen instead of
+        # one window per pin, created on first use
+        self.compositor = None
+        self.exporter = BatchExporter(parent=self)
+        self.exporter.progress.connect(self.export_progress)
+        self.exporter.finished.connect(self.export_finished)
+        # 贴图和保存的文件的缩略图与感知哈希；截图本身不记录，
+        # 取消的和打码前的截图不该留在磁盘上
+        self.index = CaptureIndex(parent=self)
+        self.index.duplicate.connect(self.show_duplicate)
+        self.history_dialog = None
+        # pins from files and the clipboard, decoded off the GUI thread
+        self.loader = ImageLoader(self)
+        self.loader.preview.connect(self.pin_preview)
+        self.loader.loaded.connect(self.pin_loaded)
+        self.loader.failed.connect(self.pin_failed)
+        # loader job => the pin showing its preview
+        self.loading: Dict[int, Union[ImageLabel, PinItem]] = {}
 
         self.editor = EditorWindow(self.themer)
         self.editor.pinned.connect(self.pin_image)
         self.editor.copied.connect(self.copy_image)
         self.editor.saved.connect(self.save_image)
+        self.editor.savedAll.connect(self.save_images)
         self.shotter.captured.connect(self.editor.edit_new_capture)
+        # tray clicks, the menu and D-Bus all capture through here
+        self.scheduler = CaptureScheduler(
+            self.shotter.take, self.editor.isVisible, parent=self,
+        )
+        self.editor.closed.connect(self.scheduler.idle)
 
         self.about_open = False
 
@@ -49,6 +85,43 @@ class TrayIcon(QSystemTrayIcon):
         self.locate_action.triggered.connect(self.move_windows_on_screen)
         self.menu.addAction(self.locate_action)
 
+        self.pin_file_action = QAction("Pin from file...", self)
+        self.pin_file_action.triggered.connect(self.pin_files)
+        self.menu.addAction(self.pin_file_action)
+        self.pin_clipboard_action = QAction("Pin from clipboard", self)
+        self.pin_clipboard_action.triggered.connect(self.pin_clipboard)
+        self.menu.addAction(self.pin_clipboard_action)
+
+        self.overlay_action = QAction("Pins on shared overlay", self)
+        self.overlay_action.setCheckable(True)
+        self.menu.addAction(self.overlay_action)
+        self.menu.addAction(self.editor.action_auto_trim)
+
+        self.queue_action = QAction("Queue captures while editing", self)
+        self.queue_action.setCheckable(True)
+        self.queue_action.setChecked(True)
+        self.queue_action.toggled.connect(self.set_busy_policy)
+        self.menu.addAction(self.queue_action)
+
+        self.open_project_action = QAction("Open project...", self)
+        self.open_project_action.triggered.connect(self.open_project)
+        self.menu.addAction(self.open_project_action)
+
+        self.history_action = QAction("Capture history...", self)
+        self.history_action.triggered.connect(self.show_history)
+        self.menu.addAction(self.history_action)
+        self.index_action = QAction("Keep capture history", self)
+        self.index_action.setCheckable(True)
+        self.index_action.setChecked(self.index.enabled)
+        self.index_action.toggled.connect(self.set_indexing)
+        self.menu.addAction(self.index_action)
+
+        self.export_menu = self.menu.addMenu("Export all images")
+        for title, format in (("As PNG...", 'png'), ("As WebP...", 'webp')):
+            action = QAction(title, self)
+            action.triggered.connect(partial(self.export_images_to, format))
+            self.export_menu.addAction(action)
+
         self.menu.addSeparator()
 
         self.themes_menu = self.menu.addMenu(
@@ -99,15 +172,28 @@ class TrayIcon(QSystemTrayIcon):
         self.quit_action.setIcon(self.themer.get_icon('Quit'))
 
     def take_screenshot(self):
-        self.shotter.take()
-
-    def pin_image(self, img: ImageData):
-        image = ImageLabel(
-            img.image,
-            img.position,
-            self.themer,
-        )
+        self.scheduler.request('tray')
+
+    def set_busy_policy(self, queue: bool):
+        self.scheduler.policy = BusyPolicy.Queue if queue else BusyPolicy.Reject
+        if not queue:
+            self.scheduler.clear()
+
+    def pin_image(self, img: ImageData, live: bool = True) -> Union[ImageLabel, PinItem]:
+        """Pin `img`; `live` pins may mirror the screen area they came from."""
+        if self.overlay_action.isChecked():
+            if self.compositor is None:
+                self.compositor = PinCompositor(self.themer, self)
+            image = self.compositor.add(img.image, img.position)
+        else:
+            image = ImageLabel(
+                img.image,
+                img.position,
+                self.themer,
+                shotter=self.shotter if live else None,
+            )
         self.images.append(image)
+        self.index_image(img.image, 'pin')
         logger.debug(
             'manager.image.pin size=({w}*{h}), pos=({x}, {y}), indep_size=({iw}*{ih}), dpr={pr}, total_images={n}',
             w=img.image.size().width(),
@@ -126,7 +212,92 @@ class TrayIcon(QSystemTrayIcon):
                 'manager.image.destroy, total_images={n}', n=len(self.images),
             )
         image.destroyed.connect(cleanup)
-        image.show()
+        if isinstance(image, ImageLabel):
+            image.show()
+        return image
+
+    def pin_file(self, path: str) -> int:
+        return self.loader.load_file(path)
+
+    def pin_files(self):
+        paths, _ = QFileDialog.getOpenFileNames(None, "Pin images", filter=image_filter())
+        for path in paths:
+            self.pin_file(path)
+
+    def pin_clipboard(self):
+        clipboard = QApplication.clipboard()
+        mime = clipboard.mimeData()
+        if mime is None:
+            self.showMessage('PySP', 'There is no image in the clipboard')
+            return
+        if clipboard.ownsClipboard() and mime.hasImage():
+            # our own copy, already decoded
+            self.pin_loaded(0, clipboard.image())
+            return
+        paths = [url.toLocalFile() for url in mime.urls() if url.isLocalFile()]
+        if paths:
+            for path in paths:
+                self.pin_file(path)
+            return
+        formats = sorted(
+            (name for name in mime.formats() if name.startswith('image/')),
+            key=lambda name: name != 'image/png',
+        )
+        if formats:
+            # still encoded, it is decoded on the pool like a file
+            self.loader.load_data(bytes(mime.data(formats[0])))
+        elif mime.hasImage():
+            self.pin_loaded(0, clipboard.image())
+        else:
+            self.showMessage('PySP', 'There is no image in the clipboard')
+
+    def pin_position(self, size: QSize) -> QPoint:
+        """Around the cursor, inside the screen it is on."""
+        cursor = QCursor.pos()
+        screen = QGuiApplication.screenAt(cursor) or QGuiApplication.primaryScreen()
+        area = screen.availableGeometry()
+        x = min(max(cursor.x() - size.width() // 2, area.left()), area.right() - size.width())
+        y = min(max(cursor.y() - size.height() // 2, area.top()), area.bottom() - size.height())
+        return QPoint(max(x, area.left()), max(y, area.top()))
+
+    def file_pixmap(self, image: QImage, size: QSize) -> QPixmap:
+        """`image`, maybe a preview of a `size` image, as a pixmap to pin.
+
+        A pixel of the file is a native pixel of the screen under the
+        cursor, unless the image would not fit on that screen.
+        """
+        screen = QGuiApplication.screenAt(QCursor.pos()) or QGuiApplication.primaryScreen()
+        area = screen.availableGeometry()
+        dpr = screen.devicePixelRatio()
+        dpr *= max(
+            1.0,
+            size.width() / dpr / area.width(),
+            size.height() / dpr / area.height(),
+        )
+        pixmap = QPixmap.fromImage(image)
+        pixmap.setDevicePixelRatio(dpr * image.width() / size.width())
+        return pixmap
+
+    def pin_preview(self, job: int, image: QImage, size: QSize):
+        pixmap = self.file_pixmap(image, size)
+        position = self.pin_position(pixmap.deviceIndependentSize().toSize())
+        self.loading[job] = self.pin_image(ImageData(pixmap, position), live=False)
+
+    def pin_loaded(self, job: int, image: QImage):
+        pixmap = self.file_pixmap(image, image.size())
+        if job in self.loading:
+            pin = self.loading.pop(job)
+            # unless the preview was destroyed in the meantime
+            if pin in self.images:
+                logger.debug('manager.image.full job={}', job)
+                pin.replace_pixmap(pixmap)
+            return
+        position = self.pin_position(pixmap.deviceIndependentSize().toSize())
+        self.pin_image(ImageData(pixmap, position), live=False)
+
+    def pin_failed(self, job: int, error: str):
+        self.loading.pop(job, None)
+        self.showMessage('PySP', f'Failed to open the image: {error}')
 
     def copy_image(self, pixmap: QPixmap):
         QApplication.clipboard().setPixmap(pixmap)
@@ -135,14 +306,99 @@ class TrayIcon(QSystemTrayIcon):
         selected = QFileDialog.getSaveFileName(
             None,
             "Save image as",
-            filter="PNG image (*.png)",
-            selectedFilter="PNG image (*.png)",
+            filter=SAVE_FILTERS,
+            selectedFilter=PNG_FILTER,
+        )
+        if len(selected) > 0 and selected[0] != '':
+            # encoded in the daemon, the GUI stays responsive
+            daemon = self.shotter.daemon
+            if daemon is not None and daemon.save(pixmap.toImage(), selected[0], selected[1]):
+                self.saving[selected[0]] = pixmap
+                return
+            if save_png(pixmap, selected[0], selected[1]):
+                self.index_image(pixmap, 'file', selected[0])
+
+    def save_images(self, pixmaps: List[QPixmap]):
+        directory = QFileDialog.getExistingDirectory(None, "Save images to")
+        if directory != '' and not self.exporter.export(pixmaps, directory):
+            self.showMessage('PySP', 'Still exporting, try again later')
+
+    def index_image(self, pixmap: QPixmap, kind: str, path: str = ''):
+        self.index.add(pixmap, kind, path)
+
+    def set_indexing(self, enabled: bool):
+        self.index.enabled = enabled
+        logger.debug('manager.index.enabled value={}', enabled)
+
+    def image_saved(self, path: str, ok: bool):
+        pixmap = self.saving.pop(path, None)
+        if not ok:
+            self.showMessage('PySP', f'Failed to save {path}')
+        elif pixmap is not None:
+            self.index_image(pixmap, 'file', path)
+
+    def show_duplicate(self, entry_id: int, existing_id: int, distance: int):
+        existing = self.index.entry(existing_id)
+        logger.debug(
+            'manager.image.duplicate id={}, of={}, distance={}',
+            entry_id, existing_id, distance,
+        )
+        if existing is not None:
+            when = time.strftime('%Y-%m-%d %H:%M', time.localtime(existing.created))
+            self.showMessage('PySP', f'This pin looks like a {existing.kind} from {when}')
+
+    def open_project(self):
+        if self.editor.isVisible():
+            return
+        selected = QFileDialog.getOpenFileName(
+            None, "Open project", filter=PROJECT_FILTER,
         )
         if len(selected) > 0 and selected[0] != '':
-            pixmap.save(selected[0], "png")
+            try:
+                self.editor.open_project(selected[0])
+            except (OSError, ValueError, KeyError) as e:
+                logger.exception('manager.project.open path={}', selected[0])
+                self.showMessage('PySP', f'Failed to open {selected[0]}: {e}')
+
+    def show_history(self):
+        if self.history_dialog is None:
+            self.history_dialog = HistoryDialog(self.index)
+        self.history_dialog.show()
+        self.history_dialog.raise_()
+        self.history_dialog.activateWindow()
+
+    def export_images_to(self, format: str):
+        directory = QFileDialog.getExistingDirectory(None, "Export images to")
+        if directory != '':
+            self.export_images(directory, format)
+
+    def export_images(self, directory: str, format: str = 'png', numbers: List[int] = None) -> bool:
+        """Export pins to `directory`, all of them or the 1-based `numbers`."""
+        numbers = [
+            n for n in numbers or range(1, len(self.images) + 1)
+            if 0 < n <= len(self.images)
+        ]
+        pixmaps = [self.images[n - 1].current_pixmap() for n in numbers]
+        if not self.exporter.export(pixmaps, directory, format, numbers):
+            logger.debug('manager.export.busy')
+            return False
+        return True
+
+    def export_progress(self, done: int, total: int):
+        self.setToolTip(f'PySP - exporting {done}/{total}')
+
+    def export_finished(self, written: List[str], failed: List[str]):
+        self.setToolTip('PySP')
+        message = f'{len(written)} image(s) exported'
+        if failed:
+            message += f', {len(failed)} failed'
+        self.showMessage('PySP', message)
 
     def quit(self):
         logger.debug('app.quit')
+        self.exporter.close()
+        self.index.close()
+        self.shotter.close()
         QApplication.instance().quit()
 
     def move_windows_on_screen(self):
@@ -151,6 +407,8 @@ class TrayIcon(QSystemTrayIcon):
 
         for window in self.images:
             window_rect = window.geometry()
+            if isinstance(window, PinItem):
+                window_rect = window_rect.toRect()
             overlap = QRect(screen_rect).intersected(window_rect)
             if overlap.width() < window_rect.width() * 0.5 or overlap.height() < window_rect.height() * 0.5:
                 x, y = window_rect.x(), window_rect.y()
@@ -170,12 +428,17 @@ class TrayIcon(QSystemTrayIcon):
                     y = screen_rect.bottom() - window_rect.height()
 
                 # 创建动画
-                animation = QPropertyAnimation(window, b"geometry")
+                if isinstance(window, PinItem):
+                    animation = QPropertyAnimation(window, b"pos")
+                    animation.setStartValue(window.pos())
+                    animation.setEndValue(QPointF(x, y))
+                else:
+                    animation = QPropertyAnimation(window, b"geometry")
+                    animation.setStartValue(window_rect)
+                    animation.setEndValue(
+                        QRect(QPoint(x, y), window_rect.size())
+                    )
                 animation.setDuration(170)  # 动画持续时间，单位毫秒
-                animation.setStartValue(window_rect)
-                animation.setEndValue(
-                    QRect(QPoint(x, y), window_rect.size())
-                )
                 animation.setEasingCurve(
                     QEasingCurve.Type.OutCirc
                 )  # 设置缓动曲线
@@ -184,7 +447,7 @@ class TrayIcon(QSystemTrayIcon):
                 )
                 self.animations.append(animation)
                 animation.destroyed.connect(
-                    lambda _: self.animations.remove(animation)
+                    lambda _, animation=animation: self.animations.remove(animation)
                 )
 
     def show_about_dialog(self):
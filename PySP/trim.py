@@ -0,0 +1,128 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+def background(pixels: np.ndarray) -> int:
+    """The RGB color most of the four corners share, the top left one on a tie."""
+    values = pixels.view(np.uint32)[..., 0]
+    corners = [
+        int(values[y, x]) & 0xFFFFFF
+        for y, x in ((0, 0), (0, -1), (-1, 0), (-1, -1))
+    ]
+    return max(corners, key=corners.count)
+
+
+def _first(mask: np.ndarray) -> int:
+    return int(mask.argmax())
+
+
+def _last(mask: np.ndarray) -> int:
+    return len(mask) - 1 - int(mask[::-1].argmax())
+
+
+def _row_range(block: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Per row channel maximum and minimum of a (h, w, 4) block.
+
+    NumPy reduces over the middle axis of such a block slowly, halving
+    the width with element wise maximum and minimum is much faster.
+    """
+    high = low = block
+    while high.shape[1] > 1:
+        half = high.shape[1] // 2
+        last_high, last_low = high[:, -1], low[:, -1]
+        odd = high.shape[1] % 2
+        high = np.maximum(high[:, :half], high[:, half:2 * half])
+        low = np.minimum(low[:, :half], low[:, half:2 * half])
+        if odd:
+            high[:, 0] = np.maximum(high[:, 0], last_high)
+            low[:, 0] = np.minimum(low[:, 0], last_low)
+    return high[:, 0], low[:, 0]
+
+
+def _outside(high: np.ndarray, low: np.ndarray, bg: int, tolerance: int) -> np.ndarray:
+    """Which lines, given their channel ranges, leave the background range."""
+    color = np.array(
+        [bg & 0xFF, (bg >> 8) & 0xFF, (bg >> 16) & 0xFF], dtype=np.int16,
+    )
+    return (
+        (high[:, :3] > color + tolerance) | (low[:, :3] < color - tolerance)
+    ).any(axis=1)
+
+
+def _edge(length: int, probe, from_end: bool = False) -> Optional[int]:
+    """Index of the first line with content, scanning in from one edge.
+
+    `probe(start, stop)` tells which lines of that range have content.
+    Strips double in size, so wide margins take few NumPy calls and the
+    content itself is barely read.
+    """
+    done, step = 0, 8
+    while done < length:
+        size = min(step, length - done)
+        start = length - done - size if from_end else done
+        lines = probe(start, start + size)
+        if lines.any():
+            return start + (_last(lines) if from_end else _first(lines))
+        done += size
+        step *= 2
+    return None
+
+
+def trim_box(
+    pixels: np.ndarray, tolerance: int = 0,
+) -> Optional[Tuple[int, int, int, int]]:
+    """Tight box around what differs from the background color.
+
+    `pixels` is a (height, width, 4) BGRA array, alpha is ignored. A pixel
+    is background if no channel is more than `tolerance` away from it.
+    Returns (left, top, right, bottom), exclusive, or None if the whole
+    array is background. Each edge is found by row or column reductions
+    over strips, from the outside in, so the cost follows the margins
+    rather than the selection.
+    """
+    if pixels.size == 0:
+        return None
+    bg = background(pixels)
+    height, width = pixels.shape[:2]
+
+    def rows(start: int, stop: int) -> np.ndarray:
+        if tolerance <= 0:
+            block = pixels[start:stop].view(np.uint32)[..., 0]
+            return ((block & 0xFFFFFF) != bg).any(axis=1)
+        return _outside(*_row_range(pixels[start:stop]), bg, tolerance)
+
+    top = _edge(height, rows)
+    if top is None:
+        return None
+    bottom = _edge(height, rows, from_end=True) + 1
+
+    def cols(start: int, stop: int) -> np.ndarray:
+        block = pixels[top:bottom, start:stop]
+        if tolerance <= 0:
+            return ((block.view(np.uint32)[..., 0] & 0xFFFFFF) != bg).any(axis=0)
+        # reducing over the first axis is fast
+        return _outside(block.max(axis=0), block.min(axis=0), bg, tolerance)
+
+    left = _edge(width, cols)
+    right = _edge(width, cols, from_end=True) + 1
+    return left, top, right, bottom
+
+
+if __name__ == '__main__':
+    # full screen 4K selection with a bordered window in the middle
+    import time
+
+    pixels = np.full((2160, 3840, 4), 0xEE, dtype=np.uint8)
+    pixels[400:1700, 600:3000, :3] = np.random.default_rng(0).integers(
+        0, 256, (1300, 2400, 3), dtype=np.uint8,
+    )
+    blank = np.full((2160, 3840, 4), 0xEE, dtype=np.uint8)
+    for name, image in (('window', pixels), ('blank', blank)):
+        for tolerance in (0, 8):
+            rounds = 20
+            start = time.perf_counter()
+            for _ in range(rounds):
+                box = trim_box(image, tolerance)
+            elapsed = (time.perf_counter() - start) / rounds
+            print(f'{name}, tolerance {tolerance}: {box} in {elapsed * 1000:.1f} ms')
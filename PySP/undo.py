@@ -0,0 +1,196 @@
+import time
+from typing import List, Optional, TYPE_CHECKING
+
+from PySide6.QtCore import QObject, Signal, QPointF
+from PySide6.QtWidgets import QGraphicsItem
+from loguru import logger
+
+if TYPE_CHECKING:
+    from editor import EditorScene
+    from op_text import NodeTag
+
+
+class Command:
+    """One undoable editor operation.
+
+    Commands keep parameters (positions, scales, text, the item itself),
+    never pixel snapshots of the capture, so each costs a few hundred
+    bytes at most.
+    """
+    # consecutive commands closer than this (seconds) may be merged
+    merge_window = 1.0
+
+    def __init__(self) -> None:
+        self.time = time.monotonic()
+
+    def undo(self):
+        raise NotImplementedError
+
+    def redo(self):
+        raise NotImplementedError
+
+    def cost(self) -> int:
+        """Rough number of bytes kept alive by this command."""
+        return 200
+
+    def merge(self, other: 'Command') -> bool:
+        """Absorb `other`, which happened right after this command."""
+        return False
+
+
+class AddItem(Command):
+    def __init__(self, scene: 'EditorScene', item: QGraphicsItem) -> None:
+        super().__init__()
+        self.scene = scene
+        self.item = item
+
+    def undo(self):
+        self.scene.detach_annotation(self.item)
+
+    def redo(self):
+        self.scene.attach_annotation(self.item)
+
+    def cost(self) -> int:
+        # the item itself is vector data: text, stroke points, or the
+        # block averages of a redaction
+        cost = super().cost()
+        points = getattr(self.item, 'points', None)
+        if points is not None:
+            cost += points.nbytes
+        for patch in getattr(self.item, 'patches', {}).values():
+            size = patch.pixmap().size()
+            cost += size.width() * size.height() * 4
+        return cost
+
+
+class MoveItem(Command):
+    def __init__(self, item: QGraphicsItem, old: QPointF, new: QPointF) -> None:
+        super().__init__()
+        self.item = item
+        self.old = QPointF(old)
+        self.new = QPointF(new)
+
+    def undo(self):
+        self.item.setPos(self.old)
+
+    def redo(self):
+        self.item.setPos(self.new)
+
+    def merge(self, other: Command) -> bool:
+        if not isinstance(other, MoveItem) or other.item is not self.item:
+            return False
+        self.new = other.new
+        self.time = other.time
+        return True
+
+
+class ScaleItem(Command):
+    def __init__(self, item: 'NodeTag', old: float, new: float) -> None:
+        super().__init__()
+        self.item = item
+        self.old = old
+        self.new = new
+
+    def apply(self, scale: float):
+        self.item.setScale(scale)
+        self.item.current_scale = scale
+
+    def undo(self):
+        self.apply(self.old)
+
+    def redo(self):
+        self.apply(self.new)
+
+    def merge(self, other: Command) -> bool:
+        if not isinstance(other, ScaleItem) or other.item is not self.item:
+            return False
+        self.new = other.new
+        self.time = other.time
+        return True
+
+
+class EditText(Command):
+    def __init__(self, item: 'NodeTag', old: str, new: str) -> None:
+        super().__init__()
+        self.item = item
+        self.old = old
+        self.new = new
+
+    def undo(self):
+        self.item.setPlainText(self.old)
+
+    def redo(self):
+        self.item.setPlainText(self.new)
+
+    def cost(self) -> int:
+        return super().cost() + 2 * (len(self.old) + len(self.new))
+
+
+class UndoStack(QObject):
+    """Undo and redo for editor commands, bounded by memory.
+
+    Commands are applied by the caller and then pushed. When the estimated
+    cost of the kept commands exceeds `memory_cap`, the oldest ones are
+    dropped. Consecutive moves or scales of the same item within the
+    merge window collapse into one command.
+    """
+    changed = Signal()
+
+    def __init__(self, memory_cap: int = 16 * 1024 * 1024, parent=None):
+        super().__init__(parent)
+        self.memory_cap = memory_cap
+        self.done: List[Command] = []
+        self.undone: List[Command] = []
+        self.memory = 0
+
+    def push(self, command: Command):
+        for dropped in self.undone:
+            self.memory -= dropped.cost()
+        self.undone.clear()
+
+        top: Optional[Command] = self.done[-1] if self.done else None
+        if (
+            top is not None
+            and command.time - top.time <= Command.merge_window
+            and top.merge(command)
+        ):
+            self.changed.emit()
+            return
+
+        self.done.append(command)
+        self.memory += command.cost()
+        while self.memory > self.memory_cap and len(self.done) > 1:
+            self.memory -= self.done.pop(0).cost()
+        logger.debug(
+            'undo.push {}, depth={}, memory={}',
+            type(command).__name__, len(self.done), self.memory,
+        )
+        self.changed.emit()
+
+    def can_undo(self) -> bool:
+        return bool(self.done)
+
+    def can_redo(self) -> bool:
+        return bool(self.undone)
+
+    def undo(self):
+        if not self.done:
+            return
+        command = self.done.pop()
+        command.undo()
+        self.undone.append(command)
+        self.changed.emit()
+
+    def redo(self):
+        if not self.undone:
+            return
+        command = self.undone.pop()
+        command.redo()
+        self.done.append(command)
+        self.changed.emit()
+
+    def clear(self):
+        self.done.clear()
+        self.undone.clear()
+        self.memory = 0
+        self.changed.emit()